@@ -81,12 +81,15 @@ opcodes = dict(
 )
 
 class BinaryCiscable(base.Ciscable):
+    __slots__ = []
     pass
 
 class BinaryVectorInstruction(BinaryCiscable):
+    __slots__ = []
     is_vec = lambda self: True
 
 class NonVectorInstruction(base.Instruction):
+    __slots__ = []
     is_vec = lambda self: False
 
     def __init__(self, *args, **kwargs):
@@ -94,6 +97,7 @@ class NonVectorInstruction(base.Instruction):
         super(NonVectorInstruction, self).__init__(*args, **kwargs)
 
 class NonVectorInstruction1(base.Instruction):
+    __slots__ = []
     is_vec = lambda self: False
 
     def __init__(self, *args, **kwargs):
@@ -110,6 +114,7 @@ class xors(BinaryVectorInstruction):
     :param: operand (sbit)
     :param: (repeat from number of bits)...
     """
+    __slots__ = []
     code = opcodes['XORS']
     arg_format = tools.cycle(['int','sbw','sb','sb'])
 
@@ -121,6 +126,7 @@ class xorm(NonVectorInstruction):
     :param: operand (sbit)
     :param: operand (cbit)
     """
+    __slots__ = []
     code = opcodes['XORM']
     arg_format = ['int','sbw','sb','cb']
 
@@ -131,6 +137,7 @@ class xorcb(BinaryVectorInstruction):
     :param: operand (cbit)
     :param: operand (cbit)
     """
+    __slots__ = []
     code = opcodes['XORCB']
     arg_format = ['int','cbw','cb','cb']
 
@@ -141,6 +148,7 @@ class xorcbi(NonVectorInstruction):
     :param: operand (cbit)
     :param: immediate (int)
     """
+    __slots__ = []
     code = opcodes['XORCBI']
     arg_format = ['cbw','cb','int']
 
@@ -154,6 +162,7 @@ class andrs(BinaryVectorInstruction):
     :param: single operand (sbit)
     :param: (repeat from number of bits)...
     """
+    __slots__ = []
     code = opcodes['ANDRS']
     arg_format = tools.cycle(['int','sbw','sb','sb'])
 
@@ -178,6 +187,7 @@ class andrsvec(base.VarArgsInstruction, base.Mergeable,
     :param: (repeat from number of arguments to follow for one operation)...
 
     """
+    __slots__ = []
     code = opcodes['ANDRSVEC']
 
     def __init__(self, *args, **kwargs):
@@ -219,6 +229,7 @@ class ands(BinaryVectorInstruction):
     :param: operand (sbit)
     :param: (repeat from number of bits)...
     """
+    __slots__ = []
     code = opcodes['ANDS']
     arg_format = tools.cycle(['int','sbw','sb','sb'])
 
@@ -233,6 +244,7 @@ class andm(BinaryVectorInstruction):
     :param: operand (sbit)
     :param: operand (cbit)
     """
+    __slots__ = []
     code = opcodes['ANDM']
     arg_format = ['int','sbw','sb','cb']
 
@@ -243,6 +255,7 @@ class nots(BinaryVectorInstruction):
     :param: result (sbit)
     :param: operand (sbit)
     """
+    __slots__ = []
     code = opcodes['NOTS']
     arg_format = ['int','sbw','sb']
 
@@ -253,6 +266,7 @@ class notcb(BinaryVectorInstruction):
     :param: result (cbit)
     :param: operand (cbit)
     """
+    __slots__ = []
     code = opcodes['NOTCB']
     arg_format = ['int','cbw','cb']
 
@@ -263,6 +277,7 @@ class addcb(NonVectorInstruction):
     :param: summand (cbit)
     :param: summand (cbit)
     """
+    __slots__ = []
     code = opcodes['ADDCB']
     arg_format = ['cbw','cb','cb']
 
@@ -273,6 +288,7 @@ class addcbi(NonVectorInstruction):
     :param: summand (cbit)
     :param: summand (int)
     """
+    __slots__ = []
     code = opcodes['ADDCBI']
     arg_format = ['cbw','cb','int']
 
@@ -283,6 +299,7 @@ class mulcbi(NonVectorInstruction):
     :param: factor (cbit)
     :param: factor (int)
     """
+    __slots__ = []
     code = opcodes['MULCBI']
     arg_format = ['cbw','cb','int']
 
@@ -294,6 +311,7 @@ class bitdecs(NonVectorInstruction, base.VarArgsInstruction):
     :param: destination for least significant bit (sbit)
     :param: (destination for one bit higher)...
     """
+    __slots__ = []
     code = opcodes['BITDECS']
     arg_format = tools.chain(['sb'], itertools.repeat('sbw'))
 
@@ -305,6 +323,7 @@ class bitcoms(NonVectorInstruction, base.VarArgsInstruction):
     :param: source for least significant bit (sbit)
     :param: (source for one bit higher)...
     """
+    __slots__ = []
     code = opcodes['BITCOMS']
     arg_format = tools.chain(['sbw'], itertools.repeat('sb'))
 
@@ -316,6 +335,7 @@ class bitdecc(NonVectorInstruction, base.VarArgsInstruction):
     :param: destination for least significant bit (sbit)
     :param: (destination for one bit higher)...
     """
+    __slots__ = []
     code = opcodes['BITDECC']
     arg_format = tools.chain(['cb'], itertools.repeat('cbw'))
 
@@ -326,6 +346,7 @@ class shrcbi(NonVectorInstruction):
     :param: source (cbit)
     :param: number of bits to shift (int)
     """
+    __slots__ = []
     code = opcodes['SHRCBI']
     arg_format = ['cbw','cb','int']
 
@@ -336,6 +357,7 @@ class shlcbi(NonVectorInstruction):
     :param: source (cbit)
     :param: number of bits to shift (int)
     """
+    __slots__ = []
     code = opcodes['SHLCBI']
     arg_format = ['cbw','cb','int']
 
@@ -346,6 +368,7 @@ class ldbits(NonVectorInstruction):
     :param: number of bits (int)
     :param: immediate (int)
     """
+    __slots__ = []
     code = opcodes['LDBITS']
     arg_format = ['sbw','i','i']
 
@@ -357,6 +380,7 @@ class ldmsb(base.DirectMemoryInstruction, base.ReadMemoryInstruction,
     :param: destination (sbit)
     :param: memory address (int)
     """
+    __slots__ = []
     code = opcodes['LDMSB']
     arg_format = ['sbw','long']
 
@@ -367,6 +391,7 @@ class stmsb(base.DirectMemoryWriteInstruction, base.VectorInstruction):
     :param: source (sbit)
     :param: memory address (int)
     """
+    __slots__ = []
     code = opcodes['STMSB']
     arg_format = ['sb','long']
     # def __init__(self, *args, **kwargs):
@@ -382,6 +407,7 @@ class ldmcb(base.DirectMemoryInstruction, base.ReadMemoryInstruction,
     :param: destination (cbit)
     :param: memory address (int)
     """
+    __slots__ = []
     code = opcodes['LDMCB']
     arg_format = ['cbw','long']
 
@@ -392,6 +418,7 @@ class stmcb(base.DirectMemoryWriteInstruction, base.VectorInstruction):
     :param: source (cbit)
     :param: memory address (int)
     """
+    __slots__ = []
     code = opcodes['STMCB']
     arg_format = ['cb','long']
 
@@ -403,6 +430,7 @@ class ldmsbi(base.ReadMemoryInstruction, base.VectorInstruction,
     :param: destination (sbit)
     :param: memory address (regint)
     """
+    __slots__ = []
     code = opcodes['LDMSBI']
     arg_format = ['sbw','ci']
     direct = staticmethod(ldmsb)
@@ -415,6 +443,7 @@ class stmsbi(base.WriteMemoryInstruction, base.VectorInstruction,
     :param: source (sbit)
     :param: memory address (regint)
     """
+    __slots__ = []
     code = opcodes['STMSBI']
     arg_format = ['sb','ci']
     direct = staticmethod(stmsb)
@@ -427,6 +456,7 @@ class ldmcbi(base.ReadMemoryInstruction, base.VectorInstruction,
     :param: destination (cbit)
     :param: memory address (regint)
     """
+    __slots__ = []
     code = opcodes['LDMCBI']
     arg_format = ['cbw','ci']
     direct = staticmethod(ldmcb)
@@ -439,27 +469,33 @@ class stmcbi(base.WriteMemoryInstruction, base.VectorInstruction,
     :param: source (cbit)
     :param: memory address (regint)
     """
+    __slots__ = []
     code = opcodes['STMCBI']
     arg_format = ['cb','ci']
     direct = staticmethod(stmcb)
 
 class ldmsdi(base.ReadMemoryInstruction):
+    __slots__ = []
     code = opcodes['LDMSDI']
     arg_format = tools.cycle(['sbw','cb','int'])
 
 class stmsdi(base.WriteMemoryInstruction):
+    __slots__ = []
     code = opcodes['STMSDI']
     arg_format = tools.cycle(['sb','cb'])
 
 class ldmsd(base.ReadMemoryInstruction):
+    __slots__ = []
     code = opcodes['LDMSD']
     arg_format = tools.cycle(['sbw','int','int'])
 
 class stmsd(base.WriteMemoryInstruction):
+    __slots__ = []
     code = opcodes['STMSD']
     arg_format = tools.cycle(['sb','int'])
 
 class stmsdci(base.WriteMemoryInstruction):
+    __slots__ = []
     code = opcodes['STMSDCI']
     arg_format = tools.cycle(['cb','cb'])
 
@@ -470,6 +506,7 @@ class convsint(NonVectorInstruction1):
     :param: destination (sbit)
     :param: source (regint)
     """
+    __slots__ = []
     code = opcodes['CONVSINT']
     arg_format = ['int','sbw','ci']
 
@@ -480,6 +517,7 @@ class convcint(NonVectorInstruction):
     :param: destination (cbit)
     :param: source (regint)
     """
+    __slots__ = []
     code = opcodes['CONVCINT']
     arg_format = ['cbw','ci']
 
@@ -489,6 +527,7 @@ class convcbit(NonVectorInstruction1):
     :param: destination (regint)
     :param: source (cbit)
     """
+    __slots__ = []
     code = opcodes['CONVCBIT']
     arg_format = ['ciw','cb']
 
@@ -503,6 +542,7 @@ class convcintvec(base.Instruction):
     :param: destination for least significant bits (sbit)
     :param: (destination for bits one step higher)...
     """
+    __slots__ = []
     code = opcodes['CONVCINTVEC']
     arg_format = tools.chain(['c'], tools.cycle(['cbw']))
 
@@ -514,6 +554,7 @@ class convcbitvec(BinaryVectorInstruction):
     :param: destination (regint)
     :param: source (cbit)
     """
+    __slots__ = []
     code = opcodes['CONVCBITVEC']
     arg_format = ['int','ciw','cb']
     def __init__(self, *args, **kwargs):
@@ -528,6 +569,7 @@ class convcbit2s(BinaryVectorInstruction):
     :param: destination (sbit)
     :param: source (cbit)
     """
+    __slots__ = []
     code = opcodes['CONVCBIT2S']
     arg_format = ['int','sbw','cb']
 
@@ -543,6 +585,7 @@ class split(base.Instruction):
     :param: (remaining share of least significant bit)...
     :param: (repeat from first share for bit one step higher)...
     """
+    __slots__ = []
     code = opcodes['SPLIT']
     arg_format = tools.chain(['int','s'], tools.cycle(['sbw']))
     def __init__(self, *args, **kwargs):
@@ -555,6 +598,7 @@ class movsb(BinaryVectorInstruction):
     :param: destination (sbit)
     :param: source (sbit)
     """
+    __slots__ = []
     code = opcodes['MOVSB']
     arg_format = ['int', 'sbw','sb']
 
@@ -569,6 +613,7 @@ class trans(base.VarArgsInstruction, base.DynFormatInstruction):
     :param: source (sbit)
     :param: (source)...
     """
+    __slots__ = []
     code = opcodes['TRANS']
     is_vec = lambda self: True
 
@@ -591,6 +636,7 @@ class bitb(NonVectorInstruction):
 
     :param: destination (sbit)
     """
+    __slots__ = []
     code = opcodes['BITB']
     arg_format = ['sbw']
 
@@ -607,6 +653,7 @@ class reveal(BinaryVectorInstruction, base.VarArgsInstruction, base.Mergeable):
     :param: source (sbit)
     :param: (repeat from number of bits)...
     """
+    __slots__ = []
     code = opcodes['REVEAL']
     arg_format = tools.cycle(['int','cbw','sb'])
 
@@ -679,6 +726,7 @@ class print_regb(base.VectorInstruction, base.IOInstruction):
     :param: source (cbit)
     :param: comment (4 bytes / 1 unit)
     """
+    __slots__ = []
     code = opcodes['PRINTREGB']
     arg_format = ['cb','i']
     def __init__(self, reg, comment=''):
@@ -689,6 +737,7 @@ class print_reg_plainb(NonVectorInstruction, base.IOInstruction):
 
     :param: source (cbit)
     """
+    __slots__ = []
     code = opcodes['PRINTREGPLAINB']
     arg_format = ['cb']
 
@@ -698,6 +747,7 @@ class print_reg_signed(base.IOInstruction):
     :param: bit length (int)
     :param: source (cbit)
     """
+    __slots__ = []
     code = opcodes['PRINTREGSIGNED']
     arg_format = ['int','cb']
     is_vec = lambda self: True
@@ -721,6 +771,7 @@ class cond_print_strb(base.IOInstruction):
     :param: condition (cbit, no output if zero)
     :param: four bytes (int)
     """
+    __slots__ = []
     code = opcodes['CONDPRINTSTRB']
     arg_format = ['cb', 'int']
 
@@ -403,11 +403,9 @@ class Merger:
             self.do_merge(merge)
             self.req_num[t.__name__, 'round'] += 1
 
-        preorder = None
-
         if len(instructions) > 1000000:
             print("Topological sort ...")
-        order = Compiler.graph.topological_sort(G, preorder)
+        order = G.topological_sort()
         instructions[:] = [instructions[i] for i in order if instructions[i] is not None]
         if len(instructions) > 1000000:
             print("Done at", time.asctime())
@@ -426,7 +424,7 @@ class Merger:
                                 triple='green', square='green', bit='green',\
                                 asm_input='lightgreen')
 
-        G = Compiler.graph.SparseDiGraph(len(block.instructions))
+        G = Compiler.graph.CSRDiGraph(len(block.instructions))
         self.G = G
 
         reg_nodes = {}
@@ -584,7 +582,6 @@ class Merger:
 
             if isinstance(instr, merge_classes):
                 open_nodes.add(n)
-                G.add_node(n, merges=[])
                 # the following must happen after adding the edge
                 self.real_depths[n] += 1
                 depth = depths[n] + 1
@@ -646,24 +643,18 @@ class Merger:
                 for i_inst in shuffles[instr.args[0]]:
                     add_edge(i_inst, n)
 
-            if not G.pred[n]:
+            if not G.predecessors(n):
                 self.sources.append(n)
 
             if n % 1000000 == 0 and n > 0:
                 print("Processed dependency of %d/%d instructions at" % \
                     (n, len(block.instructions)), time.asctime())
 
+        G.finalize()
+
     def merge_nodes(self, i, j):
         """ Merge node j into i, removing node j """
-        G = self.G
-        if j in G[i]:
-            G.remove_edge(i, j)
-        if i in G[j]:
-            G.remove_edge(j, i)
-        G.add_edges_from(list(zip(itertools.cycle([i]), G[j], [G.weights[(j,k)] for k in G[j]])))
-        G.add_edges_from(list(zip(G.pred[j], itertools.cycle([i]), [G.weights[(k,j)] for k in G.pred[j]])))
-        G.get_attr(i, 'merges').append(j)
-        G.remove_node(j)
+        self.G.merge_nodes(i, j)
 
     def eliminate_dead_code(self):
         instructions = self.instructions
@@ -728,6 +719,10 @@ class RegintOptimizer:
             self.rev_offset_cache[new_base.i, new_offset] = res
 
     def run(self, instructions, program):
+        with program.profile("regint", program.curr_tape):
+            self.optimize(instructions, program)
+
+    def optimize(self, instructions, program):
         for i, inst in enumerate(instructions):
             if isinstance(inst, ldint_class):
                 self.cache[inst.args[0]] = inst.args[1]
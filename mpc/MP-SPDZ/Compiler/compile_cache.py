@@ -0,0 +1,127 @@
+"""
+Content-addressed cache of compiled programs.
+
+An entry is keyed by the hash of the program source, the sources of the
+Compiler package and the options and arguments of the compilation. It
+records the schedule, bytecode and public input files written by the
+compilation together with their hashes and keeps a copy of them. On a
+hit, the files already in ``Programs/`` are reused if unchanged and
+restored from the copy otherwise, so the compilation is skipped.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import shutil
+
+# options that do not change the output of a compilation
+IGNORED_OPTIONS = ("cache", "profile", "verbose")
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class CompileCache:
+    """Cache of compiled programs in a directory with one
+    subdirectory per key.
+
+    :param directory: cache directory
+    :param root: MP-SPDZ directory holding ``Compiler/`` and
+      ``compile.py``
+    """
+
+    compiler_digests = {}
+
+    def __init__(self, directory, root="."):
+        self.directory = directory
+        self.root = root
+        self.hits = 0
+        self.misses = 0
+
+    def compiler_digest(self):
+        """Hash of the Compiler package sources, computed once per
+        process."""
+        root = os.path.abspath(self.root)
+        if root not in self.compiler_digests:
+            h = hashlib.sha256()
+            sources = sorted(
+                glob.glob(os.path.join(root, "Compiler", "**", "*.py"), recursive=True)
+            )
+            for path in sources + [os.path.join(root, "compile.py")]:
+                if os.path.exists(path):
+                    h.update(os.path.relpath(path, root).encode())
+                    h.update(file_digest(path).encode())
+            self.compiler_digests[root] = h.hexdigest()
+        return self.compiler_digests[root]
+
+    def key(self, infile, args, options):
+        """Key of compiling ``infile`` with ``args`` and ``options``."""
+        h = hashlib.sha256()
+        h.update(file_digest(infile).encode())
+        h.update(self.compiler_digest().encode())
+        relevant = sorted(
+            (name, repr(value))
+            for name, value in vars(options).items()
+            if name not in IGNORED_OPTIONS
+        )
+        h.update(json.dumps([list(args), relevant]).encode())
+        return h.hexdigest()
+
+    def entry(self, key):
+        return os.path.join(self.directory, key)
+
+    def restore(self, key):
+        """Make the output files of entry ``key`` available in
+        ``Programs/``.
+
+        :returns: the output files on a hit, None on a miss
+        """
+        manifest = os.path.join(self.entry(key), "manifest.json")
+        try:
+            with open(manifest) as f:
+                files = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        for path, digest in files.items():
+            if os.path.exists(path) and file_digest(path) == digest:
+                continue
+            copy = os.path.join(self.entry(key), path)
+            if not os.path.exists(copy):
+                self.misses += 1
+                return None
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            shutil.copy2(copy, path)
+        self.hits += 1
+        return list(files)
+
+    def store(self, key, paths):
+        """Store the output files ``paths`` (relative to the working
+        directory) as entry ``key``. The entry is renamed into place
+        once complete."""
+        entry = self.entry(key)
+        partial = "%s.part-%d" % (entry, os.getpid())
+        shutil.rmtree(partial, ignore_errors=True)
+        files = {}
+        for path in paths:
+            os.makedirs(os.path.join(partial, os.path.dirname(path)), exist_ok=True)
+            shutil.copy2(path, os.path.join(partial, path))
+            files[path] = file_digest(path)
+        with open(os.path.join(partial, "manifest.json"), "w") as f:
+            json.dump(files, f, indent=1)
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(partial, entry)
+
+    def report(self):
+        return "Compile cache: %d hit%s, %d miss%s" % (
+            self.hits,
+            "" if self.hits == 1 else "s",
+            self.misses,
+            "" if self.misses == 1 else "es",
+        )
@@ -0,0 +1,126 @@
+"""
+Wall time and peak memory of the compilation passes.
+
+The passes are the execution of the program source (``source``), the
+basic block structure of a tape (``blocks``: scopes, CISC expansion and
+jumps), merging of instructions (``merge``, including the dependency
+graph), dead-code elimination (``dead_code``), register allocation
+(``allocation``), the offline data requirements (``requirements``), the
+constant propagation of regint loop counters (``regint``) and writing
+the bytecode (``bytecode``). Passes can be nested, e.g. the passes of
+a thread tape run while executing the source, and the time of a pass
+excludes the passes nested in it.
+
+The peak memory is the peak resident set size. On Linux, it is reset at
+the start of every pass, so it is the peak during the pass. Elsewhere,
+it is the peak of the process up to the end of the pass.
+"""
+
+import json
+import resource
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+PASSES = ("source", "blocks", "merge", "dead_code", "allocation",
+          "requirements", "regint", "bytecode")
+
+
+def peak_rss():
+    """Peak resident set size in kB (since the last reset on Linux)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+class PassProfiler:
+    """Wall time and peak memory per compilation pass and tape.
+
+    :param name: program name
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        self.peak = 0
+        # per tape (None for the whole program) and pass
+        self.stats = defaultdict(
+            lambda: defaultdict(lambda: dict(calls=0, seconds=0.0, peak_rss_kb=0))
+        )
+        self.stack = []
+
+    def update_peak(self):
+        peak = peak_rss()
+        self.peak = max(self.peak, peak)
+        for frame in self.stack:
+            frame["peak"] = max(frame["peak"], peak)
+
+    @contextmanager
+    def measure(self, name, tape=None):
+        """Measure pass ``name`` of ``tape`` (None for the whole
+        program)."""
+        self.update_peak()
+        reset_peak_rss()
+        frame = dict(peak=0, nested=0.0)
+        self.stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.update_peak()
+            self.stack.pop()
+            if self.stack:
+                self.stack[-1]["nested"] += seconds
+            stats = self.stats[tape and tape.name][name]
+            stats["calls"] += 1
+            stats["seconds"] += seconds - frame["nested"]
+            stats["peak_rss_kb"] = max(stats["peak_rss_kb"], frame["peak"])
+
+    def report(self):
+        """Profile as a JSON-serializable dictionary."""
+        self.update_peak()
+        passes = defaultdict(lambda: dict(calls=0, seconds=0.0, peak_rss_kb=0))
+        for tape_stats in self.stats.values():
+            for name, stats in tape_stats.items():
+                passes[name]["calls"] += stats["calls"]
+                passes[name]["seconds"] += stats["seconds"]
+                passes[name]["peak_rss_kb"] = max(
+                    passes[name]["peak_rss_kb"], stats["peak_rss_kb"]
+                )
+
+        def ordered(stats):
+            return {name: stats[name] for name in PASSES if name in stats}
+
+        return {
+            "program": self.name,
+            "seconds": time.perf_counter() - self.start,
+            "peak_rss_kb": self.peak,
+            "passes": ordered(passes),
+            "tapes": {
+                tape: ordered(tape_stats)
+                for tape, tape_stats in self.stats.items()
+                if tape is not None
+            },
+        }
+
+    def write(self, filename):
+        print("Writing compilation profile to", filename)
+        with open(filename, "w") as f:
+            json.dump(self.report(), f, indent=2)
@@ -9,6 +9,7 @@ from optparse import OptionParser
 from Compiler.exceptions import CompilerError
 
 from .GC import types as GC_types
+from .compile_cache import CompileCache
 from .program import Program, defaults
 
 
@@ -39,6 +40,8 @@ class Compiler:
         self.build_option_parser()
         self.VARS = {}
         self.root = os.path.dirname(__file__) + '/..'
+        self.cache = None
+        self.outputs = []
 
     def build_option_parser(self):
         parser = OptionParser(usage=self.usage)
@@ -124,6 +127,12 @@ class Compiler:
             dest="profile",
             help="profile compilation",
         )
+        parser.add_option(
+            "--profile-passes",
+            dest="pass_profile",
+            help="write the time and peak memory of every compilation "
+            "pass and tape to the given JSON file",
+        )
         parser.add_option(
             "-s",
             "--stop",
@@ -232,6 +241,12 @@ class Compiler:
             dest="flow_optimization",
             help="optimize control flow",
         )
+        parser.add_option(
+            "--cache",
+            dest="cache",
+            help="reuse the output of unchanged compilations, "
+            "cached in the given directory (e.g. Programs/Cache)",
+        )
         parser.add_option(
             "-v",
             "--verbose",
@@ -386,9 +401,25 @@ class Compiler:
         """Compile a file and output a Program object.
 
         If options.merge_opens is set to True, will attempt to merge any
-        parallelisable open instructions."""
+        parallelisable open instructions.
+
+        With options.cache, the compilation is skipped if the cache
+        holds the output of the same source, compiler and options."""
         print("Compiling file", self.prog.infile)
 
+        key = None
+        # the assembly output and the profile are not cached
+        if self.options.cache and not (self.options.asmoutfile or
+                                       self.options.pass_profile):
+            if self.cache is None:
+                self.cache = CompileCache(self.options.cache, self.root)
+            key = self.cache.key(self.prog.infile, self.args, self.options)
+            self.outputs = self.cache.restore(key)
+            if self.outputs is not None:
+                print("Reusing cached compilation of", self.prog.name)
+                print(self.cache.report())
+                return self.prog
+
         with open(self.prog.infile, "r") as f:
             changed = False
             if self.options.flow_optimization:
@@ -443,12 +474,26 @@ class Compiler:
         # make compiler modules directly accessible
         sys.path.insert(0, "%s/Compiler" % self.root)
         # create the tapes
-        exec(compile(infile.read(), infile.name, "exec"), self.VARS)
+        with self.prog.profile("source"):
+            exec(compile(infile.read(), infile.name, "exec"), self.VARS)
 
         if changed and not self.options.debug:
             os.unlink(infile.name)
 
-        return self.finalize_compile()
+        prog = self.finalize_compile()
+        self.outputs = self.output_files()
+        if key is not None:
+            self.cache.store(key, self.outputs)
+            print(self.cache.report())
+        return prog
+
+    def output_files(self):
+        """Files written by compiling the current program."""
+        files = ["%s/Schedules/%s.sch" % (self.prog.programs_dir, self.prog.name)]
+        files += [tape.outfile for tape in self.prog.tapes]
+        if self.prog.public_input_file is not None:
+            files.append(self.prog.public_input_file.name)
+        return files
 
     def register_function(self, name=None):
         """
@@ -477,7 +522,8 @@ class Compiler:
         print(
             "Compiling: {} from {}".format(self.compile_name, self.compile_func.__name__)
         )
-        self.compile_function()
+        with self.prog.profile("source"):
+            self.compile_function()
         self.finalize_compile()
 
     def finalize_compile(self):
@@ -493,6 +539,9 @@ class Compiler:
             print("Cost:", 0 if self.prog.req_num is None else self.prog.req_num.cost())
             print("Memory size:", dict(self.prog.allocated_mem))
 
+        if self.prog.profiler is not None:
+            self.prog.profiler.write(self.options.pass_profile)
+
         return self.prog
 
     @staticmethod
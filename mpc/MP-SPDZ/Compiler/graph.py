@@ -1,3 +1,4 @@
+import array
 import heapq
 import collections
 from Compiler.exceptions import *
@@ -102,6 +103,170 @@ class SparseDiGraph(object):
         return len(self.succ[i])
 
 
+class CSRDiGraph(object):
+    """ Directed graph with the edges in compressed sparse row (CSR) form,
+    for the dependency graph of large basic blocks.
+
+    Nodes are added in increasing order, each with its edges from earlier
+    nodes. These are stored as one array of predecessors, and finalize()
+    derives the array of successors by counting sort. Merging and removing
+    nodes afterwards only records the changes: removed nodes are marked with
+    the time of removal, and merged nodes get their successors in an
+    insertion-ordered dictionary. Like in SparseDiGraph, a removed node
+    keeps the successors it had at removal, so topological_sort() returns
+    the same order as the generic function does on a SparseDiGraph.
+    """
+    NEVER = 2 ** 62
+
+    def __init__(self, max_nodes):
+        """ max_nodes: maximum no of nodes """
+        self.n = max_nodes
+        self.pred_ptr = array.array('q', [0]) * (max_nodes + 1)
+        self.pred_idx = array.array('q')
+        self.last_node = -1
+        self.last_target = array.array('q', [-1]) * max_nodes
+        self.succ_ptr = None
+        self.succ_idx = None
+        self.removed = array.array('q', [self.NEVER]) * max_nodes
+        self.time = 0
+        self.succ_changed = {}
+        self.pred_added = {}
+        self.merges = {}
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i):
+        """ Get list of the successors of node i """
+        removed = self.removed
+        t = removed[i]
+        return [j for j in self._succ(i) if removed[j] >= t]
+
+    def __contains__(self, i):
+        return i >= 0 and i < self.n
+
+    def add_node(self, i):
+        """ Add node i, edges can only be added to the last node """
+        if i >= self.n or i <= self.last_node:
+            raise GraphError('Cannot add node %d after node %d to graph of '
+                             'size %d' % (i, self.last_node, self.n))
+        for k in range(self.last_node + 1, i + 1):
+            self.pred_ptr[k] = len(self.pred_idx)
+        self.last_node = i
+
+    def add_edge(self, i, j):
+        if j != self.last_node or i >= j or self.succ_idx is not None:
+            raise GraphError('Cannot add edge (%d,%d) after node %d' %
+                             (i, j, self.last_node))
+        if self.last_target[i] != j:
+            self.last_target[i] = j
+            self.pred_idx.append(i)
+
+    def finalize(self):
+        """ Derive the successors, no more edges can be added afterwards """
+        n = self.n
+        for k in range(self.last_node + 1, n + 1):
+            self.pred_ptr[k] = len(self.pred_idx)
+        del self.last_target
+        pred_ptr, pred_idx = self.pred_ptr, self.pred_idx
+        succ_ptr = array.array('q', [0]) * (n + 1)
+        for i in pred_idx:
+            succ_ptr[i + 1] += 1
+        for i in range(n):
+            succ_ptr[i + 1] += succ_ptr[i]
+        succ_idx = array.array('q', [0]) * len(pred_idx)
+        pos = succ_ptr[:n]
+        # targets in increasing order, as they were added
+        for j in range(n):
+            for k in range(pred_ptr[j], pred_ptr[j + 1]):
+                i = pred_idx[k]
+                succ_idx[pos[i]] = j
+                pos[i] += 1
+        self.succ_ptr = succ_ptr
+        self.succ_idx = succ_idx
+
+    def _succ(self, i):
+        if i in self.succ_changed:
+            return self.succ_changed[i]
+        return self.succ_idx[self.succ_ptr[i]:self.succ_ptr[i + 1]]
+
+    def _changed_succ(self, i):
+        if i not in self.succ_changed:
+            self.succ_changed[i] = dict.fromkeys(self[i])
+        return self.succ_changed[i]
+
+    def predecessors(self, i):
+        """ Get list of the predecessors of node i """
+        removed = self.removed
+        t = removed[i]
+        end = self.pred_ptr[i + 1] if i < self.last_node or \
+            self.succ_idx is not None else len(self.pred_idx)
+        res = [j for j in self.pred_idx[self.pred_ptr[i]:end]
+               if removed[j] >= t]
+        if i in self.pred_added:
+            res += [j for j in self.pred_added[i] if removed[j] >= t]
+        return res
+
+    def degree(self, i):
+        removed = self.removed
+        t = removed[i]
+        return sum(1 for j in self._succ(i) if removed[j] >= t)
+
+    def remove_node(self, i):
+        """ Remove node i and all its edges """
+        self.removed[i] = self.time
+        self.time += 1
+
+    def merge_nodes(self, i, j):
+        """ Merge node j into i, removing node j """
+        if i in self._succ(j):
+            del self._changed_succ(j)[i]
+        succ_i = self._changed_succ(i)
+        for k in self[j]:
+            if k not in succ_i:
+                succ_i[k] = None
+                self.pred_added.setdefault(k, set()).add(i)
+        for k in self.predecessors(j):
+            if k == i:
+                continue
+            succ_k = self._changed_succ(k)
+            if i not in succ_k:
+                succ_k[i] = None
+                self.pred_added.setdefault(i, set()).add(k)
+        self.merges.setdefault(i, []).append(j)
+        self.remove_node(j)
+
+    def topological_sort(self):
+        """ Depth-first topological sort visiting the nodes and successors
+        in the same order as topological_sort() """
+        state = bytearray(self.n) # 1: seen, 2: explored
+        order = []
+        for v in range(self.n - 1, -1, -1):
+            if state[v] == 2:
+                continue
+            fringe = [v]
+            while fringe:
+                w = fringe[-1]
+                if state[w] == 2:
+                    fringe.pop()
+                    continue
+                state[w] = 1
+                new_nodes = []
+                for c in self[w]:
+                    if state[c] != 2:
+                        if state[c] == 1:
+                            raise GraphError("Graph contains a cycle at %d." % c)
+                        new_nodes.append(c)
+                if new_nodes:
+                    fringe.extend(new_nodes)
+                else:
+                    state[w] = 2
+                    order.append(w)
+                    fringe.pop()
+        order.reverse()
+        return order
+
+
 def topological_sort(G, nbunch=None, pref=None):
     seen={}
     order_explored=[] # provide order and 
@@ -1135,6 +1135,7 @@ class ParsedInstruction:
         return self.type.get_usage(self.args)
 
 class VarArgsInstruction(Instruction):
+    __slots__ = []
     def has_var_args(self):
         return True
 
@@ -1146,6 +1147,7 @@ class VectorInstruction(Instruction):
         return super(VectorInstruction, self).get_code(len(self.args[0]))
 
 class Ciscable(Instruction):
+    __slots__ = []
     def copy(self, size, subs):
         return type(self)(*self.get_new_args(size, subs), copying=True)
 
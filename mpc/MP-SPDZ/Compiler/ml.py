@@ -168,10 +168,56 @@ def argmax(x):
         return comp.if_else(a[0], b[0]), comp.if_else(a[1], b[1])
     return tree_reduce(op, enumerate(x))[0]
 
+def argmax_rows(x, maxima=False):
+    """ Compute index of maximum element in every row of a matrix.
+    All rows are processed at once in a tournament over the columns
+    with one vectorized comparison per level, so the number of rounds
+    only depends on the number of columns. The result matches
+    :py:func:`argmax` on every row.
+
+    :param x: sfix/sint matrix (:py:class:`Compiler.types.Matrix`)
+    :param maxima: also return the maximum of every row
+    :returns: sint Array (and sfix/sint vector of maxima)
+    """
+    n_rows, n_columns = x.sizes
+    value_type = x.value_type
+    values = [x.get_column(j) for j in range(n_columns)]
+    indices = [sint(j, size=n_rows) for j in range(n_columns)]
+    while len(values) > 1:
+        n = len(values) // 2
+        comp = value_type.concat(values[0:2 * n:2]) > \
+            value_type.concat(values[1:2 * n:2])
+        new_values = comp.if_else(value_type.concat(values[0:2 * n:2]),
+                                  value_type.concat(values[1:2 * n:2]))
+        new_indices = comp.if_else(sint.concat(indices[0:2 * n:2]),
+                                   sint.concat(indices[1:2 * n:2]))
+        values = [new_values.get_vector(i * n_rows, n_rows)
+                  for i in range(n)] + values[2 * n:]
+        indices = [new_indices.get_vector(i * n_rows, n_rows)
+                   for i in range(n)] + indices[2 * n:]
+    res = sint.Array(n_rows)
+    res.assign_vector(indices[0])
+    if maxima:
+        return res, values[0]
+    return res
+
 def asoftmax(x):
     """ Approximated Softmax. """
     return relu(x) / sum(relu(x))
 
+def approx_exp(x, k=3):
+    """ Approximate exponential :math:`(1 + x / 2^k)^{2^k}` for
+    non-positive inputs, using one comparison and :math:`k` squarings.
+    It is zero below :math:`-2^k`.
+
+    :param x: sfix (vector)
+    :param k: number of squarings
+    """
+    res = relu(1 + x * 2 ** -k)
+    for i in range(k):
+        res = res * res
+    return res
+
 def softmax(x):
     """ Softmax.
 
@@ -242,6 +288,10 @@ class Tensor(MultiArray):
 
 class Layer:
     n_threads = 1
+    # maximum number of elements activated in one vectorized call by
+    # element-wise layers and fused_dense, None for a whole layer and
+    # batch at once (fewest rounds, most memory)
+    max_vector_size = None
     inputs = []
     input_bias = True
     thetas = lambda self: ()
@@ -295,6 +345,7 @@ class Output(NoVariableLayer):
 
     :param N: number of examples
     :param approx: :py:obj:`False` (default) or parameter for :py:obj:`approx_sigmoid`
+    :param inference: only allocate storage for :py:func:`eval`
     """
     n_outputs = 2
 
@@ -304,13 +355,15 @@ class Output(NoVariableLayer):
         res.compute_loss = not 'no_loss' in program.args
         return res
 
-    def __init__(self, N, debug=False, approx=False):
+    def __init__(self, N, debug=False, approx=False, inference=False):
         self.N = N
         self.X = sfix.Array(N)
-        self.Y = sfix.Array(N)
-        self.nabla_X = sfix.Array(N)
+        # labels are only allocated when used
+        self.Y = sfix.Array(N, alloc=not inference)
+        if not inference:
+            self.nabla_X = sfix.Array(N)
+            self.e_x = sfix.Array(N)
         self.l = MemValue(sfix(-1))
-        self.e_x = sfix.Array(N)
         self.debug = debug
         self.weights = None
         self.approx = approx
@@ -439,12 +492,14 @@ class LinearOutput(NoVariableLayer):
         return self.X.get_part(base, size)
 
 class MultiOutputBase(NoVariableLayer):
-    def __init__(self, N, d_out, approx=False, debug=False):
+    def __init__(self, N, d_out, approx=False, debug=False, inference=False):
         self.X = sfix.Matrix(N, d_out)
-        self.Y = sint.Matrix(N, d_out)
-        self.nabla_X = sfix.Matrix(N, d_out)
+        # labels are only allocated when used
+        self.Y = Tensor([N, d_out], sint) if inference else sint.Matrix(N, d_out)
+        if not inference:
+            self.nabla_X = sfix.Matrix(N, d_out)
+            self.losses = sfix.Array(N)
         self.l = MemValue(sfix(-1))
-        self.losses = sfix.Array(N)
         self.approx = None
         self.N = N
         self.d_out = d_out
@@ -515,16 +570,23 @@ class MultiOutput(MultiOutputBase):
     :param N: number of examples
     :param d_out: number of classes
     :param approx: use ReLU division instead of softmax for the loss
+    :param inference: only allocate storage for :py:func:`eval`
     """
-    def __init__(self, N, d_out, approx=False, debug=False):
-        MultiOutputBase.__init__(self, N, d_out)
-        self.exp = sfix.Matrix(N, d_out)
+    # approximation of the softmax in eval: None (softmax, or ReLU
+    # division with approx), 'relu' (ReLU division, uniform without a
+    # positive logit) or 'poly' (approx_exp instead of exp)
+    softmax = None
+
+    def __init__(self, N, d_out, approx=False, debug=False, inference=False):
+        MultiOutputBase.__init__(self, N, d_out, inference=inference)
         self.approx = approx
-        self.positives = sint.Matrix(N, d_out)
-        self.relus = sfix.Matrix(N, d_out)
+        if not inference:
+            self.exp = sfix.Matrix(N, d_out)
+            self.positives = sint.Matrix(N, d_out)
+            self.relus = sfix.Matrix(N, d_out)
+            self.true_X = sfix.Array(N)
         self.cheaper_loss = False
         self.debug = debug
-        self.true_X = sfix.Array(N)
 
     def __repr__(self):
         return '%s(%s, %s, approx=%s)' % \
@@ -566,12 +628,13 @@ class MultiOutput(MultiOutputBase):
     def eval(self, N, top=False):
         d_out = self.X.sizes[1]
         if top:
-            res = sint.Array(N)
-            @for_range_opt_multithread(self.n_threads, N)
-            def _(i):
-                res[i] = argmax(self.X[i])
-            return res
+            return argmax_rows(self.X.get_part(0, N))
         res = sfix.Matrix(N, d_out)
+        if self.softmax in ('relu', 'poly'):
+            return self.eval_approx(N, res)
+        elif self.softmax is not None:
+            raise CompilerError('unknown softmax approximation: %s' %
+                                self.softmax)
         if self.approx:
             @for_range_opt_multithread(self.n_threads, N)
             def _(i):
@@ -587,6 +650,45 @@ class MultiOutput(MultiOutputBase):
             res[i].assign_vector(e / sum(e).expand_to_vector(d_out))
         return res
 
+    def eval_confidence(self, N):
+        """ Top prediction and its softmax probability for all rows
+        at once. The row maxima of :py:func:`argmax_rows` are
+        reused, and the exponentials of all logits as well as the
+        divisions are computed in one vector each, so the number of
+        rounds does not depend on :py:obj:`N`.
+
+        :returns: sint Array of classes and sfix Array of probabilities
+        """
+        X = self.X.get_part(0, N)
+        classes, m = argmax_rows(X, maxima=True)
+        columns = [X.get_column(j) for j in range(self.d_out)]
+        e = exp(sfix.concat([x - m for x in columns]))
+        # probability of the maximum: 1 / sum(exp(x - max(x)))
+        res = sfix.Array(N)
+        res.assign_vector(
+            1 / sum(e.get_vector(j * N, N) for j in range(self.d_out)))
+        return classes, res
+
+    def eval_approx(self, N, res):
+        """ Approximate softmax of all rows at once, with one vector
+        per class, so the number of rounds does not depend on
+        :py:obj:`N`. With ReLU division, every ReLU is increased by
+        the smallest fixed-point value, so a row without a positive
+        logit has a uniform distribution instead of a division by
+        zero. """
+        X = self.X.get_part(0, N)
+        columns = [X.get_column(j) for j in range(self.d_out)]
+        if self.softmax == 'poly':
+            m = util.max(columns)
+            columns = [approx_exp(x - m) for x in columns]
+        else:
+            columns = [relu(x) + 2 ** -x.f for x in columns]
+        # one division per row
+        inv = 1 / sum(columns)
+        for j, x in enumerate(columns):
+            res.set_column(j, x * inv)
+        return res
+
     def backward(self, batch):
         d_out = self.X.sizes[1]
         if self.approx:
@@ -783,12 +885,16 @@ class Dense(DenseBase):
     :param N: number of examples
     :param d_in: input dimension
     :param d_out: output dimension
+    :param inference: only allocate storage for the forward pass
+    :param W: preloaded weights (sfix matrix of size :math:`d_{in} \times d_{out}`, default: new tensor)
+    :param b: preloaded bias (sfix array or matrix with :math:`d_{out}` entries, default: new array)
     """
-    def __init__(self, N, d_in, d_out, d=1, activation='id', debug=False):
+    def __init__(self, N, d_in, d_out, d=1, activation='id', debug=False,
+                 inference=False, W=None, b=None):
         if activation == 'id':
             self.activation_layer = None
         elif activation == 'relu':
-            self.activation_layer = Relu([N, d, d_out])
+            self.activation_layer = Relu([N, d, d_out], inference=inference)
         elif activation == 'aelu':
             self.activation_layer = Aelu([N, d, d_out])
         elif activation == 'square':
@@ -804,14 +910,28 @@ class Dense(DenseBase):
 
         self.X = Tensor([N, d, d_in], sfix)
         self.Y = Tensor([N, d, d_out], sfix)
-        self.W = Tensor([d_in, d_out], sfix)
-        self.b = sfix.Array(d_out)
-
-        back_N = min(N, self.back_batch_size)
-        self.nabla_Y = Tensor([back_N, d, d_out], sfix)
-        self.nabla_X = Tensor([back_N, d, d_in], sfix)
-        self.nabla_W = sfix.Matrix(d_in, d_out)
-        self.nabla_b = sfix.Array(d_out)
+        if W is None:
+            self.W = Tensor([d_in, d_out], sfix)
+        else:
+            if list(W.sizes) != [d_in, d_out]:
+                raise CompilerError('weights of shape %s instead of %s' %
+                                    (list(W.sizes), [d_in, d_out]))
+            self.W = W
+        if b is None:
+            self.b = sfix.Array(d_out)
+        else:
+            if b.total_size() != d_out:
+                raise CompilerError('%d bias entries instead of %d' %
+                                    (b.total_size(), d_out))
+            self.b = b.to_array()
+
+        self.inference = inference
+        if not inference:
+            back_N = min(N, self.back_batch_size)
+            self.nabla_Y = Tensor([back_N, d, d_out], sfix)
+            self.nabla_X = Tensor([back_N, d, d_in], sfix)
+            self.nabla_W = sfix.Matrix(d_in, d_out)
+            self.nabla_b = sfix.Array(d_out)
 
         self.debug = debug
 
@@ -819,7 +939,8 @@ class Dense(DenseBase):
         if l:
             self.f_input = l.X
             l.Y = self.Y
-            l.nabla_Y = self.nabla_Y
+            if not inference:
+                l.nabla_Y = self.nabla_Y
         else:
             self.f_input = self.Y
 
@@ -938,6 +1059,155 @@ class Dense(DenseBase):
 
         self.backward_params(f_schur_Y, batch=batch)
 
+def fused_dense(X, W, b, activation='id', res=None, n_threads=None,
+                max_vector_size=None):
+    """ Inference-only dense layer with optional ReLU activation.
+    Unlike :py:class:`Dense`, the matrix product, bias, truncation,
+    and ReLU comparison are computed in one vectorized pass (per
+    thread) without storing the product, the activation input, or
+    the comparison results in memory.
+
+    :param X: input (:py:class:`~Compiler.types.Matrix` / 2-dimensional :py:class:`~Compiler.types.MultiArray` of sfix, one row per sample)
+    :param W: weights (sfix matrix of size :math:`d_{in} \\times d_{out}`)
+    :param b: bias (sfix array or matrix with :math:`d_{out}` entries)
+    :param activation: :py:obj:`'id'` (default) or :py:obj:`'relu'`
+    :param res: output (sfix matrix or array with :math:`N d_{out}` entries, default: new matrix)
+    :param n_threads: number of threads (default: :py:obj:`Layer.n_threads`)
+    :param max_vector_size: maximum number of outputs computed at once, in whole rows (default: :py:obj:`Layer.max_vector_size`, all rows of a thread)
+    :returns: :py:obj:`res`
+
+    """
+    if activation not in ('id', 'relu'):
+        raise CompilerError('activation not supported: %s' % activation)
+    N, d_in = X.sizes
+    d_out = W.sizes[1]
+    assert W.sizes[0] == d_in
+    assert b.total_size() == d_out
+    if res is None:
+        res = sfix.Matrix(N, d_out)
+    assert res.total_size() >= N * d_out
+    max_vector_size = max_vector_size or Layer.max_vector_size
+    if max_vector_size:
+        max_rows = max(1, max_vector_size // d_out)
+    else:
+        max_rows = None
+    @multithread(n_threads or Layer.n_threads, N, max_size=max_rows)
+    def _(base, size):
+        y = X.direct_mul(W, indices=(
+            regint.inc(size, base), regint.inc(d_in), regint.inc(d_in),
+            regint.inc(d_out)))
+        # bias repeated for every row
+        y += sfix.load_mem(regint.inc(size * d_out, b.address, 1, 1, d_out))
+        if activation == 'relu':
+            y = relu(y)
+        res.assign_vector(y, base * d_out)
+    return res
+
+def fixed_weight_masks(W, N, A=None, C=None, n_threads=None,
+                       max_vector_size=None):
+    """ Weight-dependent preprocessing of :py:func:`masked_dense`:
+    random masks :math:`A` for the inputs of :math:`N` samples and
+    their products :math:`C = A W` with the secret weights. The
+    product is computed on the integer representation without
+    truncation. It only depends on the weights, so it can be computed
+    before the inputs are known. Every pair must only be used once.
+
+    :param W: weights (sfix matrix of size :math:`d_{in} \\times d_{out}`)
+    :param N: number of samples
+    :param A: masks (sint matrix of size :math:`N \\times d_{in}`, default: new matrix)
+    :param C: products (sint matrix of size :math:`N \\times d_{out}`, default: new matrix)
+    :param n_threads: number of threads (default: :py:obj:`Layer.n_threads`)
+    :param max_vector_size: maximum number of products computed at once, in whole rows (default: :py:obj:`Layer.max_vector_size`, all rows of a thread)
+    :returns: tuple :py:obj:`(A, C)`
+
+    """
+    d_in, d_out = W.sizes
+    if A is None:
+        A = sint.Matrix(N, d_in)
+    if C is None:
+        C = sint.Matrix(N, d_out)
+    assert A.total_size() >= N * d_in
+    assert C.total_size() >= N * d_out
+    max_vector_size = max_vector_size or Layer.max_vector_size
+    if max_vector_size:
+        max_rows = max(1, max_vector_size // max(d_in, d_out))
+    else:
+        max_rows = None
+    @multithread(n_threads or Layer.n_threads, N, max_size=max_rows)
+    def _(base, size):
+        A.assign_vector(sint.get_random(size=size * d_in), base * d_in)
+        # the product reads the masks from memory
+        break_point()
+        C.assign_vector(sint.direct_matrix_mul(
+            A.address, W.address, N, d_in, d_out, indices=(
+                regint.inc(size, base), regint.inc(d_in), regint.inc(d_in),
+                regint.inc(d_out))), base * d_out)
+    return A, C
+
+def masked_dense(X, W, b, A, C, activation='id', res=None, n_threads=None,
+                 max_vector_size=None):
+    """ Inference-only dense layer as :py:func:`fused_dense` using
+    the masks and products of :py:func:`fixed_weight_masks`. The
+    masked input :math:`E = X - A` is opened, and the product
+    :math:`X W = E W + C` is computed locally, so the matrix product
+    uses no triples. Only the opening, the truncation, and the ReLU
+    comparison depend on the input.
+
+    :param X: input (:py:class:`~Compiler.types.Matrix` / 2-dimensional :py:class:`~Compiler.types.MultiArray` of sfix, one row per sample)
+    :param W: weights (sfix matrix of size :math:`d_{in} \\times d_{out}`)
+    :param b: bias (sfix array or matrix with :math:`d_{out}` entries)
+    :param A: masks (sint matrix with at least :math:`N d_{in}` entries)
+    :param C: products of the masks and the weights (sint matrix with at least :math:`N d_{out}` entries)
+    :param activation: :py:obj:`'id'` (default) or :py:obj:`'relu'`
+    :param res: output (sfix matrix or array with :math:`N d_{out}` entries, default: new matrix)
+    :param n_threads: number of threads (default: :py:obj:`Layer.n_threads`)
+    :param max_vector_size: maximum number of outputs computed at once, in whole rows (default: :py:obj:`Layer.max_vector_size`, all rows of a thread)
+    :returns: :py:obj:`res`
+
+    """
+    if activation not in ('id', 'relu'):
+        raise CompilerError('activation not supported: %s' % activation)
+    N, d_in = X.sizes
+    d_out = W.sizes[1]
+    assert W.sizes[0] == d_in
+    assert b.total_size() == d_out
+    assert A.total_size() >= N * d_in
+    assert C.total_size() >= N * d_out
+    if res is None:
+        res = sfix.Matrix(N, d_out)
+    assert res.total_size() >= N * d_out
+    E = cint.Matrix(N, d_in)
+    max_vector_size = max_vector_size or Layer.max_vector_size
+    if max_vector_size:
+        max_rows = max(1, max_vector_size // max(d_in, d_out))
+    else:
+        max_rows = None
+    @multithread(n_threads or Layer.n_threads, N, max_size=max_rows)
+    def _(base, size):
+        # uniformly random because of the masks
+        E.assign_vector((X.get_vector(base * d_in, size * d_in).v -
+                         A.get_vector(base * d_in, size * d_in)).reveal(),
+                        base * d_in)
+        y = C.get_vector(base * d_out, size * d_out)
+        @for_range(d_in)
+        def _(k):
+            # column k of E repeated for every output, row k of W for
+            # every sample
+            e = cint.load_mem(regint.inc(size * d_out,
+                                         E.address + base * d_in + k, d_in,
+                                         d_out))
+            w = sint.load_mem(regint.inc(size * d_out, W.address + k * d_out,
+                                         1, 1, d_out))
+            y.update(y + e * w)
+        y = sfix.unreduced_type._new(y).reduce_after_mul()
+        # bias repeated for every row
+        y += sfix.load_mem(regint.inc(size * d_out, b.address, 1, 1, d_out))
+        if activation == 'relu':
+            y = relu(y)
+        res.assign_vector(y, base * d_out)
+    E.delete()
+    return res
+
 class QuantizedDense(DenseBase):
     def __init__(self, N, d_in, d_out):
         self.N = N
@@ -1042,14 +1312,16 @@ class Dropout(NoVariableLayer):
             print_ln('dropout nabla_X %s', self.nabla_X.reveal_nested())
 
 class ElementWiseLayer(NoVariableLayer):
-    def __init__(self, shape, inputs=None):
+    def __init__(self, shape, inputs=None, inference=False):
         self.X = Tensor(shape, sfix)
         self.Y = Tensor(shape, sfix)
-        backward_shape = list(shape)
-        backward_shape[0] = min(shape[0], self.back_batch_size)
-        self.nabla_X = Tensor(backward_shape, sfix)
-        self.nabla_Y = Tensor(backward_shape, sfix)
+        if not inference:
+            backward_shape = list(shape)
+            backward_shape[0] = min(shape[0], self.back_batch_size)
+            self.nabla_X = Tensor(backward_shape, sfix)
+            self.nabla_Y = Tensor(backward_shape, sfix)
         self.inputs = inputs
+        self.inference = inference
 
     def f_part(self, base, size):
         return self.f(self.X.get_vector(base, size))
@@ -1059,7 +1331,8 @@ class ElementWiseLayer(NoVariableLayer):
 
     def _forward(self, batch=[0]):
         n_per_item = reduce(operator.mul, self.X.sizes[1:])
-        @multithread(self.n_threads, len(batch) * n_per_item)
+        @multithread(self.n_threads, len(batch) * n_per_item,
+                     max_size=self.max_vector_size)
         def _(base, size):
             self.Y.assign_vector(self.f_part(base, size), base)
 
@@ -1101,17 +1374,20 @@ class Relu(ElementWiseLayer):
     """ Fixed-point ReLU layer.
 
     :param shape: input/output shape (tuple/list of int)
+    :param inference: do not store the comparisons for the backward pass
     """
     prime_type = sint
 
-    def __init__(self, shape, inputs=None):
-        super(Relu, self).__init__(shape)
-        self.comparisons = MultiArray(shape, sint)
+    def __init__(self, shape, inputs=None, inference=False):
+        super(Relu, self).__init__(shape, inference=inference)
+        if not inference:
+            self.comparisons = MultiArray(shape, sint)
 
     def f_part(self, base, size):
         x = self.X.get_vector(base, size)
         c = x > 0
-        self.comparisons.assign_vector(c, base)
+        if not self.inference:
+            self.comparisons.assign_vector(c, base)
         return c.if_else(x, 0)
 
     def f_prime_part(self, base, size):
@@ -2304,7 +2580,8 @@ class Optimizer:
         for i, layer in enumerate(self.layers):
             if layer.inputs and len(layer.inputs) == 1 and layer.inputs[0] is not None:
                 layer._X.address = layer.inputs[0].Y.address
-            layer.Y.alloc()
+            if i != len(self.layers) - 1 or run_last:
+                layer.Y.alloc()
             if model_from is not None:
                 layer.input_from(model_from)
             break_point()
@@ -2361,6 +2638,68 @@ class Optimizer:
         self.run_in_batches(f, data, batch_size or len(self.layers[1].X))
         return res
 
+    def fixed_weight_masks(self, N, masks=None):
+        """ Compute the masks and products of
+        :py:func:`fixed_weight_masks` for every dense layer of
+        :py:func:`eval_fused` with :py:obj:`N` samples.
+
+        :param N: number of samples
+        :param masks: result of a previous call to overwrite (default: new storage)
+        :returns: list of tuples :py:obj:`(A, C)`
+
+        """
+        dense = self.layers[:-1]
+        if masks is None:
+            masks = [(None, None)] * len(dense)
+        return [fixed_weight_masks(layer.W, N, A, C, n_threads=self.n_threads)
+                for layer, (A, C) in zip(dense, masks)]
+
+    @_no_mem_warnings
+    def eval_fused(self, data, top=False, masks=None, confidence=False):
+        """ Compute evaluation of a multi-layer perceptron using
+        :py:func:`fused_dense` for every layer. This only supports
+        dense layers with identity or ReLU activation followed by
+        an output layer. The logits are left in the input of the
+        output layer.
+
+        :param data: sample data (:py:class:`Compiler.types.Matrix` with one row per sample, at most as many as the output layer)
+        :param top: return top prediction instead of probability distribution
+        :param masks: masks and products of :py:func:`fixed_weight_masks` for every dense layer to use :py:func:`masked_dense` instead (default: none)
+        :param confidence: return top prediction and its probability (see :py:func:`MultiOutput.eval_confidence`)
+        :returns: sfix/sint Array or sfix Matrix (as :py:func:`eval`)
+
+        """
+        *dense, output = self.layers
+        for layer in dense:
+            if not isinstance(layer, Dense) or layer.d != 1 or \
+               layer.activation not in ('id', 'relu'):
+                raise CompilerError('fused evaluation not supported for %s'
+                                    % repr(layer))
+        N = len(data)
+        if N > len(output.X):
+            raise CompilerError('too many samples for fused evaluation')
+        if masks is not None and len(masks) != len(dense):
+            raise CompilerError('masks needed for every dense layer')
+        X = sfix.Matrix(N, data.total_size() // N, address=data.address)
+        for i, layer in enumerate(dense):
+            if i == len(dense) - 1:
+                res = output.X
+            else:
+                res = None
+            if masks is None:
+                Y = fused_dense(X, layer.W, layer.b, layer.activation,
+                                res=res, n_threads=self.n_threads)
+            else:
+                A, C = masks[i]
+                Y = masked_dense(X, layer.W, layer.b, A, C, layer.activation,
+                                 res=res, n_threads=self.n_threads)
+            if i > 0:
+                X.delete()
+            X = Y
+        if confidence:
+            return output.eval_confidence(N)
+        return output.eval(N, top=top)
+
     @_no_mem_warnings
     def backward(self, batch):
         """ Compute backward propagation. """
@@ -3082,18 +3421,36 @@ class keras:
             def summary(self):
                 self.opt.summary()
 
-            def build(self, input_shape, batch_size=128):
+            def build(self, input_shape, batch_size=128, inference=False,
+                      weights=None):
+                """ Construct the layers.
+
+                :param input_shape: shape of the sample data
+                :param batch_size: number of samples processed at once
+                :param inference: only allocate storage for
+                  :py:func:`predict` (no optimizer, gradients, or labels)
+                :param weights: preloaded weights and biases of the dense
+                  layers as in Keras (``[W0, b0, W1, b1, ...]``), used
+                  instead of allocating new ones
+
+                """
                 data_input_shape = input_shape
                 if self.opt != None and \
                    input_shape == self.opt.layers[0]._X.sizes and \
                    batch_size <= self.batch_size and \
-                   type(self.opt).__name__.lower() == self.optimizer[0]:
+                   type(self.opt).__name__.lower() == self.optimizer[0] \
+                   and weights is None:
                     return
                 if self.optimizer == None:
                     self.optimizer = 'inference', [], {}
+                if inference and self.optimizer[0] != 'inference':
+                    raise CompilerError(
+                        'inference-only build not possible with optimizer')
                 if input_shape == None:
                     raise Exception('must specify number of samples')
                 Layer.back_batch_size = batch_size
+                preloaded = weights is not None
+                weights = list(weights or [])
                 layers = []
                 for i, layer in enumerate(self.layers):
                     name = layer[0]
@@ -3112,8 +3469,14 @@ class keras:
                             if activation == 'softmax' and layer[1][0] == 1:
                                 raise CompilerError(
                                     'softmax requires more than one output neuron')
+                        kwargs = dict(layer[2])
+                        if preloaded:
+                            if len(weights) < 2:
+                                raise CompilerError('not enough weights')
+                            kwargs['W'], kwargs['b'] = weights[:2]
+                            weights = weights[2:]
                         layers.append(Dense(N, n_units, layer[1][0],
-                                            **layer[2]))
+                                            inference=inference, **kwargs))
                         input_shape = layers[-1].Y.sizes
                     elif name == 'conv2d':
                         input_shape = list(input_shape) + \
@@ -3153,11 +3516,19 @@ class keras:
                         layers.append(BatchNorm(layers[-1].Y.sizes))
                     else:
                         raise Exception(layer[0] + ' not supported')
+                    if preloaded and layers and layers[-1].thetas() and \
+                       not isinstance(layers[-1], Dense):
+                        raise CompilerError(
+                            'preloaded weights only supported for dense layers')
+                if weights:
+                    raise CompilerError('too many weights')
                 if layers[-1].d_out == 1:
-                    layers.append(Output(data_input_shape[0]))
+                    layers.append(Output(data_input_shape[0],
+                                         inference=inference))
                 else:
                     layers.append(
-                        MultiOutput(data_input_shape[0], layers[-1].d_out))
+                        MultiOutput(data_input_shape[0], layers[-1].d_out,
+                                    inference=inference))
                 if self.optimizer[1]:
                     raise Exception('use keyword arguments for optimizer')
                 opt = self.optimizer[0]
@@ -3215,9 +3586,11 @@ class keras:
                                      batch_size)
                 return self.opt
 
-            def predict(self, x, batch_size=None):
+            def predict(self, x, batch_size=None, fused=False):
                 if self.opt == None:
                     raise Exception('need to run fit() or build() first')
+                if fused:
+                    return self.opt.eval_fused(x)
                 if batch_size != None:
                     batch_size = min(batch_size, self.batch_size)
                 return self.opt.eval(x, batch_size=batch_size)
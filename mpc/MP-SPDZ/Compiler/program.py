@@ -4,6 +4,7 @@ blocks and registers. Most relevant is the central :py:class:`Program`
 object that holds various properties of the computation.
 """
 
+import contextlib
 import inspect
 import itertools
 import math
@@ -24,6 +25,7 @@ from Compiler.instructions_base import RegType
 
 from . import allocator as al
 from . import util
+from .compile_profile import PassProfiler
 
 data_types = dict(
     triple=0,
@@ -69,6 +71,8 @@ class defaults:
     stop = False
     insecure = False
     keep_cisc = False
+    cache = None
+    pass_profile = None
 
 
 class Program(object):
@@ -133,6 +137,10 @@ class Program(object):
         self.n_threads = 1
         self.public_input_file = None
         self.types = {}
+        if options.pass_profile:
+            self.profiler = PassProfiler(self.name)
+        else:
+            self.profiler = None
         if self.options.budget:
             self.budget = int(self.options.budget)
         else:
@@ -376,6 +384,13 @@ class Program(object):
             self.curr_tape.free_threads.add(thread_number)
         self.curr_tape.start_new_basicblock(name="post-join_tape")
 
+    def profile(self, name, tape=None):
+        """Measure the compilation pass ``name`` of ``tape`` if
+        profiling is enabled (see :py:mod:`Compiler.compile_profile`)."""
+        if self.profiler is None:
+            return contextlib.nullcontext()
+        return self.profiler.measure(name, tape)
+
     def update_req(self, tape):
         if self.req_num is None:
             self.req_num = tape.req_num
@@ -1005,8 +1020,10 @@ class Tape:
                 "Processing tape", self.name, "with %d blocks" % len(self.basicblocks)
             )
 
-        for block in self.basicblocks:
-            al.determine_scope(block, options)
+        profile = self.program.profile
+        with profile("blocks", self):
+            for block in self.basicblocks:
+                al.determine_scope(block, options)
 
         # merge open instructions
         # need to do this if there are several blocks
@@ -1023,18 +1040,21 @@ class Tape:
                         )
                     )
                 # the next call is necessary for allocation later even without merging
-                merger = al.Merger(block, options, tuple(self.program.to_merge))
+                with profile("merge", self):
+                    merger = al.Merger(block, options, tuple(self.program.to_merge))
                 if options.dead_code_elimination:
                     if len(block.instructions) > 1000000:
                         print("Eliminate dead code...")
-                    merger.eliminate_dead_code()
+                    with profile("dead_code", self):
+                        merger.eliminate_dead_code()
                 if options.merge_opens and self.merge_opens:
                     if len(block.instructions) == 0:
                         block.used_from_scope = util.set_by_id()
                         continue
                     if len(block.instructions) > 1000000:
                         print("Merging instructions...")
-                    numrounds = merger.longest_paths_merge()
+                    with profile("merge", self):
+                        numrounds = merger.longest_paths_merge()
                     block.n_rounds = numrounds
                     block.n_to_merge = len(merger.open_nodes)
                     if options.verbose:
@@ -1064,158 +1084,161 @@ class Tape:
         if not (options.merge_opens and self.merge_opens):
             print("Not merging instructions in tape %s" % self.name)
 
-        if options.cisc:
-            self.expand_cisc()
+        with profile("blocks", self):
+            if options.cisc:
+                self.expand_cisc()
 
-        # add jumps
-        offset = 0
-        for block in self.basicblocks:
-            if block.exit_condition is not None:
-                block.add_jump()
-            block.offset = offset
-            offset += len(block.instructions)
-        for block in self.basicblocks:
-            if block.exit_block is not None:
-                block.adjust_jump()
-            if block.previous_block is not None:
-                block.adjust_return()
+            # add jumps
+            offset = 0
+            for block in self.basicblocks:
+                if block.exit_condition is not None:
+                    block.add_jump()
+                block.offset = offset
+                offset += len(block.instructions)
+            for block in self.basicblocks:
+                if block.exit_block is not None:
+                    block.adjust_jump()
+                if block.previous_block is not None:
+                    block.adjust_return()
+
+            # now remove any empty blocks (must be done after setting jumps)
+            self.basicblocks = [x for x in self.basicblocks if len(x.instructions) != 0]
+
+        with profile("allocation", self):
+            # allocate registers
+            reg_counts = self.count_regs()
+            if options.noreallocate:
+                if self.program.verbose:
+                    print("Tape register usage:", dict(reg_counts))
+            else:
+                if self.program.verbose:
+                    print("Tape register usage before re-allocation:", dict(reg_counts))
+                    print(
+                        "modp: %d clear, %d secret"
+                        % (reg_counts[RegType.ClearModp], reg_counts[RegType.SecretModp])
+                    )
+                    print(
+                        "GF2N: %d clear, %d secret"
+                        % (reg_counts[RegType.ClearGF2N], reg_counts[RegType.SecretGF2N])
+                    )
+                    print("Re-allocating...")
+                allocator = al.StraightlineAllocator(REG_MAX, self.program)
+
+                # make addresses available in functions
+                for addr in self.program.base_addresses:
+                    if addr.program == self and self.basicblocks:
+                        allocator.alloc_reg(addr, self.basicblocks[-1].alloc_pool)
 
-        # now remove any empty blocks (must be done after setting jumps)
-        self.basicblocks = [x for x in self.basicblocks if len(x.instructions) != 0]
+                seen = set()
 
-        # allocate registers
-        reg_counts = self.count_regs()
-        if options.noreallocate:
+                def alloc(block):
+                    allocator.update_usage(block.alloc_pool)
+                    for reg in sorted(
+                        block.used_from_scope, key=lambda x: (x.reg_type, x.i)
+                    ):
+                        allocator.alloc_reg(reg, block.alloc_pool)
+                    seen.add(block)
+
+                def alloc_loop(block):
+                    left = deque([block])
+                    while left:
+                        block = left.popleft()
+                        alloc(block)
+                        for child in block.children:
+                            if child not in seen:
+                                left.append(child)
+
+                allocator.old_pool = None
+                for i, block in enumerate(reversed(self.basicblocks)):
+                    if len(block.instructions) > 1000000:
+                        print(
+                            "Allocating %s, %d/%d" % (block.name, i, len(self.basicblocks))
+                        )
+                    if block.exit_condition is not None:
+                        jump = block.exit_condition.get_relative_jump()
+                        if (
+                            isinstance(jump, int)
+                            and jump < 0
+                            and block.exit_block.scope is not None
+                        ):
+                            alloc_loop(block.exit_block.scope)
+                    usage = allocator.max_usage.copy()
+                    allocator.process(block.instructions, block.alloc_pool)
+                    if self.program.verbose and usage != allocator.max_usage:
+                        print("Allocated registers in %s " % block.name, end="")
+                        for t, n in allocator.max_usage.items():
+                            if n > usage[t]:
+                                print("%s:%d " % (t, n - usage[t]), end="")
+                        print()
+                allocator.finalize(options)
+                if self.program.verbose:
+                    print("Tape register usage:", dict(allocator.max_usage))
+                    scopes = set(block.alloc_pool for block in self.basicblocks)
+                    n_fragments = sum(scope.n_fragments() for scope in scopes)
+                    print("%d register fragments in %d scopes" % (n_fragments, len(scopes)))
+
+        with profile("requirements", self):
+            # offline data requirements
             if self.program.verbose:
-                print("Tape register usage:", dict(reg_counts))
-        else:
+                print("Compile offline data requirements...")
+            for block in self.basicblocks:
+                block.req_node.add_block(block)
+            self.req_num = self.req_tree.aggregate()
             if self.program.verbose:
-                print("Tape register usage before re-allocation:", dict(reg_counts))
-                print(
-                    "modp: %d clear, %d secret"
-                    % (reg_counts[RegType.ClearModp], reg_counts[RegType.SecretModp])
-                )
-                print(
-                    "GF2N: %d clear, %d secret"
-                    % (reg_counts[RegType.ClearGF2N], reg_counts[RegType.SecretGF2N])
-                )
-                print("Re-allocating...")
-            allocator = al.StraightlineAllocator(REG_MAX, self.program)
-
-            # make addresses available in functions
-            for addr in self.program.base_addresses:
-                if addr.program == self and self.basicblocks:
-                    allocator.alloc_reg(addr, self.basicblocks[-1].alloc_pool)
-
-            seen = set()
-
-            def alloc(block):
-                allocator.update_usage(block.alloc_pool)
-                for reg in sorted(
-                    block.used_from_scope, key=lambda x: (x.reg_type, x.i)
-                ):
-                    allocator.alloc_reg(reg, block.alloc_pool)
-                seen.add(block)
-
-            def alloc_loop(block):
-                left = deque([block])
-                while left:
-                    block = left.popleft()
-                    alloc(block)
-                    for child in block.children:
-                        if child not in seen:
-                            left.append(child)
-
-            allocator.old_pool = None
-            for i, block in enumerate(reversed(self.basicblocks)):
-                if len(block.instructions) > 1000000:
-                    print(
-                        "Allocating %s, %d/%d" % (block.name, i, len(self.basicblocks))
+                print("Tape requires", self.req_num)
+            for req, num in sorted(self.req_num.items()):
+                if num == float("inf") or num >= 2**64:
+                    num = -1
+                if req[1] in data_types:
+                    self.basicblocks[-1].instructions.append(
+                        Compiler.instructions.use(
+                            field_types[req[0]], data_types[req[1]], num, add_to_prog=False
+                        )
                     )
-                if block.exit_condition is not None:
-                    jump = block.exit_condition.get_relative_jump()
-                    if (
-                        isinstance(jump, int)
-                        and jump < 0
-                        and block.exit_block.scope is not None
-                    ):
-                        alloc_loop(block.exit_block.scope)
-                usage = allocator.max_usage.copy()
-                allocator.process(block.instructions, block.alloc_pool)
-                if self.program.verbose and usage != allocator.max_usage:
-                    print("Allocated registers in %s " % block.name, end="")
-                    for t, n in allocator.max_usage.items():
-                        if n > usage[t]:
-                            print("%s:%d " % (t, n - usage[t]), end="")
-                    print()
-            allocator.finalize(options)
-            if self.program.verbose:
-                print("Tape register usage:", dict(allocator.max_usage))
-                scopes = set(block.alloc_pool for block in self.basicblocks)
-                n_fragments = sum(scope.n_fragments() for scope in scopes)
-                print("%d register fragments in %d scopes" % (n_fragments, len(scopes)))
-
-        # offline data requirements
-        if self.program.verbose:
-            print("Compile offline data requirements...")
-        for block in self.basicblocks:
-            block.req_node.add_block(block)
-        self.req_num = self.req_tree.aggregate()
-        if self.program.verbose:
-            print("Tape requires", self.req_num)
-        for req, num in sorted(self.req_num.items()):
-            if num == float("inf") or num >= 2**64:
-                num = -1
-            if req[1] in data_types:
-                self.basicblocks[-1].instructions.append(
-                    Compiler.instructions.use(
-                        field_types[req[0]], data_types[req[1]], num, add_to_prog=False
+                elif req[1] == "input":
+                    self.basicblocks[-1].instructions.append(
+                        Compiler.instructions.use_inp(
+                            field_types[req[0]], req[2], num, add_to_prog=False
+                        )
                     )
-                )
-            elif req[1] == "input":
-                self.basicblocks[-1].instructions.append(
-                    Compiler.instructions.use_inp(
-                        field_types[req[0]], req[2], num, add_to_prog=False
+                elif req[0] == "modp":
+                    self.basicblocks[-1].instructions.append(
+                        Compiler.instructions.use_prep(req[1], num, add_to_prog=False)
                     )
-                )
-            elif req[0] == "modp":
-                self.basicblocks[-1].instructions.append(
-                    Compiler.instructions.use_prep(req[1], num, add_to_prog=False)
-                )
-            elif req[0] == "gf2n":
-                self.basicblocks[-1].instructions.append(
-                    Compiler.instructions.guse_prep(req[1], num, add_to_prog=False)
-                )
-            elif req[0] == "edabit":
-                self.basicblocks[-1].instructions.append(
-                    Compiler.instructions.use_edabit(
-                        False, req[1], num, add_to_prog=False
+                elif req[0] == "gf2n":
+                    self.basicblocks[-1].instructions.append(
+                        Compiler.instructions.guse_prep(req[1], num, add_to_prog=False)
                     )
-                )
-            elif req[0] == "sedabit":
-                self.basicblocks[-1].instructions.append(
-                    Compiler.instructions.use_edabit(
-                        True, req[1], num, add_to_prog=False
+                elif req[0] == "edabit":
+                    self.basicblocks[-1].instructions.append(
+                        Compiler.instructions.use_edabit(
+                            False, req[1], num, add_to_prog=False
+                        )
                     )
-                )
-            elif req[0] == "matmul":
-                self.basicblocks[-1].instructions.append(
-                    Compiler.instructions.use_matmul(*req[1], num, add_to_prog=False)
-                )
-
-        if not self.is_empty():
-            # bit length requirement
-            for x in ("p", "2"):
-                if self.req_bit_length[x]:
-                    bl = self.req_bit_length[x]
-                    if self.program.options.ring:
-                        bl = -int(self.program.options.ring)
+                elif req[0] == "sedabit":
                     self.basicblocks[-1].instructions.append(
-                        Compiler.instructions.reqbl(bl, add_to_prog=False)
+                        Compiler.instructions.use_edabit(
+                            True, req[1], num, add_to_prog=False
+                        )
+                    )
+                elif req[0] == "matmul":
+                    self.basicblocks[-1].instructions.append(
+                        Compiler.instructions.use_matmul(*req[1], num, add_to_prog=False)
                     )
-            if self.program.verbose:
-                print("Tape requires prime bit length", self.req_bit_length["p"])
-                print("Tape requires galois bit length", self.req_bit_length["2"])
+
+            if not self.is_empty():
+                # bit length requirement
+                for x in ("p", "2"):
+                    if self.req_bit_length[x]:
+                        bl = self.req_bit_length[x]
+                        if self.program.options.ring:
+                            bl = -int(self.program.options.ring)
+                        self.basicblocks[-1].instructions.append(
+                            Compiler.instructions.reqbl(bl, add_to_prog=False)
+                        )
+                if self.program.verbose:
+                    print("Tape requires prime bit length", self.req_bit_length["p"])
+                    print("Tape requires galois bit length", self.req_bit_length["2"])
 
     @unpurged
     def expand_cisc(self):
@@ -1287,14 +1310,13 @@ class Tape:
         if "Bytecode" not in filename:
             filename = self.program.programs_dir + "/Bytecode/" + filename
         print("Writing to", filename)
-        f = open(filename, "wb")
         h = hashlib.sha256()
-        for i in self._get_instructions():
-            if i is not None:
-                b = i.get_bytes()
-                f.write(b)
-                h.update(b)
-        f.close()
+        with self.program.profile("bytecode", self), open(filename, "wb") as f:
+            for i in self._get_instructions():
+                if i is not None:
+                    b = i.get_bytes()
+                    f.write(b)
+                    h.update(b)
         self.hash = h.digest()
 
     def new_reg(self, reg_type, size=None):
@@ -1527,7 +1549,15 @@ class Tape:
                     reg_type = RegType.ClearGF2N
                 elif reg_type == RegType.SecretModp:
                     reg_type = RegType.SecretGF2N
-            self.reg_type = reg_type
+            # the types in Compiler.types fix the register type per class
+            if isinstance(type(self).reg_type, str):
+                if reg_type != type(self).reg_type:
+                    raise CompilerError(
+                        "cannot create %s register of type %s"
+                        % (type(self).__name__, reg_type)
+                    )
+            else:
+                self.reg_type = reg_type
             self.program = program
             self.block = program.active_basicblock
             if size is None:
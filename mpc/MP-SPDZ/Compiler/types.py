@@ -238,6 +238,7 @@ def inputmixed(*args):
 
 class _number(Tape._no_truth):
     """ Number functionality. """
+    __slots__ = []
 
     def square(self):
         """ Square. """
@@ -354,6 +355,7 @@ class _number(Tape._no_truth):
 
 class _int(Tape._no_truth):
     """ Integer functionality. """
+    __slots__ = []
 
     @staticmethod
     def bit_adder(*args, **kwargs):
@@ -442,6 +444,7 @@ class _int(Tape._no_truth):
 
 class _bit(Tape._no_truth):
     """ Binary functionality. """
+    __slots__ = []
 
     def bit_xor(self, other):
         """ XOR in binary circuits.
@@ -486,6 +489,7 @@ class _bit(Tape._no_truth):
 
 class _gf2n(_bit):
     """ :math:`\mathrm{GF}(2^n)` functionality. """
+    __slots__ = []
 
     def if_else(self, a, b):
         """ MUX in :math:`\mathrm{GF}(2^n)` circuits. Similar to :py:meth:`_int.if_else`. """
@@ -512,6 +516,7 @@ class _gf2n(_bit):
 
 class _structure(Tape._no_truth):
     """ Interface for type-dependent container types. """
+    __slots__ = []
 
     MemValue = classmethod(lambda cls, value: MemValue(cls.conv(value)))
     """ Type-dependent memory value. """
@@ -561,6 +566,8 @@ class _structure(Tape._no_truth):
         return 1
 
 class _secret_structure(_structure):
+    __slots__ = []
+
     @classmethod
     def input_tensor_from(cls, player, shape):
         """ Input tensor secretly from player.
@@ -681,6 +688,8 @@ class _vec(Tape._no_truth):
             x.link(y)
 
 class _register(Tape.Register, _number, _structure):
+    __slots__ = []
+
     @staticmethod
     def n_elements():
         return 1
@@ -845,6 +854,7 @@ class _register(Tape.Register, _number, _structure):
 
 class _arithmetic_register(_register):
     """ Arithmetic circuit type. """
+    __slots__ = []
     def __init__(self, *args, **kwargs):
         if program.options.garbled:
             raise CompilerError('functionality only available in arithmetic circuits')
@@ -2603,19 +2613,22 @@ class sint(_secret, _int):
         writesocketshare(client_id, message_type, values[0].size, *values)
 
     @classmethod
-    def read_from_file(cls, start, n_items):
+    def read_from_file(cls, start, n_items, size=1):
         """ Read shares from
         ``Persistence/Transactions-P<playerno>.data``. See :ref:`this
         section <persistence>` for details on the data format.
 
         :param start: starting position in number of shares from beginning (int/regint/cint)
         :param n_items: number of items (int)
+        :param size: vector size of every item, i.e., ``sint.read_from_file(start,
+          1, size=n)`` reads ``n`` consecutive shares into a single vector
+          with one instruction (int, default 1)
         :returns: destination for final position, -1 for eof reached, or -2 for file not found (regint)
         :returns: list of shares
         """
-        shares = [cls(size=1) for i in range(n_items)]
+        shares = [cls(size=size) for i in range(n_items)]
         stop = regint()
-        readsharesfromfile(regint.conv(start), stop, *shares)
+        readsharesfromfile(regint.conv(start), stop, size, *shares)
         return stop, shares
 
     @staticmethod
@@ -3097,6 +3110,7 @@ class sint(_secret, _int):
 class sintbit(sint):
     """ :py:class:`sint` holding a bit, supporting binary operations
     (``&, |, ^``). """
+    __slots__ = []
     @classmethod
     def prep_res(cls, other):
         return sint()
@@ -3912,7 +3926,8 @@ class cfix(_number, _structure):
     :param v: cfix/float/int
 
     """
-    __slots__ = ['value', 'f', 'k']
+    # the precision set per instance overrides the class attributes
+    __slots__ = ['value', 'f', 'k', '__dict__']
     reg_type = 'c'
     scalars = (int, float, regint, cint)
     @classmethod
@@ -4414,6 +4429,7 @@ class _single(_number, _secret_structure):
         :param start: starting position in number of shares from beginning
             (int/regint/cint)
         :param n_items: number of items (int)
+        :param size: vector size of every item (int, default 1)
         :returns: destination for final position, -1 for eof reached,
              or -2 for file not found (regint)
         :returns: list of shares
@@ -5002,7 +5018,8 @@ cfix.set_precision(16, 31)
 
 class squant(_single):
     """ Quantization as in ArXiv:1712.05877v1 """
-    __slots__ = ['params']
+    # the parameters set per instance override the class attribute
+    __slots__ = ['params', '__dict__']
     int_type = sint
     clamp = True
 
@@ -6114,8 +6131,8 @@ class Array(_vectorizable):
         res = MemValue(0)
         @library.multithread(None, len(self), max_size=program.budget)
         def _(base, size):
-            stop, shares = self.value_type.read_from_file(start, size)
-            self.assign(shares, base=base)
+            stop, shares = self.value_type.read_from_file(start, 1, size=size)
+            self.assign_vector(shares[0], base=base)
             start.iadd(size)
             res.write(stop)
         return res
@@ -6652,11 +6669,22 @@ class SubMultiArray(_vectorizable):
         :returns: destination for final position, -1 for eof reached,
              or -2 for file not found (regint)
         """
-        start = MemValue(start)
-        @library.for_range(len(self))
-        def _(i):
-            start.write(self[i].read_from_file(start))
-        return start
+        if self.value_type.n_elements() != 1 or \
+           self.value_type.mem_size() != 1:
+            start = MemValue(start)
+            @library.for_range(len(self))
+            def _(i):
+                start.write(self[i].read_from_file(start))
+            return start
+        start = regint(start)
+        res = MemValue(0)
+        @library.multithread(None, self.total_size(), max_size=program.budget)
+        def _(base, size):
+            stop, shares = self.value_type.read_from_file(start, 1, size=size)
+            self.assign_vector(shares[0], base=base)
+            start.iadd(size)
+            res.write(stop)
+        return res
 
     def write_to_socket(self, socket, debug=False):
         """ Write content to socket. """
@@ -55,11 +55,12 @@ void Binary_File_IO::read_from_file(const string filename, vector< T >& buffer,
 
   int size_in_bytes = T::size() * buffer.size();
   int n_read = 0;
-  char read_buffer[size_in_bytes];
+  // on the heap, vectorized reads can exceed the stack size
+  vector<char> read_buffer(size_in_bytes);
   inf.seekg(start_posn * T::size(), iostream::cur);
   do
   {
-      inf.read(read_buffer + n_read, size_in_bytes - n_read);
+      inf.read(read_buffer.data() + n_read, size_in_bytes - n_read);
       n_read += inf.gcount();
 
       if (inf.eof())
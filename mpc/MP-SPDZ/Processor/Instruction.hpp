@@ -328,11 +328,12 @@ void BaseInstruction::parse_operands(istream& s, int pos, int file_pos)
         break;
 
       // read from file, input is opcode num_args, 
-      //   start_file_posn (read), end_file_posn(write) var1, var2, ...
+      //   start_file_posn (read), end_file_posn(write), vector size, var1, var2, ...
       case READFILESHARE:
-        num_var_args = get_int(s) - 2;
+        num_var_args = get_int(s) - 3;
         r[0] = get_int(s);
         r[1] = get_int(s);
+        n = get_int(s);
         get_vector(num_var_args, start, s);
         break;
 
@@ -816,6 +817,7 @@ unsigned BaseInstruction::get_max_reg(int reg_type) const
   case READSOCKETS:
   case READSOCKETC:
   case READSOCKETINT:
+  case READFILESHARE:
   case WRITESOCKETSHARE:
   case WRITESOCKETC:
   case WRITESOCKETINT:
@@ -1328,7 +1330,7 @@ inline void Instruction::execute(Processor<sint, sgf2n>& Proc) const
         break;
       case READFILESHARE:
         // Read shares from file system
-        Proc.read_shares_from_file(Proc.read_Ci(r[0]), r[1], start);
+        Proc.read_shares_from_file(Proc.read_Ci(r[0]), r[1], start, n);
         break;        
       case PUBINPUT:
         Proc.get_Cp_ref(r[0]) = Proc.template
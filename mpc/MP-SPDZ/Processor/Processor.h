@@ -275,7 +275,7 @@ class Processor : public ArithmeticProcessor
       int size, bool send_macs);
 
   // Read and write secret numeric data to file (name hardcoded at present)
-  void read_shares_from_file(int start_file_pos, int end_file_pos_register, const vector<int>& data_registers);
+  void read_shares_from_file(int start_file_pos, int end_file_pos_register, const vector<int>& data_registers, int size = 1);
   void write_shares_to_file(long start_pos, const vector<int>& data_registers);
   
   cint get_inverse2(unsigned m);
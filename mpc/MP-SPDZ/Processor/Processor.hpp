@@ -400,26 +400,24 @@ void Processor<sint, sgf2n>::read_socket_private(int client_id,
 // file_pos_register is written with new file position (-1 is eof).
 // Tolerent to no file if no shares yet persisted.
 template<class sint, class sgf2n>
-void Processor<sint, sgf2n>::read_shares_from_file(int start_file_posn, int end_file_pos_register, const vector<int>& data_registers) {
+void Processor<sint, sgf2n>::read_shares_from_file(int start_file_posn, int end_file_pos_register, const vector<int>& data_registers, int size) {
   if (not sint::real_shares(P))
     return;
 
   string filename;
   filename = binary_file_io.filename(P.my_num());
 
-  unsigned int size = data_registers.size();
-
-  vector< sint > outbuf(size);
+  // every register is a vector of {size} consecutive shares
+  vector< sint > outbuf(data_registers.size() * size);
 
   int end_file_posn = start_file_posn;
 
   try {
     binary_file_io.read_from_file(filename, outbuf, start_file_posn, end_file_posn);
 
-    for (unsigned int i = 0; i < size; i++)
-    {
-      get_Sp_ref(data_registers[i]) = outbuf[i];
-    }
+    for (unsigned int i = 0; i < data_registers.size(); i++)
+      for (int j = 0; j < size; j++)
+        get_Sp_ref(data_registers[i] + j) = outbuf[i * size + j];
 
     write_Ci(end_file_pos_register, (long)end_file_posn);    
   }
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+
+#     ===== Batch compilation =====
+#
+# ./compile_batch.py [options] program[,arg...] ...
+#
+# compiles every program (with its comma-separated arguments) like
+# ./compile.py [options] program [arg...] would, and
+#
+# ./compile_batch.py [options] --template template param[,arg...] ...
+#
+# compiles the template once per parameter list, e.g.
+#
+# ./compile_batch.py -R64 --template heartbeat_inference_demo_batched 1 2 4,class
+#
+# The compilations run in a pool of forked processes (-j, default: number
+# of CPUs) that share the Compiler modules imported once by this process.
+# A summary of the time and bytecode size of every program is printed at
+# the end. All other options are those of compile.py.
+import contextlib
+import io
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+from Compiler.compilerLib import Compiler
+
+
+class BatchCompiler(Compiler):
+    def build_option_parser(self):
+        super().build_option_parser()
+        self.parser.usage = (
+            "usage: %prog [options] program[,arg...] ...\n"
+            "       %prog [options] --template template param[,arg...] ..."
+        )
+        self.parser.add_option(
+            "-j",
+            "--jobs",
+            dest="jobs",
+            type="int",
+            default=os.cpu_count(),
+            help="number of parallel compilations (default: number of CPUs)",
+        )
+        self.parser.add_option(
+            "--template",
+            dest="template",
+            help="compile this program once per parameter list",
+        )
+
+    def parse_args(self):
+        super().parse_args()
+        # the driver options do not change the compilation (or its cache key)
+        del self.options.jobs
+        del self.options.template
+
+
+def warm_up():
+    """Import the modules used by every compilation before forking."""
+    from Compiler import (comparison, floatingpoint, instructions, library,
+                          ml, types)
+
+
+def compile_program(job):
+    """Compile one program in a pool process.
+
+    :returns: program name, status, seconds, bytecode size, compiler output
+    """
+    options, args = job
+    output = io.StringIO()
+    start = time.perf_counter()
+    name = " ".join(args)
+    try:
+        with contextlib.redirect_stdout(output):
+            compiler = BatchCompiler(options + args)
+            compiler.prep_compile()
+            name = compiler.prog.name
+            compiler.compile_file()
+        status = "compiled"
+        if compiler.cache is not None and compiler.cache.hits:
+            status = "cached"
+        size = sum(os.path.getsize(path) for path in compiler.outputs
+                   if path.endswith(".bc"))
+    except (Exception, SystemExit):
+        output.write(traceback.format_exc())
+        status, size = "failed", 0
+    return name, status, time.perf_counter() - start, size, output.getvalue()
+
+
+def main(argv):
+    compiler = BatchCompiler(argv)
+    compiler.parser.disable_interspersed_args()
+    options, specs = compiler.parser.parse_args(argv)
+    if not specs:
+        compiler.parser.print_help()
+        exit(1)
+    option_args = argv[:len(argv) - len(specs)]
+
+    if options.template:
+        jobs = [[options.template] + spec.split(",") for spec in specs]
+    else:
+        jobs = [spec.split(",") for spec in specs]
+
+    warm_up()
+    start = time.perf_counter()
+    context = multiprocessing.get_context("fork")
+    # a fresh process per program, the compiler keeps global state
+    with context.Pool(min(options.jobs, len(jobs)), maxtasksperchild=1) as pool:
+        results = pool.map(compile_program, [(option_args, args) for args in jobs],
+                           chunksize=1)
+    total = time.perf_counter() - start
+
+    width = max(len(name) for name, *_ in results)
+    for name, status, seconds, size, output in results:
+        if status == "failed" or options.verbose:
+            print(output)
+    print("%-*s  %-8s  %8s  %12s" % (width, "program", "status", "time [s]",
+                                      "bytecode [B]"))
+    for name, status, seconds, size, _ in results:
+        print("%-*s  %-8s  %8.2f  %12d" % (width, name, status, seconds, size))
+    print("%d programs in %.2f s with %d processes" %
+          (len(results), total, min(options.jobs, len(jobs))))
+    if any(status == "failed" for _, status, *_ in results):
+        exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
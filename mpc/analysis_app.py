@@ -1,3 +1,4 @@
+import math
 import ssl
 import ulid
 
@@ -56,7 +57,8 @@ class AnalysisApp:
              - streaming (list of lists, optional) defaults to None
 
             Returns:
-                JSON: The response containing the analysis status.
+                JSON: The response containing the analysis status and the estimated wait in seconds.
+                    429 with a Retry-After header if the queue has no capacity for the analyses.
             """
             if request.method == 'POST':
                 
@@ -96,13 +98,20 @@ class AnalysisApp:
                 except ValueError as e:
                     return jsonify(error=str(e)), 400
 
-                task_manager.request_queue.put((analysis_ids, user_ids, analysis_type, data_indeces, online_only, streaming)) 
+                queued_request = (analysis_ids, user_ids, analysis_type, data_indeces, online_only, streaming)
+                estimated_wait = task_manager.request_queue.estimated_wait(queued_request)
+                if not task_manager.submit(queued_request):
+                    for analysis_id in analysis_ids:
+                        self.timer.cancel(analysis_id)
+                    response = jsonify(error='Too many queued analyses, retry later.', estimated_wait=estimated_wait)
+                    response.headers['Retry-After'] = str(max(1, math.ceil(task_manager.request_queue.retry_after(queued_request))))
+                    return response, 429
                 try: 
                     for analysis_id in analysis_ids:
                         self.db.create_entry(analysis_id)
                 except Exception as e:
                     return jsonify(error=f'Database error when creating an entry: {e}'), 500
-                return jsonify(status='Requests added to the queue'), 201
+                return jsonify(status='Requests added to the queue', estimated_wait=estimated_wait), 201
             
         @self.app.route('/offline/', methods=['GET'])
         def prepare_offline():
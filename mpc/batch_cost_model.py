@@ -0,0 +1,223 @@
+"""
+Compile-time cost model of the batched inference programs and batch-size recommender.
+
+Compiles the template (by default MP-SPDZ/Programs/Source/heartbeat_inference_demo_batched.mpc) for every batch size and reads the
+online rounds, triples, bits and opens that the compiler reports (Program.req_num). Together with the per-item costs in seconds, either
+given as JSON (--costs) or fitted to the stage latencies measured by benchmark.py (--calibrate), it predicts the latency and throughput
+of a batch of every size:
+
+    latency = batch + rounds * <virtual machine rounds> + triples * <integer triples> + bits * <integer bits> + opens * <integer opens>
+
+where batch is the fixed cost of running a batch (starting the parties, loading the model).
+
+A request of n samples is served by the smallest supported batch size of at least n (padding the rest), so supporting fewer batch sizes
+costs latency. For every number of supported batch sizes, it chooses the sizes among the candidates that minimize the mean predicted
+latency over the request sizes (by default every size up to the largest candidate, equally likely), and recommends the smallest set
+within --tolerance of supporting all candidates.
+
+Usage (from the mpc directory):
+    python3 benchmark.py --batch-sizes 1 16 64 256 1024 --json benchmark.json
+    python3 batch_cost_model.py --calibrate benchmark.json --json batch_cost_model.json
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+import numpy as np
+
+from compile_benchmark import parse_compiler_cost
+from config import supported_batch_sizes
+
+TEMPLATE = 'heartbeat_inference_demo_batched'
+# per-item costs of the model: the fixed cost of a batch and the compiler statistics
+COST_TYPES = ['batch', 'virtual machine rounds', 'integer triples', 'integer bits', 'integer opens']
+# stages of benchmark.py that run MP-SPDZ
+MPC_STAGES = ['preprocessing', 'inference']
+
+
+def compile_cost(batch_size, template=TEMPLATE, args=(), mpspdz_dir='MP-SPDZ'):
+    """
+    Compile {template} for {batch_size} with the further compile arguments {args}.
+
+    Returns:
+        dict: Number of items per cost type (see COST_TYPES), with batch 1.
+
+    Raises:
+        ValueError: If the number of rounds is unbounded (e.g. a loop with a run-time bound).
+    """
+    command = [sys.executable, 'compile.py', '-R64', template, str(batch_size)] + [str(arg) for arg in args]
+    result = subprocess.run(command, capture_output=True, text=True, check=True, cwd=mpspdz_dir)
+    cost = parse_compiler_cost(result.stdout)
+    if any(cost.get(name, 0) == float('inf') for name in COST_TYPES):
+        raise ValueError(f'{template} has unbounded cost for batch size {batch_size}')
+    return {name: 1 if name == 'batch' else cost.get(name, 0) for name in COST_TYPES}
+
+
+def predict_latency(cost, costs):
+    """
+    Predict the latency in seconds of a program with the compiler statistics {cost} (see compile_cost) given the seconds per item
+    {costs} (missing cost types are free).
+    """
+    return sum(cost[name] * costs.get(name, 0) for name in COST_TYPES)
+
+
+def stage_latencies(report, stages=MPC_STAGES):
+    """
+    Sum the median latencies of {stages} per batch size in a report of benchmark.py.
+
+    Returns:
+        dict: Seconds per batch size.
+    """
+    latencies = {}
+    for entry in report:
+        medians = [entry['stages'][stage]['p50'] for stage in stages if entry['stages'].get(stage, {}).get('p50') is not None]
+        if medians:
+            latencies[entry['batch_size']] = sum(medians)
+    return latencies
+
+
+def fit_costs(counts, latencies):
+    """
+    Fit non-negative seconds per item to measured latencies by least squares, dropping the cost types with negative weight.
+
+    Arguments:
+        counts (dict): Compiler statistics per batch size (see compile_cost).
+        latencies (dict): Measured seconds per batch size.
+
+    Returns:
+        dict: Seconds per item of every cost type.
+    """
+    batch_sizes = sorted(set(counts) & set(latencies))
+    if not batch_sizes:
+        raise ValueError('no measured latency for the compiled batch sizes')
+    matrix = np.array([[counts[batch_size][name] for name in COST_TYPES] for batch_size in batch_sizes], dtype=float)
+    target = np.array([latencies[batch_size] for batch_size in batch_sizes], dtype=float)
+    # scale the columns, the counts differ by orders of magnitude
+    scale = np.maximum(matrix.max(axis=0), 1)
+    active = list(range(len(COST_TYPES)))
+    while True:
+        weights = np.zeros(len(COST_TYPES))
+        solution = np.linalg.lstsq(matrix[:, active] / scale[active], target, rcond=None)[0]
+        weights[active] = solution / scale[active]
+        negative = [index for index in active if weights[index] < 0]
+        if not negative:
+            return {name: float(weight) for name, weight in zip(COST_TYPES, weights)}
+        active.remove(min(negative, key=lambda index: weights[index] * scale[index]))
+
+
+def choose_buckets(latencies, request_sizes, n_buckets):
+    """
+    Choose {n_buckets} batch sizes among the candidates that minimize the mean latency of serving {request_sizes}, every request with
+    the smallest chosen batch size that fits it.
+
+    Arguments:
+        latencies (dict): Predicted seconds per candidate batch size.
+        request_sizes (list): Number of samples of every request (repeated to weigh them).
+        n_buckets (int): Number of batch sizes to choose (at most the number of candidates).
+
+    Returns:
+        tuple: The chosen batch sizes (increasing) and the mean latency per request.
+    """
+    candidates = sorted(latencies)
+    if max(request_sizes) > candidates[-1]:
+        raise ValueError(f'request of {max(request_sizes)} samples larger than the largest batch size {candidates[-1]}')
+    # weight[j]: number of requests larger than candidate j - 1 and at most candidate j
+    bounds = [0] + candidates
+    weight = [sum(1 for n in request_sizes if bounds[j] < n <= bounds[j + 1]) for j in range(len(candidates))]
+    covered = np.cumsum(weight)
+    # best[k][j]: lowest total latency of the requests up to candidate j with k + 1 batch sizes, the largest being candidate j
+    best = [[covered[j] * latencies[candidates[j]] for j in range(len(candidates))]]
+    previous = [[None] * len(candidates)]
+    for k in range(1, n_buckets):
+        best.append([float('inf')] * len(candidates))
+        previous.append([None] * len(candidates))
+        for j in range(k, len(candidates)):
+            for i in range(k - 1, j):
+                total = best[k - 1][i] + (covered[j] - covered[i]) * latencies[candidates[j]]
+                if total < best[k][j]:
+                    best[k][j], previous[k][j] = total, i
+    k, j = n_buckets - 1, len(candidates) - 1
+    buckets = []
+    while j is not None:
+        buckets.append(candidates[j])
+        j = previous[k][j]
+        k -= 1
+    return sorted(buckets), float(best[n_buckets - 1][-1] / len(request_sizes))
+
+
+def recommend(latencies, request_sizes=None, tolerance=0.05):
+    """
+    Choose the batch sizes for every number of supported sizes and recommend the smallest set whose mean latency is within
+    {tolerance} of supporting all candidates.
+
+    Arguments:
+        latencies (dict): Predicted seconds per candidate batch size.
+        request_sizes (list, optional): Number of samples of every request. Defaults to every size up to the largest candidate.
+        tolerance (float, optional): Accepted relative increase of the mean latency. Defaults to 0.05.
+
+    Returns:
+        tuple: The recommended batch sizes and, per number of batch sizes, a dict with the batch sizes and the mean latency.
+    """
+    if request_sizes is None:
+        request_sizes = list(range(1, max(latencies) + 1))
+    choices = []
+    for n_buckets in range(1, len(latencies) + 1):
+        buckets, mean_latency = choose_buckets(latencies, request_sizes, n_buckets)
+        choices.append({'n_buckets': n_buckets, 'batch_sizes': buckets, 'mean_latency': mean_latency})
+    limit = choices[-1]['mean_latency'] * (1 + tolerance)
+    recommended = next(choice['batch_sizes'] for choice in choices if choice['mean_latency'] <= limit)
+    return recommended, choices
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Predict the latency and throughput of the batched inference program per batch size and recommend the batch sizes to support')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=supported_batch_sizes(), help='candidate batch sizes (default: all supported)')
+    parser.add_argument('--template', default=TEMPLATE, help='program template in MP-SPDZ/Programs/Source')
+    parser.add_argument('--args', nargs='*', default=[], help='compile arguments after the batch size (e.g. class or softmax=poly)')
+    costs_group = parser.add_mutually_exclusive_group(required=True)
+    costs_group.add_argument('--costs', help='JSON file with the seconds per item of every cost type (see COST_TYPES)')
+    costs_group.add_argument('--calibrate', help='JSON report of benchmark.py to fit the seconds per item to')
+    parser.add_argument('--stages', nargs='+', default=MPC_STAGES, help='stages of the benchmark report to fit to')
+    parser.add_argument('--request-sizes', type=int, nargs='+', default=None,
+                        help='observed numbers of samples per request (default: every size up to the largest batch size)')
+    parser.add_argument('--tolerance', type=float, default=0.05, help='accepted relative increase of the mean latency')
+    parser.add_argument('--json', dest='json_path', default=None, help='path of the JSON report')
+    args = parser.parse_args()
+
+    counts = {batch_size: compile_cost(batch_size, args.template, args.args) for batch_size in args.batch_sizes}
+    if args.costs is not None:
+        with open(args.costs, 'r') as file:
+            costs = json.load(file)
+    else:
+        with open(args.calibrate, 'r') as file:
+            measured = stage_latencies(json.load(file), args.stages)
+        # the measured batch sizes need not be candidates
+        for batch_size in set(measured) - set(counts):
+            counts[batch_size] = compile_cost(batch_size, args.template, args.args)
+        costs = fit_costs(counts, measured)
+    latencies = {batch_size: predict_latency(counts[batch_size], costs) for batch_size in args.batch_sizes}
+    recommended, choices = recommend(latencies, args.request_sizes, args.tolerance)
+
+    predictions = [{'batch_size': batch_size, 'cost': counts[batch_size], 'latency': latencies[batch_size],
+                    'samples_per_second': batch_size / latencies[batch_size] if latencies[batch_size] else None}
+                   for batch_size in sorted(latencies)]
+    if args.json_path is not None:
+        with open(args.json_path, 'w') as file:
+            json.dump({'template': args.template, 'args': args.args, 'costs': costs, 'predictions': predictions,
+                       'choices': choices, 'recommended': recommended}, file, indent=2)
+    print('seconds per item: ' + ' '.join(f'{name}={costs.get(name, 0):.3g}' for name in COST_TYPES))
+    for prediction in predictions:
+        cost = prediction['cost']
+        throughput = prediction['samples_per_second']
+        print(f'batch_size={prediction["batch_size"]:5d} rounds={cost["virtual machine rounds"]:5d} '
+              f'triples={cost["integer triples"]:9d} bits={cost["integer bits"]:8d} '
+              f'latency={prediction["latency"]:8.3f}s samples/s={throughput if throughput is not None else float("nan"):9.2f}')
+    for choice in choices:
+        print(f'{choice["n_buckets"]:2d} batch sizes: mean latency {choice["mean_latency"]:.3f}s '
+              f'{" ".join(str(batch_size) for batch_size in choice["batch_sizes"])}')
+    print(f'recommended batch sizes: {" ".join(str(batch_size) for batch_size in recommended)}')
+
+
+if __name__ == '__main__':
+    main()
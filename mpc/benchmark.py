@@ -0,0 +1,344 @@
+"""
+End-to-end throughput benchmark of the three-party pipeline.
+
+Brings up the three MPC parties on localhost (one TaskManager per party, each with its own rep3aes config and MP-SPDZ port base), serves
+generated encrypted ECG samples through a fake Obelisk and reports samples per second and p50/p99 latencies per processing stage.
+
+Usage (from the mpc directory, with rep3aes and MP-SPDZ built):
+    python3 benchmark.py --batch-sizes 1 4 16 --repeats 5 --json benchmark.json --csv benchmark.csv
+"""
+import argparse
+import csv
+import json
+import os
+import secrets
+import struct
+import sys
+import tempfile
+import time
+import uuid
+
+import numpy as np
+import ulid
+from Crypto.Cipher import AES
+from flask import Flask
+
+from config import OUTPUT_MODES, Config, supported_batch_sizes
+from database import Database
+from key_share import encrypt_key_share, prepare_params_for_dist_enc
+from rep3aes import Rep3AesConfig
+from task_manager import TaskManager
+from timing import AnalysisTimer
+
+ANALYSIS_TYPE = "Heartbeat-Demo-1"
+STAGES = ['fetch', 'key_share_decrypt', 'dist_dec', 'write_shares', 'compile', 'preprocessing', 'inference', 'read_shares', 'dist_enc', 'store_result']
+REP3AES_BIN = 'rep3aes/target/release/rep3-aes-mozaik'
+BENCHMARK_HOSTS = 'HOSTS-benchmark'
+
+
+class FakeObelisk:
+    """
+    FakeObelisk serves the data and key shares of one party from memory, in place of MozaikObelisk.
+
+    Attributes:
+        data (dict): Encrypted samples for each analysis ID.
+        key_shares (dict): Encrypted key share of this party for each analysis ID.
+        results (dict): Encrypted results stored for each analysis ID.
+    """
+    def __init__(self):
+        self.data = {}
+        self.key_shares = {}
+        self.results = {}
+
+    def add_analysis(self, analysis_id, samples, encrypted_key_share):
+        """
+        Register the samples and key share that are returned for {analysis_id}.
+
+        Arguments:
+            analysis_id (str): The analysis ID.
+            samples (list): The encrypted samples (bytes) of the user.
+            encrypted_key_share (bytes): The key share encrypted for this party.
+        """
+        self.data[analysis_id] = samples
+        self.key_shares[analysis_id] = encrypted_key_share
+
+    def get_data(self, analysis_ids, user_ids, data_indeces):
+        return [self.data[analysis_id] for analysis_id in analysis_ids]
+
+    def get_key_share(self, analysis_ids):
+        return [self.key_shares[analysis_id] for analysis_id in analysis_ids]
+
+    def store_result(self, analysis_ids, user_ids, results):
+        for analysis_id, result in zip(analysis_ids, results):
+            self.results[analysis_id] = result
+
+
+def load_ecg_sample(path='sample.txt'):
+    """
+    Load a heartbeat sample (187 floats) and encode it in fixed point with 8 fractional bits as 64-bit little endian integers.
+
+    Arguments:
+        path (str, optional): The file containing the sample. Defaults to 'sample.txt'.
+
+    Returns:
+        bytes: The encoded sample.
+    """
+    with open(path, 'r') as file:
+        numbers = file.readline().split()
+    return b''.join(struct.pack('<q', int(round(float(num) * 2**8))) for num in numbers)
+
+
+def encrypt_sample(aes_key, user_id, plaintext):
+    """
+    Encrypt a sample with AES-GCM-128 in the format sent by the IoT devices: nonce || ciphertext || tag.
+
+    Arguments:
+        aes_key (bytes): The 16-byte key of the user.
+        user_id (str): The user ID (bound as associated data).
+        plaintext (bytes): The encoded sample.
+    """
+    nonce = secrets.token_bytes(12)
+    instance = AES.new(key=aes_key, mode=AES.MODE_GCM, nonce=nonce)
+    instance.update(bytes(user_id, encoding='utf-8') + nonce)
+    ciphertext, tag = instance.encrypt_and_digest(plaintext)
+    return nonce + ciphertext + tag
+
+
+def share_key(aes_key):
+    """
+    XOR-share {aes_key} between the three parties.
+
+    Returns:
+        list: The three key shares.
+    """
+    share1 = secrets.token_bytes(len(aes_key))
+    share2 = secrets.token_bytes(len(aes_key))
+    share3 = bytes(k ^ s1 ^ s2 for k, s1, s2 in zip(aes_key, share1, share2))
+    return [share1, share2, share3]
+
+
+def decrypt_result(keys, aes_key, user_id, analysis_id, result):
+    """
+    Decrypt and authenticate a result stored by the parties, as done by the client.
+
+    Returns:
+        bytes: The plaintext result (one 64-bit value per output of a sample, see config.OUTPUT_MODES).
+    """
+    (nonce, ad) = prepare_params_for_dist_enc(keys, user_id, analysis_id, ANALYSIS_TYPE)
+    ciphertext = bytes.fromhex(result)
+    instance = AES.new(key=aes_key, mode=AES.MODE_GCM, nonce=nonce)
+    instance.update(ad)
+    return instance.decrypt_and_verify(ciphertext[:-16], ciphertext[-16:])
+
+
+def summarize(values):
+    """
+    Summarize a list of durations in seconds.
+
+    Returns:
+        dict: count, mean, p50 and p99 of the values.
+    """
+    if len(values) == 0:
+        return {'count': 0, 'mean': None, 'p50': None, 'p99': None}
+    return {
+        'count': len(values),
+        'mean': float(np.mean(values)),
+        'p50': float(np.percentile(values, 50)),
+        'p99': float(np.percentile(values, 99)),
+    }
+
+
+def build_report(runs):
+    """
+    Aggregate the measured runs per batch size.
+
+    Arguments:
+        runs (list): List of dicts with keys batch_size, total (seconds) and stages (dict stage -> seconds).
+
+    Returns:
+        list: One entry per batch size with samples_per_second, the total latency and the latency of each stage.
+    """
+    report = []
+    for batch_size in sorted(set(run['batch_size'] for run in runs)):
+        batch_runs = [run for run in runs if run['batch_size'] == batch_size]
+        total = summarize([run['total'] for run in batch_runs])
+        report.append({
+            'batch_size': batch_size,
+            'samples_per_second': batch_size / total['p50'] if total['p50'] else None,
+            'total': total,
+            'stages': {stage: summarize([run['stages'][stage] for run in batch_runs if stage in run['stages']]) for stage in STAGES},
+        })
+    return report
+
+
+def write_csv(report, path):
+    """
+    Write the report as CSV with one row per batch size and stage (stage "total" is the end-to-end latency).
+    """
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['batch_size', 'stage', 'count', 'mean_s', 'p50_s', 'p99_s', 'samples_per_second'])
+        for entry in report:
+            rows = [('total', entry['total'])] + list(entry['stages'].items())
+            for stage, stats in rows:
+                writer.writerow([entry['batch_size'], stage, stats['count'], stats['mean'], stats['p50'], stats['p99'],
+                                 entry['samples_per_second'] if stage == 'total' else ''])
+
+
+class PipelineBenchmark:
+    """
+    PipelineBenchmark runs the three parties of the pipeline in one process and measures batches end-to-end.
+
+    Attributes:
+        parties (list): One dict per party with its TaskManager, database, timer and FakeObelisk.
+        keys (MpcPartyKeys): Public keys of the parties (used to encrypt key shares and check results).
+        sample (bytes): The encoded ECG sample that is encrypted for every batch entry.
+        timeout (float): Maximum number of seconds to wait for a batch.
+        outputs_per_sample (int): Number of result values per sample in the configured output mode.
+    """
+    def __init__(self, port_base=14000, workdir=None, timeout=600, output_mode=None):
+        """
+        Set up the three parties.
+
+        Arguments:
+            port_base (int, optional): The MP-SPDZ port base used by the parties. Defaults to 14000.
+            workdir (str, optional): Directory for the party databases. Defaults to a temporary directory.
+            timeout (float, optional): Maximum number of seconds to wait for a batch. Defaults to 600.
+            output_mode (str, optional): Output mode of the inference programs. Defaults to the output_mode of the party configurations.
+        """
+        self.workdir = workdir or tempfile.mkdtemp(prefix='mozaik-benchmark-')
+        self.timeout = timeout
+        self.sample = load_ecg_sample()
+        with open(os.path.join('MP-SPDZ', BENCHMARK_HOSTS), 'w') as hosts:
+            hosts.write('localhost\n' * 3)
+
+        self.parties = []
+        for party_index in range(3):
+            config = Config(f'server{party_index}.toml')
+            config.CONFIG_MPSPDZ_HOSTS = BENCHMARK_HOSTS
+            config.CONFIG_MPSPDZ_PORT_BASE = port_base
+            if output_mode is not None:
+                config.CONFIG_OUTPUT_MODE = output_mode
+            db = Database(os.path.join(self.workdir, f'benchmark{party_index}.db'))
+            timer = AnalysisTimer(party_index)
+            timer.log_file = os.path.join(self.workdir, f'analysis_times_{party_index}.log')
+            obelisk = FakeObelisk()
+            aes_config = Rep3AesConfig(f'rep3aes/p{party_index + 1}.toml', REP3AES_BIN)
+            task_manager = TaskManager(Flask(f'benchmark{party_index}'), db, config, aes_config, timer, mozaik_obelisk=obelisk)
+            self.parties.append({'task_manager': task_manager, 'db': db, 'timer': timer, 'obelisk': obelisk})
+        self.keys = self.parties[0]['task_manager'].keys
+        task_manager = self.parties[0]['task_manager']
+        self.outputs_per_sample = task_manager.model_registry.get(ANALYSIS_TYPE).output_width(task_manager.config.CONFIG_OUTPUT_MODE)
+
+    def submit(self, batch_size):
+        """
+        Generate and enqueue one request with {batch_size} encrypted samples at all three parties.
+
+        Returns:
+            tuple: analysis_id, user_id and AES key of the request.
+        """
+        analysis_id = ulid.new().str
+        user_id = str(uuid.uuid4())
+        aes_key = secrets.token_bytes(16)
+        data_index = [int(time.time() * 1000), int(time.time() * 1000) + batch_size]
+        samples = [encrypt_sample(aes_key, user_id, self.sample) for _ in range(batch_size)]
+        for party_index, (party, key_share) in enumerate(zip(self.parties, share_key(aes_key))):
+            encrypted_key_share = encrypt_key_share(self.keys, party_index, user_id, "AES-GCM-128", data_index, ANALYSIS_TYPE, key_share)
+            party['obelisk'].add_analysis(analysis_id, samples, encrypted_key_share)
+            party['db'].create_entry(analysis_id)
+            party['timer'].reset_stages()
+            party['timer'].start(analysis_id)
+        for party in self.parties:
+            party['task_manager'].request_queue.put(([analysis_id], [user_id], ANALYSIS_TYPE, [data_index], False, None))
+        return analysis_id, user_id, aes_key
+
+    def wait(self, analysis_id):
+        """
+        Wait until all parties completed {analysis_id}.
+
+        Raises:
+            RuntimeError: If a party reports an error or the timeout expires.
+        """
+        deadline = time.time() + self.timeout
+        while time.time() < deadline:
+            statuses = [party['db'].read_entry(analysis_id)[1] for party in self.parties]
+            for party_index, status in enumerate(statuses):
+                if status.startswith('ERROR:'):
+                    raise RuntimeError(f'Party {party_index} failed on {analysis_id}: {status}')
+            if all(status == 'Completed' for status in statuses):
+                return
+            time.sleep(0.01)
+        raise RuntimeError(f'Timeout while waiting for {analysis_id}')
+
+    def run_batch(self, batch_size):
+        """
+        Run one batch through the pipeline and verify that the stored result decrypts under the user's key.
+
+        Returns:
+            dict: batch_size, total end-to-end latency and the latency of each stage (slowest party).
+        """
+        start = time.perf_counter()
+        analysis_id, user_id, aes_key = self.submit(batch_size)
+        self.wait(analysis_id)
+        total = time.perf_counter() - start
+
+        result = self.parties[0]['obelisk'].results[analysis_id]
+        plaintext = decrypt_result(self.keys, aes_key, user_id, analysis_id, result)
+        if len(plaintext) != self.outputs_per_sample * 8 * batch_size:
+            raise RuntimeError(f'Unexpected result length {len(plaintext)} for batch size {batch_size}')
+
+        stages = {}
+        for stage in STAGES:
+            durations = [party['timer'].stage_durations[stage][-1] for party in self.parties if party['timer'].stage_durations[stage]]
+            if durations:
+                stages[stage] = max(durations)
+        return {'batch_size': batch_size, 'total': total, 'stages': stages}
+
+    def run(self, batch_sizes, repeats=3, warmup=1):
+        """
+        Measure every batch size {repeats} times after {warmup} discarded runs.
+
+        Returns:
+            list: The report as computed by build_report.
+        """
+        runs = []
+        for batch_size in batch_sizes:
+            for _ in range(warmup):
+                self.run_batch(batch_size)
+            for _ in range(repeats):
+                run = self.run_batch(batch_size)
+                runs.append(run)
+                print(f'batch_size={batch_size} total={run["total"]:.3f}s', file=sys.stderr)
+        return build_report(runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end throughput benchmark of the three-party pipeline on localhost.')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=supported_batch_sizes(), help='batch sizes to benchmark (default: all supported)')
+    parser.add_argument('--repeats', type=int, default=3, help='measured runs per batch size')
+    parser.add_argument('--warmup', type=int, default=1, help='discarded runs per batch size')
+    parser.add_argument('--port-base', type=int, default=14000, help='MP-SPDZ port base used by the benchmark parties')
+    parser.add_argument('--timeout', type=float, default=600, help='maximum number of seconds per batch')
+    parser.add_argument('--output-mode', choices=sorted(OUTPUT_MODES), default=None, help='output mode of the inference programs (default: from the party configurations)')
+    parser.add_argument('--json', dest='json_path', default='benchmark.json', help='path of the JSON report')
+    parser.add_argument('--csv', dest='csv_path', default=None, help='path of the CSV report')
+    args = parser.parse_args()
+
+    if not os.path.exists(REP3AES_BIN):
+        sys.exit(f'{REP3AES_BIN} not found, build rep3aes first (cargo build --release)')
+    if not os.path.exists('MP-SPDZ/malicious-rep-ring-party.x'):
+        sys.exit('MP-SPDZ/malicious-rep-ring-party.x not found, build MP-SPDZ first')
+
+    benchmark = PipelineBenchmark(port_base=args.port_base, timeout=args.timeout, output_mode=args.output_mode)
+    report = benchmark.run(args.batch_sizes, repeats=args.repeats, warmup=args.warmup)
+
+    with open(args.json_path, 'w') as file:
+        json.dump(report, file, indent=2)
+    if args.csv_path is not None:
+        write_csv(report, args.csv_path)
+    for entry in report:
+        print(f'batch_size={entry["batch_size"]:5d} samples/s={entry["samples_per_second"]:9.2f} p50={entry["total"]["p50"]:.3f}s p99={entry["total"]["p99"]:.3f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""
+Compile-time benchmark of the heartbeat MLP in MP-SPDZ.
+
+Compiles MP-SPDZ/Programs/Source/heartbeat_mlp_benchmark.mpc for every batch size in five modes: the layer-by-layer evaluation of
+keras.models.Sequential.predict (predict), the fused dense kernel ml.fused_dense (fused), the fused kernel on an inference-only
+build with preloaded weights (inference), the masked kernel ml.masked_dense with masks computed ahead of the batch (masked) and
+the computation of these masks and their products with the weights alone (masks, ml.fixed_weight_masks). It compares the
+instruction counts, the secret memory, the preprocessing material and the online rounds that the compiler reports, as well as
+the compile time. The cost of the masked mode including the masks it uses is reported as total_cost.
+The masked kernel does not save triples: the triples of the masks and of the masked batch add up to those of the inference
+mode (376992 at batch size 16), and the online phase takes more rounds (45 instead of 40). It only lowers the latency of a batch
+when the masks are computed while no batch is running, which the inference engine with fixed_weights does between batches;
+the programs run per batch do not use it.
+With --max-vector-sizes, the inference mode is also compiled with the ReLU comparisons split into vectorized calls of at most
+the given size (ml.Layer.max_vector_size), to show the rounds that smaller (less memory hungry) comparisons cost.
+
+Usage (from the mpc directory):
+    python3 compile_benchmark.py --batch-sizes 16 256 1024 --max-vector-sizes 12800 1000 --json compile_benchmark.json
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+PROGRAM = 'heartbeat_mlp_benchmark'
+MODES = ['predict', 'fused', 'inference', 'masked', 'masks']
+
+
+def parse_compiler_cost(output):
+    """
+    Parse the "Program requires at most" statistics printed by compile.py.
+
+    Arguments:
+        output (str): The standard output of compile.py.
+
+    Returns:
+        dict: Number of items per cost type (e.g. {'integer triples': 376992, 'virtual machine rounds': 40}). Matrix multiplications are summed up.
+    """
+    cost = {}
+    in_cost = False
+    for line in output.splitlines():
+        if line.startswith('Program requires'):
+            in_cost = True
+            continue
+        match = re.match(r'^\s+(\d+|inf)\s+(.+?)\s*$', line) if in_cost else None
+        if match is None:
+            in_cost = False
+            continue
+        name = re.sub(r'\s*\(.*\)$', '', match.group(2))
+        value = float('inf') if match.group(1) == 'inf' else int(match.group(1))
+        cost[name] = cost.get(name, 0) + value
+    return cost
+
+
+def count_instructions(asm_prefix):
+    """
+    Count the instructions of a compiled program in the assembly written by compile.py -a {asm_prefix} (one file per tape).
+    Vectorized instructions count once, loops are not unrolled.
+
+    Returns:
+        int: The number of instructions over all tapes.
+    """
+    count = 0
+    for path in glob.glob(f'{asm_prefix}-*'):
+        with open(path, 'r') as file:
+            count += sum(1 for line in file if line.strip() and not line.startswith('#'))
+    return count
+
+
+def parse_memory_usage(asm_prefix):
+    """
+    Parse the memory size per register type that the main tape of a program compiled with -a {asm_prefix} requests at the end.
+
+    Returns:
+        dict: Number of memory cells per type (e.g. {'s': 369664, 'c': 8192, 'ci': 9540}).
+    """
+    usage = {}
+    paths = glob.glob(f'{asm_prefix}-*-0')
+    if not paths:
+        return usage
+    in_usage = False
+    with open(paths[0], 'r') as file:
+        for line in file:
+            if line.startswith('#'):
+                in_usage = '-memory-usage-' in line
+                continue
+            match = re.match(r'^g?ldm(s|c|int|sg|cg)?\s+(\w+?)\d+, (\d+)', line) if in_usage else None
+            if match:
+                usage[match.group(2)] = int(match.group(3)) + 1
+    return usage
+
+
+def max_comparison_width(asm_prefix):
+    """
+    Find the widest vectorized comparison (LTZ) in a program compiled with -a {asm_prefix}, from the names of the basic blocks.
+
+    Returns:
+        int: The number of elements of the widest comparison, 0 if there is none.
+    """
+    width = 0
+    for path in glob.glob(f'{asm_prefix}-*'):
+        with open(path, 'r') as file:
+            for line in file:
+                if line.startswith('#'):
+                    width = max([width] + [int(size) for size in re.findall(r'-LTZ\((\d+)\)', line)])
+    return width
+
+
+def compile_program(batch_size, mode, max_vector_size=None, softmax=None, mpspdz_dir='MP-SPDZ'):
+    """
+    Compile the benchmark program for {batch_size} in {mode} (one of MODES), with at most {max_vector_size} ReLU comparisons
+    per vectorized call and the softmax approximation {softmax} (see ml.MultiOutput.softmax) if given.
+
+    Returns:
+        dict: batch_size, mode, max_vector_size, softmax, compile time, instruction count, memory usage, the widest comparison
+            and the compiler cost statistics.
+    """
+    with tempfile.TemporaryDirectory() as asm_dir:
+        asm_prefix = os.path.join(asm_dir, 'asm')
+        command = [sys.executable, 'compile.py', '-R64', '-a', asm_prefix, PROGRAM, str(batch_size), mode]
+        if max_vector_size is not None:
+            command.append(str(max_vector_size))
+        if softmax is not None:
+            command.append(f'softmax={softmax}')
+        start = time.perf_counter()
+        result = subprocess.run(command, capture_output=True, text=True, check=True, cwd=mpspdz_dir)
+        compile_time = time.perf_counter() - start
+        instructions = count_instructions(asm_prefix)
+        memory = parse_memory_usage(asm_prefix)
+        comparison_width = max_comparison_width(asm_prefix)
+    return {'batch_size': batch_size, 'mode': mode, 'max_vector_size': max_vector_size, 'softmax': softmax,
+            'compile_time': compile_time, 'instructions': instructions, 'memory': memory,
+            'comparison_width': comparison_width, 'cost': parse_compiler_cost(result.stdout)}
+
+
+def compare(results):
+    """
+    Group the results of the modes by batch size.
+
+    Arguments:
+        results (list): Results of compile_program.
+
+    Returns:
+        list: Per batch size, the results of every mode, with the ratios of instructions, secret memory and rounds
+            relative to predict added to the evaluating modes, and the cost of the masked mode including the masks (total_cost).
+    """
+    by_batch = {}
+    for result in results:
+        by_batch.setdefault(result['batch_size'], {})[result['mode']] = result
+    report = []
+    for batch_size in sorted(by_batch):
+        entry = {'batch_size': batch_size, **by_batch[batch_size]}
+        predict = entry.get('predict')
+        if 'masked' in entry and 'masks' in entry:
+            masked, masks = entry['masked']['cost'], entry['masks']['cost']
+            entry['masked']['total_cost'] = {name: masked.get(name, 0) + masks.get(name, 0) for name in {**masked, **masks}}
+        for mode in MODES[1:-1]:
+            if predict is None or mode not in entry:
+                continue
+            result = entry[mode]
+            result['instruction_ratio'] = result['instructions'] / predict['instructions']
+            if predict.get('memory', {}).get('s'):
+                result['memory_ratio'] = result['memory'].get('s', 0) / predict['memory']['s']
+            rounds = predict['cost'].get('virtual machine rounds')
+            if rounds:
+                result['round_ratio'] = result['cost'].get('virtual machine rounds', 0) / rounds
+        report.append(entry)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the fused and inference-only MLP evaluation with Sequential.predict for the heartbeat MLP')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 16, 256, 1024], help='batch sizes to compile')
+    parser.add_argument('--max-vector-sizes', type=int, nargs='+', default=[],
+                        help='also compile the inference mode with at most this many ReLU comparisons per vectorized call')
+    parser.add_argument('--json', dest='json_path', default=None, help='path of the JSON report')
+    args = parser.parse_args()
+
+    results = [compile_program(batch_size, mode) for batch_size in args.batch_sizes for mode in MODES]
+    report = compare(results)
+    vector_sizes = [compile_program(batch_size, 'inference', max_vector_size)
+                    for batch_size in args.batch_sizes for max_vector_size in args.max_vector_sizes]
+    if args.json_path is not None:
+        with open(args.json_path, 'w') as file:
+            json.dump({'modes': report, 'vector_sizes': vector_sizes}, file, indent=2)
+    for entry in report:
+        for mode in MODES:
+            result = entry[mode]
+            cost = result['cost']
+            print(f'batch_size={entry["batch_size"]:5d} {mode:9s} instructions={result["instructions"]:7d} '
+                  f'secret_memory={result["memory"].get("s", 0):8d} comparison_width={result["comparison_width"]:6d} '
+                  f'triples={cost.get("integer triples", 0):9d} bits={cost.get("integer bits", 0):8d} '
+                  f'rounds={cost.get("virtual machine rounds", 0):5} compile={result["compile_time"]:.1f}s')
+        total_cost = entry['masked']['total_cost']
+        print(f'batch_size={entry["batch_size"]:5d} masked with masks triples={total_cost.get("integer triples", 0):9d} '
+              f'randoms={total_cost.get("integer randoms", 0):8d}')
+    for result in vector_sizes:
+        print(f'batch_size={result["batch_size"]:5d} inference max_vector_size={result["max_vector_size"]:6d} '
+              f'comparison_width={result["comparison_width"]:6d} '
+              f'rounds={result["cost"].get("virtual machine rounds", 0):5} compile={result["compile_time"]:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,39 @@ import tomli as tomllib
 
 DEBUG = False
 
+def supported_batch_sizes():
+    """
+    List the batch sizes for which the heartbeat_inference_demo_batched program is built: powers of 2 up to 1024 (included) and multiples of 16 up to 256 (included).
+
+    Returns:
+        list: The supported batch sizes in increasing order.
+    """
+    powers_of_two = [2**i for i in range(11)]
+    multiples_of_16 = list(range(16, 257, 16))
+    return sorted(set(powers_of_two + multiples_of_16))
+
+def is_supported_batch_size(batch_size):
+    """
+    Check whether a batch of {batch_size} samples can be processed by one of the supported programs.
+
+    Arguments:
+        batch_size (int): The total number of samples in the batch.
+    """
+    return (batch_size <= 256 and batch_size % 16 == 0) or (batch_size <= 1024 and batch_size > 0 and (batch_size & (batch_size - 1)) == 0)
+
+# Number of result shares per sample for every output mode of the inference programs
+OUTPUT_MODES = {
+    'probabilities': 5,  # softmax over the 5 classes (fixed point)
+    'class': 1,  # index of the predicted class (integer)
+    'class_confidence': 2,  # index of the predicted class and its softmax probability (fixed point)
+}
+
+# Softmax of the probabilities output mode: exact, or an approximation evaluated for the whole batch at once
+# (see ml.MultiOutput.softmax and softmax_benchmark.py for the accuracy and cost). The rounds of exact grow with the batch size,
+# those of the approximations do not: poly (31 rounds) needs fewer rounds than exact from batch size 16 on, but more below,
+# relu (18 rounds) always needs fewer. The maximum error of the probabilities on sample.txt is 0.0027 with poly and 0.21 with relu.
+SOFTMAX_MODES = ['exact', 'relu', 'poly']
+
 class ProcessException(Exception):
     """Custom exception class for errors."""
     def __init__(self, analysis_id, code, message):
@@ -31,6 +64,15 @@ class Config:
         CONFIG_PARTY_INDEX: The index of the party.
         CONFIG_SERVER_ID: Server id for auth to obelisk
         CONFIG_SERVER_SECRET: Server secret for auth to obelisk
+        CONFIG_MPSPDZ_HOSTS: The MP-SPDZ hosts file (relative to MP-SPDZ), defaults to HOSTS
+        CONFIG_MPSPDZ_PORT_BASE: The MP-SPDZ port base (-pn), None to use the MP-SPDZ default
+        CONFIG_PREPROCESSING: Settings of the preprocessing pool (table [preprocessing] with target, watermark, staging_dir, staging_dest, timeout), None to disable the pool
+        CONFIG_PROGRAM_WARMUP: Batch sizes whose programs are compiled in the background at startup, the others are compiled on first use
+        CONFIG_OUTPUT_MODE: The result computed for every sample, see OUTPUT_MODES, defaults to probabilities
+        CONFIG_SOFTMAX: The softmax of the probabilities output mode, see SOFTMAX_MODES, defaults to exact
+        CONFIG_INFERENCE_ENGINE: Settings of the long-running inference engine (table [inference_engine] with analysis_type, batch_size, client_port_base, mpspdz_port_base, timeout, fixed_weights), None to start MP-SPDZ for every batch
+        CONFIG_ADMISSION: Settings of the admission control of the request queue (table [admission] with max_queued, reserved, default_analysis_time), defaults to no limit
+        CONFIG_MODELS: The TOML file declaring the models per analysis type (see model_registry.py), defaults to models.toml
     """
     def __init__(self, config_path):
         """
@@ -49,6 +91,19 @@ class Config:
         self.CONFIG_PARTY_INDEX = self.config['party_index']
         self.CONFIG_SERVER_ID = self.config['server_id']    
         self.CONFIG_SERVER_SECRET = self.config['server_secret']  
+        self.CONFIG_MPSPDZ_HOSTS = self.config.get('mpspdz_hosts', 'HOSTS')
+        self.CONFIG_MPSPDZ_PORT_BASE = self.config.get('mpspdz_port_base')
+        self.CONFIG_PREPROCESSING = self.config.get('preprocessing')
+        self.CONFIG_PROGRAM_WARMUP = self.config.get('program_warmup', [])
+        self.CONFIG_INFERENCE_ENGINE = self.config.get('inference_engine')
+        self.CONFIG_ADMISSION = self.config.get('admission', {})
+        self.CONFIG_MODELS = self.config.get('models', 'models.toml')
+        self.CONFIG_OUTPUT_MODE = self.config.get('output_mode', 'probabilities')
+        if self.CONFIG_OUTPUT_MODE not in OUTPUT_MODES:
+            raise ValueError(f'Invalid output_mode {self.CONFIG_OUTPUT_MODE}, supported are {", ".join(OUTPUT_MODES)}')
+        self.CONFIG_SOFTMAX = self.config.get('softmax', 'exact')
+        if self.CONFIG_SOFTMAX not in SOFTMAX_MODES:
+            raise ValueError(f'Invalid softmax {self.CONFIG_SOFTMAX}, supported are {", ".join(SOFTMAX_MODES)}')
 
 
     def load_config(self, config_path):
@@ -1,3 +1,4 @@
+import json
 import sqlite3
 import os
 
@@ -20,7 +21,8 @@ class Database:
 
     def initialize_database(self):
         """
-        Initialize the database by creating the inference table if it doesn't exist, with 3 columns, analysis_id, status and result.
+        Initialize the database by creating the inference table if it doesn't exist, with 3 columns, analysis_id, status and result,
+        and the jobs table holding the queued requests with the last finished stage and its checkpoint data.
         """
         try:
             db_connection = sqlite3.connect(self.db_path)
@@ -32,6 +34,14 @@ class Database:
                     result TEXT
                 )
             ''')
+            db_cursor.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    request TEXT,
+                    stage TEXT,
+                    checkpoint TEXT
+                )
+            ''')
             db_connection.commit()
             db_connection.close()
         except Exception as e:
@@ -216,6 +226,111 @@ class Database:
         finally:
             db_connection.close()
 
+    def add_job(self, request, stage='queued'):
+        """
+        Persist a queued request as a job.
+
+        Arguments:
+            request (tuple): The request (analysis_ids, user_ids, analysis_type, data_indeces, online_only, streaming).
+            stage (str, optional): The initial stage. Defaults to 'queued'.
+
+        Returns:
+            int: The job ID.
+        """
+        try:
+            db_connection = sqlite3.connect(self.db_path)
+            db_cursor = db_connection.cursor()
+            db_cursor.execute('''
+                INSERT INTO jobs (request, stage, checkpoint)
+                VALUES (?, ?, ?)
+            ''', (json.dumps(list(request)), stage, json.dumps({})))
+            db_connection.commit()
+            return db_cursor.lastrowid
+        except Exception as e:
+            raise Exception(f"Error adding job: {e}")
+        finally:
+            db_connection.close()
+
+    def set_job_stage(self, job_id, stage, checkpoint):
+        """
+        Record that a job finished {stage}, with the data needed to resume after it.
+
+        Arguments:
+            job_id (int): The job ID.
+            stage (str): The last finished stage.
+            checkpoint (dict): JSON serializable data to resume from the stage.
+        """
+        try:
+            db_connection = sqlite3.connect(self.db_path)
+            db_cursor = db_connection.cursor()
+            db_cursor.execute('''
+                UPDATE jobs
+                SET stage = ?, checkpoint = ?
+                WHERE job_id = ?
+            ''', (stage, json.dumps(checkpoint), job_id))
+            db_connection.commit()
+        except Exception as e:
+            raise Exception(f"Error updating job: {e}")
+        finally:
+            db_connection.close()
+
+    def read_job(self, job_id):
+        """
+        Read the last finished stage of a job.
+
+        Arguments:
+            job_id (int): The job ID.
+
+        Returns:
+            tuple: The stage and the checkpoint data, None if the job does not exist.
+        """
+        try:
+            db_connection = sqlite3.connect(self.db_path)
+            db_cursor = db_connection.cursor()
+            db_cursor.execute('SELECT stage, checkpoint FROM jobs WHERE job_id = ?', (job_id,))
+            job = db_cursor.fetchone()
+            if job is None:
+                return None
+            return job[0], json.loads(job[1])
+        except Exception as e:
+            raise Exception(f"Error reading job: {e}")
+        finally:
+            db_connection.close()
+
+    def pending_jobs(self):
+        """
+        List the jobs that were not finished, in the order they were added.
+
+        Returns:
+            list: Tuples of the job ID, the request and the last finished stage.
+        """
+        try:
+            db_connection = sqlite3.connect(self.db_path)
+            db_cursor = db_connection.cursor()
+            db_cursor.execute('SELECT job_id, request, stage FROM jobs ORDER BY job_id')
+            return [(job_id, tuple(json.loads(request)), stage) for job_id, request, stage in db_cursor.fetchall()]
+        except Exception as e:
+            raise Exception(f"Error reading jobs: {e}")
+        finally:
+            db_connection.close()
+
+    def finish_job(self, job_id):
+        """
+        Remove a finished (completed or failed) job.
+
+        Arguments:
+            job_id (int): The job ID.
+        """
+        try:
+            db_connection = sqlite3.connect(self.db_path)
+            db_cursor = db_connection.cursor()
+            db_cursor.execute('DELETE FROM jobs WHERE job_id = ?', (job_id,))
+            db_connection.commit()
+        except Exception as e:
+            raise Exception(f"Error deleting job: {e}")
+        finally:
+            db_connection.close()
+
     def delete_database(self):
         """
         Delete the database file.
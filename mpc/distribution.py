@@ -0,0 +1,316 @@
+import glob
+import hashlib
+import os
+import shlex
+import subprocess
+import zlib
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+from config import DEBUG
+
+CHUNK_SIZE = 1 << 20
+
+# Runs on the receiving host: appends a zlib stream read from stdin, decompressed, to <path>.part
+REMOTE_APPEND = (
+    "import os, sys, zlib\n"
+    "path = sys.argv[1] + '.part'\n"
+    "os.makedirs(os.path.dirname(path) or '.', exist_ok=True)\n"
+    "d = zlib.decompressobj()\n"
+    "with open(path, 'ab') as f:\n"
+    "    for chunk in iter(lambda: sys.stdin.buffer.read(1 << 16), b''):\n"
+    "        f.write(d.decompress(chunk))\n"
+    "    f.write(d.flush())\n"
+)
+
+
+def file_digest(path):
+    """
+    Compute the SHA-256 digest of a file.
+
+    Arguments:
+        path (str): The file path.
+
+    Returns:
+        str: The hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def compressed_chunks(path, offset):
+    """
+    Read {path} from {offset} and yield it as one zlib stream in chunks.
+    """
+    compressor = zlib.compressobj()
+    with open(path, 'rb') as file:
+        file.seek(offset)
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+    yield compressor.flush()
+
+
+class Transport(ABC):
+    """
+    Transport is the target side of a distribution: it reports the digests of the files it holds and receives compressed file contents.
+    Contents are appended to <path>.part, which is checked against the expected digest and renamed on commit; a failed copy resumes from the size of the .part file.
+    """
+    @abstractmethod
+    def digests(self, paths):
+        """
+        Return {path: digest} for the files in {paths} that exist at the target.
+        """
+
+    @abstractmethod
+    def partial_size(self, path):
+        """
+        Return the number of bytes of {path} already received (size of <path>.part, 0 if there is none).
+        """
+
+    @abstractmethod
+    def discard_partial(self, path):
+        """
+        Remove the partially received <path>.part.
+        """
+
+    @abstractmethod
+    def append(self, path, chunks):
+        """
+        Decompress the zlib stream {chunks} and append it to <path>.part.
+        """
+
+    @abstractmethod
+    def commit(self, path, digest):
+        """
+        Rename <path>.part to {path} if its digest matches {digest}.
+
+        Returns:
+            bool: Whether the digest matched. On a mismatch the .part file is discarded.
+        """
+
+
+class LocalDirectoryTransport(Transport):
+    """
+    LocalDirectoryTransport distributes into a local directory (for tests and single-host deployments).
+
+    Attributes:
+        root (str): The target directory.
+    """
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, path):
+        return os.path.join(self.root, path)
+
+    def digests(self, paths):
+        return {path: file_digest(self._path(path)) for path in paths if os.path.isfile(self._path(path))}
+
+    def partial_size(self, path):
+        part = self._path(path) + '.part'
+        return os.path.getsize(part) if os.path.exists(part) else 0
+
+    def discard_partial(self, path):
+        part = self._path(path) + '.part'
+        if os.path.exists(part):
+            os.remove(part)
+
+    def append(self, path, chunks):
+        part = self._path(path) + '.part'
+        os.makedirs(os.path.dirname(part), exist_ok=True)
+        decompressor = zlib.decompressobj()
+        with open(part, 'ab') as file:
+            for chunk in chunks:
+                file.write(decompressor.decompress(chunk))
+            file.write(decompressor.flush())
+
+    def commit(self, path, digest):
+        part = self._path(path) + '.part'
+        if file_digest(part) != digest:
+            os.remove(part)
+            return False
+        os.replace(part, self._path(path))
+        return True
+
+
+class SshTransport(Transport):
+    """
+    SshTransport distributes to a directory on another host over ssh (the receiving host needs python3 and sha256sum).
+
+    Attributes:
+        host (str): The ssh host, e.g. 'root@10.10.168.47'.
+        root (str): The target directory on the host.
+    """
+    def __init__(self, host, root):
+        self.host = host
+        self.root = root
+
+    @staticmethod
+    def from_destination(destination):
+        """
+        Create a transport from an scp-style destination 'host:path'.
+        """
+        host, root = destination.split(':', 1)
+        return SshTransport(host, root)
+
+    def _path(self, path):
+        # keep a leading ~ unquoted so that the remote shell expands it
+        root = self.root.rstrip('/')
+        if root.startswith('~/'):
+            return '~/' + shlex.quote(f'{root[2:]}/{path}')
+        return shlex.quote(f'{root}/{path}')
+
+    def _run(self, command, **kwargs):
+        return subprocess.run(['ssh', self.host, command], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs)
+
+    def digests(self, paths):
+        if len(paths) == 0:
+            return {}
+        files = ' '.join(self._path(path) for path in paths)
+        # sha256sum reports missing files on stderr and exits with 1, the existing ones are still listed
+        result = subprocess.run(['ssh', self.host, f'sha256sum {files}'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        by_name = {}
+        for line in result.stdout.splitlines():
+            digest, name = line.split(maxsplit=1)
+            by_name[name.lstrip('*')] = digest
+        digests = {}
+        for path in paths:
+            for name, digest in by_name.items():
+                if name.endswith('/' + path):
+                    digests[path] = digest
+        return digests
+
+    def partial_size(self, path):
+        result = self._run(f'stat -c %s {self._path(path)}.part 2>/dev/null || echo 0', text=True)
+        return int(result.stdout.strip() or 0)
+
+    def discard_partial(self, path):
+        self._run(f'rm -f {self._path(path)}.part')
+
+    def append(self, path, chunks):
+        command = f'python3 -c {shlex.quote(REMOTE_APPEND)} {self._path(path)}'
+        process = subprocess.Popen(['ssh', '-o', 'Compression=no', self.host, command], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            for chunk in chunks:
+                process.stdin.write(chunk)
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        _, stderr = process.communicate()
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, command, stderr=stderr)
+
+    def commit(self, path, digest):
+        target = self._path(path)
+        result = self._run(f'if [ "$(sha256sum < {target}.part | cut -d" " -f1)" = {digest} ]; then mv {target}.part {target}; echo ok; else rm -f {target}.part; echo mismatch; fi', text=True)
+        return result.stdout.strip() == 'ok'
+
+
+def make_transport(destination):
+    """
+    Create the transport for {destination}: a Transport is used as is, 'host:path' is reached over ssh and anything else is a local directory.
+    """
+    if isinstance(destination, Transport):
+        return destination
+    if ':' in destination:
+        return SshTransport.from_destination(destination)
+    return LocalDirectoryTransport(destination)
+
+
+class OfflineDistributor:
+    """
+    OfflineDistributor pushes files (e.g. the Player-Data/3-* preprocessing directories) to several targets in parallel.
+    Only files whose SHA-256 digest differs at a target are sent, compressed with zlib, and every copy resumes where a failed attempt stopped.
+
+    Attributes:
+        source_root (str): The local directory the distributed paths are relative to.
+        transports (list): The targets.
+        max_attempts (int): Number of attempts per file and target.
+    """
+    def __init__(self, source_root, destinations, max_attempts=3):
+        """
+        Initialize the distributor.
+
+        Arguments:
+            source_root (str): The local directory the distributed paths are relative to.
+            destinations (list): Transports or destinations accepted by make_transport.
+            max_attempts (int, optional): Number of attempts per file and target. Defaults to 3.
+        """
+        self.source_root = source_root
+        self.transports = [make_transport(destination) for destination in destinations]
+        self.max_attempts = max_attempts
+
+    def collect(self, patterns):
+        """
+        List the files below source_root matching any of the glob {patterns} (directories are expanded recursively).
+
+        Returns:
+            list: Paths relative to source_root.
+        """
+        paths = []
+        for pattern in patterns:
+            for match in sorted(glob.glob(os.path.join(self.source_root, pattern))):
+                if os.path.isdir(match):
+                    for directory, _, files in os.walk(match):
+                        paths += [os.path.relpath(os.path.join(directory, name), self.source_root) for name in sorted(files)]
+                else:
+                    paths.append(os.path.relpath(match, self.source_root))
+        return paths
+
+    def send_file(self, transport, path, digest):
+        """
+        Send one file to one target, resuming from a previous partial copy.
+
+        Returns:
+            int: Number of uncompressed bytes sent.
+        """
+        source = os.path.join(self.source_root, path)
+        size = os.path.getsize(source)
+        for attempt in range(self.max_attempts):
+            offset = transport.partial_size(path)
+            if offset > size:
+                transport.discard_partial(path)
+                offset = 0
+            try:
+                transport.append(path, compressed_chunks(source, offset))
+            except (OSError, subprocess.CalledProcessError) as e:
+                if DEBUG:
+                    print(f'Attempt {attempt + 1} to send {path} failed: {e}')
+                continue
+            if transport.commit(path, digest):
+                return size - offset
+        raise RuntimeError(f'Failed to send {path} after {self.max_attempts} attempts')
+
+    def push(self, transport, manifest):
+        """
+        Send the files of {manifest} that differ at {transport}.
+
+        Returns:
+            dict: Number of files sent and skipped and the number of bytes sent.
+        """
+        remote = transport.digests(list(manifest))
+        stats = {'sent': 0, 'skipped': 0, 'bytes': 0}
+        for path, digest in manifest.items():
+            if remote.get(path) == digest:
+                stats['skipped'] += 1
+                continue
+            stats['bytes'] += self.send_file(transport, path, digest)
+            stats['sent'] += 1
+        return stats
+
+    def distribute(self, patterns=('3-*',)):
+        """
+        Push the files matching {patterns} to all targets at once.
+
+        Returns:
+            list: The statistics of push for every target.
+        """
+        manifest = {path: file_digest(os.path.join(self.source_root, path)) for path in self.collect(patterns)}
+        if len(self.transports) == 0:
+            return []
+        with ThreadPoolExecutor(max_workers=len(self.transports)) as executor:
+            return list(executor.map(lambda transport: self.push(transport, manifest), self.transports))
@@ -0,0 +1,249 @@
+import os
+import socket
+import ssl
+import struct
+import subprocess
+import threading
+import time
+
+from config import DEBUG, ProcessException
+from program_registry import ProgramRegistry
+
+
+def pack_shares(shares):
+    """
+    Encode RSS shares in the form (x_i, x_{i+1}) as MP-SPDZ packs malicious replicated shares in Z2^64 (x_{i+1} first).
+    """
+    return b''.join(struct.pack('<QQ', share[1] % 2**64, share[0] % 2**64) for share in shares)
+
+
+def unpack_shares(data):
+    """
+    Decode shares packed by MP-SPDZ into a list of RSS shares in the form (x_i, x_{i+1}).
+    """
+    return [[second, first] for first, second in struct.iter_unpack('<QQ', data)]
+
+
+def send_message(sock, payload):
+    """
+    Send {payload} (bytes-like) as an MP-SPDZ octetStream (4-byte little endian length followed by the data).
+    """
+    sock.sendall(struct.pack('<I', len(payload)))
+    sock.sendall(payload)
+
+
+def receive_message(sock):
+    """
+    Receive one MP-SPDZ octetStream and return its data.
+    """
+    def receive_exactly(n):
+        data = b''
+        while len(data) < n:
+            chunk = sock.recv(n - len(data))
+            if not chunk:
+                raise ConnectionError('Connection to the inference engine closed')
+            data += chunk
+        return data
+    length = struct.unpack('<I', receive_exactly(4))[0]
+    return receive_exactly(length)
+
+
+class InferenceEngine:
+    """
+    InferenceEngine keeps malicious-rep-ring-party.x running the engine program of one model (e.g. heartbeat_inference_engine) between requests.
+    The parties stay connected and keep the model loaded as secret shares; only the input shares and output shares of a batch
+    are exchanged with the local MP-SPDZ party, over the MP-SPDZ external client interface (see ExternalIO/client.py).
+    Every party's service is the client of its own party, with the client certificate Player-Data/C<party index>.pem.
+    Batches are processed in chunks of batch_size samples, the last chunk is padded with shares of zero.
+    With fixed_weights, the engine multiplies the secret weights with random masks ahead of every chunk (ml.fixed_weight_masks),
+    so that the dense layers of a chunk open the masked input instead of multiplying with triples. This does not save triples
+    overall and adds online rounds (see compile_benchmark.py), it only shortens the chunks when the engine is idle between them.
+
+    Attributes:
+        task_manager (TaskManager): The task manager of this party (for the configuration, the model and the MP-SPDZ command line).
+        analysis_type (str): The analysis type whose model the engine serves.
+        input_size (int): Number of input shares per sample.
+        batch_size (int): Number of samples the engine program processes at once.
+        client_port_base (int): Port base on which the MP-SPDZ parties accept the client (party i listens on client_port_base + i).
+        mpspdz_port_base (int): MP-SPDZ port base (-pn) of the engine, apart from the one of the programs run per batch.
+        timeout (float): Maximum number of seconds to wait for the engine to accept the client.
+        log_file (str): File receiving the output of the MP-SPDZ party.
+        fixed_weights (bool): Whether the engine program is compiled with the weight-dependent preprocessing.
+        n_outputs (int): Number of output shares per sample, depending on the configured output mode.
+        registry (ProgramRegistry): Registry compiling the engine program.
+        process (Popen): The running MP-SPDZ party, None if not started.
+        socket (SSLSocket): The client connection to the MP-SPDZ party, None if not connected.
+    """
+    def __init__(self, task_manager, analysis_type=None, batch_size=16, client_port_base=15000, mpspdz_port_base=16000, timeout=120, log_file=None, fixed_weights=False):
+        """
+        Initialize the engine. It is started by warm_up() or by the first call of infer().
+
+        Arguments:
+            task_manager (TaskManager): The task manager of this party.
+            analysis_type (str, optional): The analysis type whose model the engine serves. Defaults to the first model of the model registry.
+            batch_size (int, optional): Number of samples the engine program processes at once. Defaults to 16.
+            client_port_base (int, optional): Port base for the client connection. Defaults to 15000.
+            mpspdz_port_base (int, optional): MP-SPDZ port base of the engine, so that batches of other analysis types run next to it. Defaults to 16000.
+            timeout (float, optional): Maximum number of seconds to wait for the engine. Defaults to 120.
+            log_file (str, optional): File receiving the output of the MP-SPDZ party. Defaults to 'MP-SPDZ/logs/inference-engine-P<party index>'.
+            fixed_weights (bool, optional): Whether to compute the products of the weights with the masks of a chunk ahead of it. Defaults to False.
+        """
+        self.task_manager = task_manager
+        self.analysis_type = analysis_type or task_manager.model_registry.default()
+        model = task_manager.model_registry.get(self.analysis_type)
+        if model.engine_program is None:
+            raise ValueError(f'The model of {self.analysis_type} has no engine_program')
+        self.input_size = model.input_size
+        self.party_index = task_manager.config.CONFIG_PARTY_INDEX
+        self.batch_size = batch_size
+        self.client_port_base = client_port_base
+        self.mpspdz_port_base = mpspdz_port_base
+        self.timeout = timeout
+        self.log_file = log_file or f'MP-SPDZ/logs/inference-engine-P{self.party_index}'
+        self.n_outputs = model.output_width(task_manager.config.CONFIG_OUTPUT_MODE)
+        self.fixed_weights = fixed_weights
+        args = (client_port_base,) + task_manager.output_mode_args() + (('fixed_weights',) if fixed_weights else ())
+        self.registry = ProgramRegistry(template=model.engine_program, args=args)
+
+        self.process = None
+        self.socket = None
+        self.lock = threading.Lock()
+
+    def is_running(self):
+        return self.process is not None and self.process.poll() is None and self.socket is not None
+
+    def start(self, analysis_id=None):
+        """
+        Load the model, launch the MP-SPDZ party with the engine program and connect to it as client.
+        Must be called with the request_lock of the task manager and the lock held: the engine reads the model from the shares file
+        that the batches run without the engine rewrite, so no batch may start before the engine accepted the client.
+
+        Arguments:
+            analysis_id (str or list, optional): The analysis ID(s) of the batch that starts the engine (for error reporting).
+        """
+        self.stop()
+        program = self.registry.get(self.batch_size, analysis_id)
+        # the engine reads the model from the Persistence file once at startup
+        self.task_manager.set_model(analysis_id, self.analysis_type, [])
+
+        os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
+        with open(self.log_file, 'ab') as log:
+            self.process = subprocess.Popen(self.task_manager.mpspdz_command(program, port_base=self.mpspdz_port_base), stdout=log, stderr=subprocess.STDOUT, cwd='MP-SPDZ')
+        try:
+            self.socket = self.connect()
+        except (OSError, ssl.SSLError) as e:
+            self.stop()
+            raise ProcessException(analysis_id, 500, f'Could not connect to the inference engine: {e}')
+        if DEBUG:
+            print(f'Inference engine {program} of party {self.party_index} is running')
+
+    def connect(self):
+        """
+        Connect to the local MP-SPDZ party as external client, retrying until it listens or the timeout passes.
+
+        Returns:
+            SSLSocket: The connection.
+        """
+        context = ssl.SSLContext(ssl.PROTOCOL_TLSv1_2)
+        context.load_cert_chain(certfile=f'MP-SPDZ/Player-Data/C{self.party_index}.pem', keyfile=f'MP-SPDZ/Player-Data/C{self.party_index}.key')
+        context.load_verify_locations(capath='MP-SPDZ/Player-Data')
+
+        deadline = time.time() + self.timeout
+        while True:
+            if self.process.poll() is not None:
+                raise ConnectionError(f'The inference engine exited with {self.process.returncode}, see {self.log_file}')
+            try:
+                plain_socket = socket.create_connection(('localhost', self.client_port_base + self.party_index))
+                break
+            except ConnectionRefusedError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.5)
+
+        # announce the client id in the clear, then upgrade to TLS
+        send_message(plain_socket, str(self.party_index).encode())
+        sock = context.wrap_socket(plain_socket, server_hostname=f'P{self.party_index}')
+        if self.party_index == 0:
+            # P0 sends the specification of the domain
+            receive_message(sock)
+        return sock
+
+    def warm_up(self):
+        """
+        Start the engine in a background thread so that the first request does not wait for it.
+
+        Returns:
+            threading.Thread: The starting thread.
+        """
+        def run():
+            try:
+                # the request_lock is always taken before the lock
+                with self.task_manager.request_lock, self.lock:
+                    if not self.is_running():
+                        self.start()
+            except ProcessException as e:
+                print(f'Starting the inference engine failed: {e}')
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def infer(self, analysis_id, shares):
+        """
+        Run the inference on a batch of samples.
+
+        Arguments:
+            analysis_id (str or list): The analysis ID(s) of the batch.
+            shares (list or bytearray): The input as RSS shares in the form (x_i, x_{i+1}), input_size per sample,
+                or already packed (e.g. by task_manager.encode_input_shares).
+
+        Returns:
+            list: The output as RSS shares in the form (x_i, x_{i+1}), n_outputs per sample.
+        """
+        if not isinstance(shares, (bytes, bytearray, memoryview)):
+            shares = pack_shares(shares)
+        packed = memoryview(shares).cast('B')
+        n_shares = len(packed) // 16
+        if n_shares % self.input_size != 0:
+            raise ProcessException(analysis_id, 500, f'The number of input shares {n_shares} is not a multiple of {self.input_size}.')
+        n_samples = n_shares // self.input_size
+        n_chunks = -(-n_samples // self.batch_size)
+        chunk_length = 16 * self.batch_size * self.input_size
+
+        with self.task_manager.request_lock, self.lock:
+            if not self.is_running():
+                self.start(analysis_id)
+            try:
+                send_message(self.socket, struct.pack('<i', n_chunks))
+                output = []
+                for chunk in range(n_chunks):
+                    payload = packed[chunk * chunk_length:(chunk + 1) * chunk_length]
+                    if len(payload) < chunk_length:
+                        # pad the last chunk with shares of zero
+                        payload = bytes(payload) + bytes(chunk_length - len(payload))
+                    send_message(self.socket, payload)
+                    output += unpack_shares(receive_message(self.socket))
+            except (OSError, ssl.SSLError) as e:
+                # the engine is restarted for the next batch
+                self.stop()
+                raise ProcessException(analysis_id, 500, f'Error running the inference engine: {e}')
+        return output[:n_samples * self.n_outputs]
+
+    def stop(self):
+        """
+        Ask the engine to finish (by announcing 0 batches) and terminate it if it does not.
+        """
+        if self.socket is not None:
+            try:
+                send_message(self.socket, struct.pack('<i', 0))
+                self.socket.close()
+            except OSError:
+                pass
+            self.socket = None
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            self.process = None
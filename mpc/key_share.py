@@ -28,7 +28,7 @@ class MpcPartyKeys:
         return b''.join(buffer)
 
 
-def _decrypt_key_share_helper(keys, separation, user_id, algorithm, data_indices, analysis_type, ciphertext):
+def _key_share_context(keys, separation, user_id, algorithm, data_indices, analysis_type, party_pub_key):
     # create context
     sep_byte = bytearray(1)
     sep_byte[0] = separation & 0xff
@@ -45,9 +45,13 @@ def _decrypt_key_share_helper(keys, separation, user_id, algorithm, data_indices
         data_indices_buf[8 * i + 6] = (d >> 48) & 0xff
         data_indices_buf[8 * i + 7] = (d >> 56) & 0xff
     context += data_indices_buf
-    context += bytes(analysis_type, encoding='utf-8') + bytes(algorithm, encoding='utf-8') + keys.my_pub_key.export_key(
+    context += bytes(analysis_type, encoding='utf-8') + bytes(algorithm, encoding='utf-8') + party_pub_key.export_key(
         format='DER')
+    return context
+
 
+def _decrypt_key_share_helper(keys, separation, user_id, algorithm, data_indices, analysis_type, ciphertext):
+    context = _key_share_context(keys, separation, user_id, algorithm, data_indices, analysis_type, keys.my_pub_key)
     instance = PKCS1_OAEP.new(keys.my_priv_key, hashAlgo=SHA256, label=context)
     try:
         return instance.decrypt(ciphertext)
@@ -58,6 +62,12 @@ def _decrypt_key_share_helper(keys, separation, user_id, algorithm, data_indices
 def decrypt_key_share(keys, user_id, algorithm, data_indices, analysis_type, ciphertext):
     return _decrypt_key_share_helper(keys, 0x1, user_id, algorithm, data_indices, analysis_type, ciphertext)
 
+def encrypt_key_share(keys, party_index, user_id, algorithm, data_indices, analysis_type, key_share):
+    """ Encrypt a key share for the party with index party_index, as done by the client (e.g. for benchmarks) """
+    context = _key_share_context(keys, 0x1, user_id, algorithm, data_indices, analysis_type, keys.party_keys[party_index])
+    instance = PKCS1_OAEP.new(keys.party_keys[party_index], hashAlgo=SHA256, label=context)
+    return instance.encrypt(key_share)
+
 def decrypt_key_share_for_streaming(keys, user_id, algorithm, streaming_begin, streaming_end, analysis_type, ciphertext):
     # check correct time, streaming_begin and streaming_end are timestamps in milliseconds
     
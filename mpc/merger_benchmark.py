@@ -0,0 +1,145 @@
+"""
+Benchmark of the dependency graph that the MP-SPDZ compiler builds to merge instructions (Compiler.allocator.Merger).
+
+Compiles every program with the Compiler package of the working tree (current) and with the same package where the dependency
+graph (Compiler/allocator.py and Compiler/graph.py) is taken from a reference git revision (reference), by default the revision
+before the CSR dependency graph (Compiler.graph.CSRDiGraph). It compares the compile time and the peak resident memory of the
+compiler processes and checks that both write the same bytecode.
+
+Usage (from the mpc directory):
+    python3 merger_benchmark.py --programs merger_benchmark,200000 heartbeat_mlp_benchmark,1024,predict --json merger_benchmark.json
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+IMPLEMENTATIONS = ['reference', 'current']
+GRAPH_FILES = ['Compiler/allocator.py', 'Compiler/graph.py']
+DEFAULT_PROGRAMS = ['merger_benchmark,200000', 'heartbeat_mlp_benchmark,1024,predict', 'heartbeat_inference_demo_batched,1024']
+
+
+def reference_revision(mpspdz_dir='MP-SPDZ'):
+    """
+    Return the git revision before the CSR dependency graph was introduced, HEAD if it is not committed yet.
+    """
+    commit = subprocess.run(['git', 'log', '-n1', '--format=%H', '-S', 'class CSRDiGraph', '--', 'Compiler/graph.py'],
+                            capture_output=True, text=True, check=True, cwd=mpspdz_dir).stdout.strip()
+    return f'{commit}^' if commit else 'HEAD'
+
+
+def prepare_tree(directory, mpspdz_dir='MP-SPDZ', revision=None):
+    """
+    Set up a compiler in {directory}: a copy of the Compiler package and compile.py of {mpspdz_dir}, with the files of the
+    dependency graph from {revision} if given, and the program sources of {mpspdz_dir}.
+    """
+    shutil.copytree(os.path.join(mpspdz_dir, 'Compiler'), os.path.join(directory, 'Compiler'),
+                    ignore=shutil.ignore_patterns('__pycache__'))
+    shutil.copy2(os.path.join(mpspdz_dir, 'compile.py'), directory)
+    if revision is not None:
+        for path in GRAPH_FILES:
+            source = subprocess.run(['git', 'show', f'{revision}:./{path}'], capture_output=True, check=True, cwd=mpspdz_dir).stdout
+            with open(os.path.join(directory, path), 'wb') as file:
+                file.write(source)
+    # byte-compile up front, so the first program does not pay for it
+    subprocess.run([sys.executable, '-m', 'compileall', '-q', 'Compiler'], check=True, cwd=directory)
+    os.makedirs(os.path.join(directory, 'Programs'))
+    os.symlink(os.path.abspath(os.path.join(mpspdz_dir, 'Programs', 'Source')), os.path.join(directory, 'Programs', 'Source'))
+
+
+def bytecode_digest(directory, name):
+    """
+    Hash the bytecode of the compiled program {name} in {directory}.
+
+    Returns:
+        str: The hex digest over all tapes.
+    """
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(directory, 'Programs', 'Bytecode', f'{name}-*.bc'))):
+        digest.update(os.path.basename(path).encode())
+        with open(path, 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def compile_program(directory, program, compile_options=('-R64',)):
+    """
+    Compile {program} (the program and its arguments) with the compiler in {directory}.
+
+    Returns:
+        dict: program, compile time in seconds, peak resident memory in kB and the bytecode digest.
+    """
+    command = [sys.executable, 'compile.py'] + list(compile_options) + list(program)
+    # fixed hash seed, the compiler iterates over sets of strings
+    env = dict(os.environ, PYTHONHASHSEED='0')
+    start = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, cwd=directory, env=env)
+    stderr = process.stderr.read()
+    _, status, usage = os.wait4(process.pid, 0)
+    compile_time = time.perf_counter() - start
+    process.stderr.close()
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command, stderr=stderr)
+    return {'program': '-'.join(program), 'compile_time': compile_time, 'peak_rss_kb': usage.ru_maxrss,
+            'bytecode': bytecode_digest(directory, '-'.join(program))}
+
+
+def compare(results):
+    """
+    Group the results of the implementations by program.
+
+    Arguments:
+        results (dict): Results of compile_program per implementation (see IMPLEMENTATIONS).
+
+    Returns:
+        list: Per program, the results of every implementation, with the ratios of compile time and peak memory of the
+            current implementation relative to the reference and whether both wrote the same bytecode.
+    """
+    report = []
+    for reference, current in zip(results['reference'], results['current']):
+        entry = {'program': current['program'], 'reference': reference, 'current': current,
+                 'same_bytecode': reference['bytecode'] == current['bytecode']}
+        if reference['compile_time']:
+            entry['time_ratio'] = current['compile_time'] / reference['compile_time']
+        if reference['peak_rss_kb']:
+            entry['memory_ratio'] = current['peak_rss_kb'] / reference['peak_rss_kb']
+        report.append(entry)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare compile time and peak memory of the compiler dependency graph with a reference revision')
+    parser.add_argument('--programs', nargs='+', default=DEFAULT_PROGRAMS, help='programs to compile, with comma-separated arguments')
+    parser.add_argument('--ref', default=None, help='git revision of the reference dependency graph (default: before CSRDiGraph)')
+    parser.add_argument('--compile-options', nargs='+', default=['-R64'], help='options passed to compile.py')
+    parser.add_argument('--json', dest='json_path', default=None, help='path of the JSON report')
+    args = parser.parse_args()
+
+    revision = args.ref or reference_revision()
+    programs = [spec.split(',') for spec in args.programs]
+    results = {}
+    for implementation in IMPLEMENTATIONS:
+        with tempfile.TemporaryDirectory() as directory:
+            prepare_tree(directory, revision=revision if implementation == 'reference' else None)
+            results[implementation] = [compile_program(directory, program, args.compile_options) for program in programs]
+    report = compare(results)
+    if args.json_path is not None:
+        with open(args.json_path, 'w') as file:
+            json.dump({'reference_revision': revision, 'programs': report}, file, indent=2)
+    print(f'reference: dependency graph of {revision}')
+    for entry in report:
+        reference, current = entry['reference'], entry['current']
+        print(f'{entry["program"]:45s} compile {reference["compile_time"]:7.1f}s -> {current["compile_time"]:7.1f}s '
+              f'peak RSS {reference["peak_rss_kb"] / 1024:7.0f}MB -> {current["peak_rss_kb"] / 1024:7.0f}MB '
+              f'bytecode {"identical" if entry["same_bytecode"] else "DIFFERENT"}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+import threading
+
+import tomli as tomllib
+
+from config import OUTPUT_MODES, ProcessException
+from program_registry import ProgramRegistry
+
+
+def read_model_from_file(file_path):
+    """
+    Reads data from a file where each line contains pairs of integers separated by commas.
+
+    Arguments:
+        file_path (str): The file path to read from.
+
+    Returns:
+        list: List of RSS shares.
+    """
+    data = []
+    with open(file_path, 'r') as file:
+        for line in file:
+            pairs = line.strip().split()
+            data += [tuple(map(int, pair.split(','))) for pair in pairs]
+    return data
+
+
+class Model:
+    """
+    Model describes how the MPC parties evaluate one analysis type.
+
+    Attributes:
+        analysis_type (str): The analysis type served by the model.
+        shares (list): Share files of the model parameters (e.g. weights, then biases) in the order the program reads them.
+            {party} is replaced by the party number (1 to 3).
+        input_size (int): Number of values of a sample.
+        classes (int): Number of output classes, the width of a result in the probabilities output mode.
+        program (str): Template of the batched program in MP-SPDZ/Programs/Source, compiled with the batch size and the output mode as arguments.
+            It reads the model shares and the input from the shares file and writes the results after the header of the result region (see TaskManager.set_model).
+        engine_program (str): Template of the program run by the inference engine, None if the model cannot be served by the engine.
+        warm (bool): Whether the shares are loaded and the programs compiled at startup.
+    """
+    def __init__(self, analysis_type, shares, input_size, classes, program, engine_program=None, warm=False):
+        self.analysis_type = analysis_type
+        self.shares = list(shares)
+        self.input_size = input_size
+        self.classes = classes
+        self.program = program
+        self.engine_program = engine_program
+        self.warm = warm
+
+    def share_files(self, party_index):
+        """
+        Return the paths of the share files of the party with index {party_index}.
+        """
+        return [path.format(party=party_index + 1) for path in self.shares]
+
+    def output_width(self, output_mode):
+        """
+        Return the number of result shares per sample in {output_mode} (see config.OUTPUT_MODES).
+        """
+        if output_mode == 'probabilities':
+            return self.classes
+        return OUTPUT_MODES[output_mode]
+
+
+class ModelRegistry:
+    """
+    ModelRegistry holds the models served by the MPC parties, keyed by analysis type, as declared in a TOML file with one table per analysis type:
+
+        ["Heartbeat-Demo-1"]
+        shares = ["heartbeat-inference-model/model_shares{party}.txt", "heartbeat-inference-model/biases_shares{party}.txt"]
+        input_size = 187
+        classes = 5
+        program = "heartbeat_inference_demo_batched"
+        engine_program = "heartbeat_inference_engine"
+        warm = true
+
+    Every model gets its own ProgramRegistry, so the compiled programs of several models stay available side by side.
+
+    Attributes:
+        models (dict): The Model of every analysis type, in the order of the file.
+        args (list): Compile arguments passed after the batch size to every program.
+        programs (dict): ProgramRegistry of every analysis type whose program was requested.
+    """
+    def __init__(self, path='models.toml', args=()):
+        """
+        Load the model declarations from {path}.
+
+        Arguments:
+            path (str, optional): The TOML file declaring the models. Defaults to 'models.toml'.
+            args (tuple, optional): Compile arguments passed after the batch size. Defaults to ().
+        """
+        with open(path, 'rb') as fp:
+            declarations = tomllib.load(fp)
+        self.models = {analysis_type: Model(analysis_type, **declaration) for analysis_type, declaration in declarations.items()}
+        self.args = tuple(args)
+        self.programs = {}
+        self.lock = threading.Lock()
+
+    def get(self, analysis_type, analysis_id=None):
+        """
+        Return the Model of {analysis_type}.
+
+        Arguments:
+            analysis_type (str): The analysis type.
+            analysis_id (str or list, optional): The analysis ID(s) of the request (for error reporting).
+
+        Returns:
+            Model: The model.
+        """
+        if analysis_type not in self.models:
+            supported = ', '.join(f'"{name}"' for name in self.models)
+            raise ProcessException(analysis_id, 500, f'Invalid analysis_type {analysis_type}. Supported analysis types are {supported}.')
+        return self.models[analysis_type]
+
+    def default(self):
+        """
+        Return the analysis type declared first.
+        """
+        return next(iter(self.models))
+
+    def warm(self):
+        """
+        Return the analysis types of the models that are prepared at startup.
+        """
+        return [analysis_type for analysis_type, model in self.models.items() if model.warm]
+
+    def program_registry(self, analysis_type, analysis_id=None):
+        """
+        Return the ProgramRegistry building the batched program of {analysis_type}.
+
+        Arguments:
+            analysis_type (str): The analysis type.
+            analysis_id (str or list, optional): The analysis ID(s) of the request (for error reporting).
+
+        Returns:
+            ProgramRegistry: The registry of the model's program.
+        """
+        model = self.get(analysis_type, analysis_id)
+        with self.lock:
+            if analysis_type not in self.programs:
+                self.programs[analysis_type] = ProgramRegistry(template=model.program, args=self.args)
+            return self.programs[analysis_type]
@@ -1,7 +1,7 @@
 import requests
 import base64
 import time
-from config import DEBUG, ProcessException
+from config import DEBUG, ProcessException, is_supported_batch_size
 
 class MozaikObelisk:
     """
@@ -116,7 +116,7 @@ class MozaikObelisk:
                 if isinstance(user_data, list):
                     batch_size = sum(len(sub_array) for sub_array in user_data)
                     try:
-                        assert ((batch_size <= 256 and batch_size % 16 == 0) or (batch_size <= 1024 and batch_size > 0 and (batch_size & (batch_size - 1)) == 0))
+                        assert is_supported_batch_size(batch_size)
                     except AssertionError as e:
                         if DEBUG:
                             print("Received data from obelisk: ",user_data, " for the following analysis ids: ", analysis_ids)
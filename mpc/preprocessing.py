@@ -0,0 +1,283 @@
+import glob
+import json
+import os
+import re
+import shutil
+import threading
+import time
+
+from config import DEBUG, ProcessException
+from distribution import OfflineDistributor
+
+
+def parse_preprocessing_usage(output):
+    """
+    Parse the "Actual cost of program" statistics that malicious-rep-ring-party.x prints with -v.
+
+    Arguments:
+        output (str): The standard error output of the MP-SPDZ run.
+
+    Returns:
+        dict: Number of items used per domain and data type, e.g. {('int', 'Triples'): 94248, ('bit', 'Triples'): 1000}. The edaBits
+            are listed under the domain 'edaBits' per length (e.g. ('edaBits', 'length 64')).
+    """
+    usage = {}
+    in_cost = False
+    field = None
+    for line in output.splitlines():
+        if line.startswith('Actual cost of program:'):
+            in_cost = True
+            continue
+        if not in_cost:
+            continue
+        type_match = re.match(r'^\s+Type (\w+)\s*$', line)
+        if type_match:
+            field = type_match.group(1)
+            continue
+        if line.strip() == 'edaBits':
+            field = 'edaBits'
+            continue
+        # With a cost file, MP-SPDZ prefixes each line with "<cost> = " and appends " @ <cost per item>"
+        item_match = re.match(r'^\s+(?:[\d.e+]+ = )?\s*(\d+)\s+([A-Za-z][A-Za-z ]*?)(?:\s*@\s*[\d.e+-]+)?(?:\s*\(.*\))?\s*$', line)
+        edabit_match = re.match(r'^\s+(?:[\d.e+]+ = )?\s*(\d+) of length (\d+)( \(strict\))?\s*$', line)
+        if field == 'edaBits' and edabit_match:
+            key = (field, f'length {edabit_match.group(2)}' + (' strict' if edabit_match.group(3) else ''))
+            usage[key] = usage.get(key, 0) + int(edabit_match.group(1))
+            continue
+        if item_match and field is not None:
+            key = (field, item_match.group(2))
+            usage[key] = usage.get(key, 0) + int(item_match.group(1))
+            continue
+        if line.strip() and not line.startswith(' '):
+            # end of the statistics block
+            in_cost = False
+    return usage
+
+
+class PreprocessingPool:
+    """
+    PreprocessingPool keeps offline material (triples, bits, ...) of malicious-rep-ring-party.x ready for online-only runs.
+
+    P0 generates the material with Fake-Offline.x in the background into a numbered staging directory and distributes it to the staging
+    directories of the other parties. The material in Player-Data is tracked per domain and data type with the consumption that MP-SPDZ
+    reports after every run. When the remaining material of any of them drops below the watermark, every party swaps in the next staged
+    generation before the next run. Since all parties run the same programs in the same order, they swap at the same batch boundary.
+    The generation in Player-Data, the remaining material and the consumption per program are kept in a state file next to the material,
+    so that a restarted party takes the same decisions as the others.
+
+    Attributes:
+        task_manager (TaskManager): The task manager of this party (for the configuration, run_offline and the request lock).
+        target (int): Number of tuples of every data type that is generated per refill.
+        watermark (int): Swap in new material when fewer tuples of a data type remain.
+        staging_dir (str): Local directory holding the numbered staged generations.
+        player_data_dir (str): The Player-Data directory read by MP-SPDZ.
+        state_path (str): File holding the state of the material in Player-Data.
+        staging_dest (list): Destinations of the staging directories of the other parties (used by P0), see distribution.make_transport.
+        timeout (float): Maximum number of seconds to wait for staged material.
+        generation (int): The generation in Player-Data, None if the material in Player-Data is unknown.
+        n_tuples (int): Number of tuples of every data type in the generation in Player-Data.
+        available (dict): Estimated number of remaining tuples per domain and data type in Player-Data (see parse_preprocessing_usage).
+        usage_per_program (dict): Last observed consumption of every program.
+    """
+    STATE_FILE = 'Prep-State.json'
+
+    def __init__(self, task_manager, target=1000000, watermark=200000, staging_dir='MP-SPDZ/Prep-Staging', staging_dest=None, timeout=600, player_data_dir='MP-SPDZ/Player-Data'):
+        """
+        Initialize the pool from the state file of {player_data_dir}, if any. Call start() to launch the background generation on P0.
+
+        Arguments:
+            task_manager (TaskManager): The task manager of this party.
+            target (int, optional): Number of tuples of every data type generated per refill. Defaults to 1000000.
+            watermark (int, optional): Swap in new material when fewer tuples of a data type remain. Should exceed the consumption of the largest batch. Defaults to 200000.
+            staging_dir (str, optional): Local staging directory. Defaults to 'MP-SPDZ/Prep-Staging'.
+            staging_dest (list, optional): Destinations ('host:path') of the staging directories of P1 and P2. Defaults to None (local only).
+            timeout (float, optional): Maximum number of seconds to wait for staged material. Defaults to 600.
+            player_data_dir (str, optional): The Player-Data directory read by MP-SPDZ. Defaults to 'MP-SPDZ/Player-Data'.
+        """
+        self.task_manager = task_manager
+        self.party_index = task_manager.config.CONFIG_PARTY_INDEX
+        self.target = target
+        self.watermark = watermark
+        self.staging_dir = staging_dir
+        self.staging_dest = staging_dest or []
+        self.timeout = timeout
+        self.player_data_dir = player_data_dir
+        self.state_path = os.path.join(player_data_dir, self.STATE_FILE)
+
+        self.generation = None
+        self.n_tuples = 0
+        self.available = {}
+        self.usage_per_program = {}
+        self.lock = threading.Lock()
+        self.swapped = threading.Event()
+        self.thread = None
+        self.load_state()
+
+    def load_state(self):
+        """
+        Restore the generation, the remaining material and the consumption per program from the state file, if it exists.
+        """
+        if not os.path.exists(self.state_path):
+            return
+        with open(self.state_path, 'r') as file:
+            state = json.load(file)
+        self.generation = state['generation']
+        self.n_tuples = state['n_tuples']
+        self.available = {(field, data_type): n for field, data_type, n in state['available']}
+        self.usage_per_program = {program: {(field, data_type): n for field, data_type, n in usage}
+                                  for program, usage in state['usage_per_program'].items()}
+
+    def save_state(self):
+        """
+        Write the generation, the remaining material and the consumption per program to the state file. The file is replaced
+        atomically, so that a crash leaves either the old or the new state.
+        """
+        state = {'generation': self.generation, 'n_tuples': self.n_tuples,
+                 'available': [[field, data_type, n] for (field, data_type), n in sorted(self.available.items())],
+                 'usage_per_program': {program: [[field, data_type, n] for (field, data_type), n in sorted(usage.items())]
+                                       for program, usage in self.usage_per_program.items()}}
+        os.makedirs(self.player_data_dir, exist_ok=True)
+        with open(self.state_path + '.tmp', 'w') as file:
+            json.dump(state, file)
+        os.replace(self.state_path + '.tmp', self.state_path)
+
+    def start(self):
+        """
+        Start generating staged material in the background (P0 only; the other parties receive it from P0).
+        """
+        os.makedirs(self.staging_dir, exist_ok=True)
+        if self.party_index == 0:
+            self.thread = threading.Thread(target=self.generate_forever)
+            self.thread.daemon = True
+            self.thread.start()
+
+    def staged_generations(self):
+        """
+        List the staged generations that are complete, i.e. the READY marker was written after all data arrived, and newer than the
+        generation in Player-Data.
+
+        Returns:
+            list: The generation numbers in increasing order.
+        """
+        generations = []
+        for marker in glob.glob(os.path.join(self.staging_dir, '*', 'READY')):
+            name = os.path.basename(os.path.dirname(marker))
+            if name.isdigit() and (self.generation is None or int(name) > self.generation):
+                generations.append(int(name))
+        return sorted(generations)
+
+    def next_generation_number(self):
+        """
+        Return the number of the next generation P0 produces. The counter is kept on disk so that it survives restarts.
+        """
+        counter_path = os.path.join(self.staging_dir, 'generation')
+        generation = 0
+        if os.path.exists(counter_path):
+            with open(counter_path, 'r') as file:
+                generation = int(file.read().strip() or 0)
+        generation += 1
+        with open(counter_path, 'w') as file:
+            file.write(str(generation))
+        return generation
+
+    def generate(self):
+        """
+        Generate one generation of material with Fake-Offline.x into the staging directory and distribute it to the other parties (P0 only).
+        The READY marker is written and sent last so that a generation is only used once it is complete everywhere.
+
+        Returns:
+            int: The generation number.
+        """
+        generation = self.next_generation_number()
+        generation_dir = os.path.join(self.staging_dir, str(generation))
+        os.makedirs(os.path.join(generation_dir, 'Player-Data'), exist_ok=True)
+        dests = [f'{dest.rstrip("/")}/{generation}/Player-Data' for dest in self.staging_dest]
+        self.task_manager.run_offline(distributed=len(dests) > 0, offline_dest=dests, n_tuples=self.target, workdir=generation_dir)
+
+        with open(os.path.join(generation_dir, 'READY'), 'w') as file:
+            file.write(str(self.target))
+        OfflineDistributor(generation_dir, [f'{dest.rstrip("/")}/{generation}' for dest in self.staging_dest]).distribute(patterns=('READY',))
+        if DEBUG:
+            print(f'Staged preprocessing generation {generation} with {self.target} tuples per type')
+        return generation
+
+    def generate_forever(self):
+        """
+        Background loop of P0: keep one complete generation staged at all times.
+        """
+        while True:
+            try:
+                if len(self.staged_generations()) == 0:
+                    self.generate()
+                else:
+                    self.swapped.wait(timeout=5)
+                    self.swapped.clear()
+            except Exception as e:
+                with self.task_manager.app.app_context():
+                    self.task_manager.app.logger.error(f'Generating preprocessing material failed: {e}')
+                time.sleep(5)
+
+    def swap(self, analysis_id):
+        """
+        Replace the material in MP-SPDZ/Player-Data by the oldest complete staged generation, waiting for it if needed.
+
+        Arguments:
+            analysis_id (str or list): The analysis ID(s) of the batch that triggered the swap (for error reporting).
+        """
+        deadline = time.time() + self.timeout
+        generations = self.staged_generations()
+        while len(generations) == 0:
+            if time.time() > deadline:
+                raise ProcessException(analysis_id, 500, f'No preprocessing material was staged within {self.timeout} seconds.')
+            time.sleep(0.5)
+            generations = self.staged_generations()
+
+        generation_dir = os.path.join(self.staging_dir, str(generations[0]))
+        for prep_dir in glob.glob(os.path.join(generation_dir, 'Player-Data', '3-*')):
+            target_dir = os.path.join(self.player_data_dir, os.path.basename(prep_dir))
+            if os.path.exists(target_dir):
+                shutil.rmtree(target_dir)
+            shutil.move(prep_dir, target_dir)
+        with open(os.path.join(generation_dir, 'READY'), 'r') as file:
+            n_tuples = int(file.read().strip() or self.target)
+
+        self.generation = generations[0]
+        self.n_tuples = n_tuples
+        self.available = {key: n_tuples for key in self.available}
+        self.save_state()
+        # the generation in Player-Data and older ones are never used again
+        for name in os.listdir(self.staging_dir):
+            if name.isdigit() and int(name) <= self.generation:
+                shutil.rmtree(os.path.join(self.staging_dir, name))
+        self.swapped.set()
+
+    def prepare(self, analysis_id, program):
+        """
+        Make sure enough material for {program} is in Player-Data, swapping in the next generation when the material of any domain and
+        data type would drop below the watermark, or when the material in Player-Data is unknown.
+        Must be called with the request lock held, right before the online-only run.
+
+        Arguments:
+            analysis_id (str or list): The analysis ID(s) of the batch.
+            program (str): The program that is about to run.
+        """
+        with self.lock:
+            expected = self.usage_per_program.get(program, {})
+            if self.generation is None or any(self.available.get(key, self.n_tuples) - expected.get(key, 0) < self.watermark
+                                              for key in set(self.available) | set(expected)):
+                self.swap(analysis_id)
+
+    def consume(self, program, output):
+        """
+        Account for the material used by a run of {program}, as reported in its MP-SPDZ output.
+
+        Arguments:
+            program (str): The program that ran.
+            output (str): The standard error output of the MP-SPDZ run.
+        """
+        usage = parse_preprocessing_usage(output)
+        with self.lock:
+            self.usage_per_program[program] = usage
+            for key, used in usage.items():
+                self.available[key] = self.available.get(key, self.n_tuples) - used
+            self.save_state()
@@ -0,0 +1,112 @@
+import os
+import subprocess
+import sys
+import threading
+
+from config import DEBUG, ProcessException
+
+
+class ProgramRegistry:
+    """
+    ProgramRegistry builds the batched inference program for any batch size from one parameterized MP-SPDZ template.
+    compile.py passes the batch size (and further arguments) to the template as program.args[1:] and names the result <template>-<batch size>[-<arguments>].
+    Programs are compiled on first use or by a background warm-up. compile.py caches the compiled schedule and bytecode (--cache, see
+    Compiler/compile_cache.py) by a content hash of the template, the compiler sources, the compile options and the arguments, so
+    unchanged programs are never compiled twice, not even across restarts.
+
+    Attributes:
+        template (str): Name of the template in MP-SPDZ/Programs/Source (without .mpc).
+        mpspdz_dir (str): The MP-SPDZ directory.
+        compile_options (list): Options passed to compile.py.
+        args (list): Compile arguments passed after the batch size.
+        cache_dir (str): The compile cache of compile.py, one subdirectory per content hash.
+        compiled (set): Names of the programs compiled or restored by this registry.
+    """
+    def __init__(self, template='heartbeat_inference_demo_batched', mpspdz_dir='MP-SPDZ', compile_options=('-R64',), cache_dir='MP-SPDZ/Programs/Cache', args=()):
+        """
+        Initialize the registry. Nothing is compiled until get() or warm_up() is called.
+
+        Arguments:
+            template (str, optional): Name of the template in MP-SPDZ/Programs/Source. Defaults to 'heartbeat_inference_demo_batched'.
+            mpspdz_dir (str, optional): The MP-SPDZ directory. Defaults to 'MP-SPDZ'.
+            compile_options (tuple, optional): Options passed to compile.py. Defaults to ('-R64',).
+            cache_dir (str, optional): The compile cache of compile.py. Defaults to 'MP-SPDZ/Programs/Cache'.
+            args (tuple, optional): Compile arguments passed after the batch size. Defaults to ().
+        """
+        self.template = template
+        self.mpspdz_dir = mpspdz_dir
+        self.compile_options = list(compile_options)
+        self.cache_dir = cache_dir
+        self.args = [str(arg) for arg in args]
+        self.compiled = set()
+
+        self.lock = threading.Lock()
+        self.program_locks = {}
+
+    def program_name(self, batch_size):
+        """
+        Return the name compile.py gives to the template compiled for {batch_size}.
+        """
+        return '-'.join([self.template, str(batch_size)] + self.args)
+
+    def compile(self, batch_size):
+        """
+        Compile the template for {batch_size} with compile.py, which restores the program from the compile cache if unchanged.
+
+        Returns:
+            CompletedProcess: The finished compilation.
+        """
+        command = [sys.executable, 'compile.py', '--cache', os.path.abspath(self.cache_dir)] + self.compile_options + \
+            [self.template, str(batch_size)] + self.args
+        result = subprocess.run(command, capture_output=True, text=True, check=True, cwd=self.mpspdz_dir)
+        if DEBUG:
+            print("Compiler Output:", result.stdout)
+        return result
+
+    def get(self, batch_size, analysis_id=None):
+        """
+        Return the program for {batch_size}, compiling it or restoring it from the cache on first use.
+        Concurrent calls for the same batch size wait for a single compilation.
+
+        Arguments:
+            batch_size (int): The number of samples in the batch.
+            analysis_id (str or list, optional): The analysis ID(s) of the batch (for error reporting).
+
+        Returns:
+            str: The program name to pass to MP-SPDZ.
+        """
+        name = self.program_name(batch_size)
+        with self.lock:
+            program_lock = self.program_locks.setdefault(name, threading.Lock())
+        with program_lock:
+            if name in self.compiled:
+                return name
+            try:
+                self.compile(batch_size)
+            except subprocess.CalledProcessError as e:
+                raise ProcessException(analysis_id, 500, f"Error compiling program {name}: {e}, Output: {e.stdout} and ErrOutput: {e.stderr}")
+            if DEBUG:
+                print(f'Compiled {name}')
+            self.compiled.add(name)
+        return name
+
+    def warm_up(self, batch_sizes):
+        """
+        Compile the programs for {batch_sizes} in a background thread.
+
+        Arguments:
+            batch_sizes (list): The batch sizes to prepare.
+
+        Returns:
+            threading.Thread: The warm-up thread.
+        """
+        def run():
+            for batch_size in batch_sizes:
+                try:
+                    self.get(batch_size)
+                except ProcessException as e:
+                    print(f'Warm-up of batch size {batch_size} failed: {e}')
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+        return thread
@@ -2,6 +2,7 @@ from key_share import prepare_params_for_dist_enc
 
 import subprocess
 import json
+import numpy as np
 from config import DEBUG
 
 class Rep3AesConfig:
@@ -54,7 +55,7 @@ def dist_enc(config, keys, params):
             output.append(_dist_enc_call(config, [arg])[0])
         return output
 
-def dist_dec(config, args):
+def dist_dec(config, args, as_array=False):
     """
     Arguments
     - config: Rep3AesConfig
@@ -62,6 +63,7 @@ def dist_dec(config, args):
         - user_id: string
         - key_share: bytes-like of length 16 or 176
         - ciphertext: bytes-like
+    - as_array: return every result as numpy array of shape (n, 2) and type uint64 instead of a list
 
     Returns [res1, res2, ...] where
     res is either a list of pairs of 64-bit numbers or None if the decryption failed for this argument
@@ -91,11 +93,11 @@ def dist_dec(config, args):
             raise ValueError("Unsupported key_share length")
         inputs.append(args)
     if batched:
-        return _dist_dec_call(config, inputs)
+        return _dist_dec_call(config, inputs, as_array)
     else:
         output = list()
         for arg in inputs:
-            output.append(_dist_dec_call(config, [arg])[0])
+            output.append(_dist_dec_call(config, [arg], as_array)[0])
         return output
 
 def _dist_enc_call(config, input_args):
@@ -124,7 +126,11 @@ def _dist_enc_call(config, input_args):
             raise RuntimeError(f'Unexpected output: {output_part}')
     return encryption_result
 
-def _dist_dec_call(config, input_args):
+def _is_share(m):
+    # an integer share in Z2^64, possibly negative (bool is a subclass of int)
+    return isinstance(m, int) and not isinstance(m, bool) and abs(m) < 2**64
+
+def _dist_dec_call(config, input_args, as_array=False):
     command = [config.bin, '--config', config.config, 'decrypt', '--mode', 'AES-GCM-128']
     
     input_args = json.dumps(input_args)
@@ -144,12 +150,19 @@ def _dist_dec_call(config, input_args):
         if "message_share" in res and "error" not in res and "tag_error" not in res:
             # message share should be a list of pairs of numbers
             message_share = res["message_share"]
+            negative = False
             for m in message_share:
-                if len(m) != 2:
+                if not isinstance(m, list) or len(m) != 2:
                     raise RuntimeError(f'Dist_dec output unexpected: {m}')
                 m1,m2 = m
-                if not isinstance(m1, int) or abs(m1) >= 2**64 or not isinstance(m2, int) or abs(m2) >= 2**64:
+                if not _is_share(m1) or not _is_share(m2):
                     raise RuntimeError(f'Dist_dec output unexpected: {m1} {m2}')
+                negative = negative or m1 < 0 or m2 < 0
+            if as_array:
+                if negative:
+                    # the same value in Z2^64 as in the list
+                    message_share = [[m1 % 2**64, m2 % 2**64] for m1, m2 in message_share]
+                message_share = np.array(message_share, dtype=np.uint64).reshape(len(message_share), 2)
             outputs.append(message_share)
         elif "tag_error" in res and "error" not in res:
             if DEBUG:
@@ -0,0 +1,131 @@
+import collections
+import queue
+
+PRIORITY_CLASSES = ['streaming', 'batch']
+
+
+def priority_class(request):
+    """
+    Return the priority class of a queued request (see TaskManager.process_requests for the layout): streaming requests carry their streaming windows.
+    """
+    return 'streaming' if request[5] is not None else 'batch'
+
+
+class RequestQueue(queue.Queue):
+    """
+    RequestQueue holds the requests of TaskManager with admission control.
+    The number of queued analyses is bounded by max_queued, and part of this capacity can be reserved per priority class:
+    a class can only use the capacity that is not reserved for (and not yet used by) the other classes.
+    Requests are served by priority class (streaming first) and in arrival order within a class.
+    The wait time of a new request is estimated from the processing times of the recent batches.
+
+    Attributes:
+        max_queued (int): Maximum number of queued analyses, None for no limit.
+        reserved (dict): Number of analyses reserved per priority class.
+        default_analysis_time (float): Seconds per analysis assumed before any batch was processed.
+        queued (dict): Number of queued analyses per priority class.
+        history (deque): Number of analyses and processing time of the recent batches.
+    """
+    def __init__(self, max_queued=None, reserved=None, default_analysis_time=10.0, history=20):
+        """
+        Initialize the queue.
+
+        Arguments:
+            max_queued (int, optional): Maximum number of queued analyses. Defaults to None (no limit).
+            reserved (dict, optional): Number of analyses reserved per priority class. Defaults to no reservation.
+            default_analysis_time (float, optional): Seconds per analysis assumed before any batch was processed. Defaults to 10.
+            history (int, optional): Number of recent batches for the wait time estimate. Defaults to 20.
+        """
+        self.max_queued = max_queued
+        self.reserved = dict(reserved or {})
+        for name in self.reserved:
+            if name not in PRIORITY_CLASSES:
+                raise ValueError(f'Unknown priority class {name}, supported are {", ".join(PRIORITY_CLASSES)}')
+        self.default_analysis_time = default_analysis_time
+        self.history = collections.deque(maxlen=history)
+        super().__init__()
+
+    def _init(self, maxsize):
+        self.requests = {name: collections.deque() for name in PRIORITY_CLASSES}
+        self.queued = {name: 0 for name in PRIORITY_CLASSES}
+
+    def _qsize(self):
+        return sum(len(requests) for requests in self.requests.values())
+
+    def _put(self, request):
+        name = priority_class(request)
+        self.requests[name].append(request)
+        self.queued[name] += len(request[0])
+
+    def _get(self):
+        for name in PRIORITY_CLASSES:
+            if self.requests[name]:
+                request = self.requests[name].popleft()
+                self.queued[name] -= len(request[0])
+                return request
+
+    def capacity(self, name):
+        """
+        Return the number of analyses of priority class {name} that can still be queued, None if unlimited. Must be called with the mutex held.
+        """
+        if self.max_queued is None:
+            return None
+        free = self.max_queued - sum(self.queued.values())
+        for other, reserved in self.reserved.items():
+            if other != name:
+                free -= max(0, reserved - self.queued[other])
+        return max(0, free)
+
+    def offer(self, request):
+        """
+        Queue {request} if its priority class has capacity for its analyses.
+
+        Arguments:
+            request (tuple): The request (analysis_ids, user_ids, analysis_type, data_indeces, online_only, streaming).
+
+        Returns:
+            bool: Whether the request was queued.
+        """
+        with self.not_full:
+            capacity = self.capacity(priority_class(request))
+            if capacity is not None and len(request[0]) > capacity:
+                return False
+            self._put(request)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+            return True
+
+    def record(self, n_analyses, duration):
+        """
+        Record that a batch of {n_analyses} analyses was processed in {duration} seconds.
+        """
+        with self.mutex:
+            self.history.append((n_analyses, duration))
+
+    def analysis_time(self):
+        """
+        Return the estimated processing time of one analysis in seconds, from the recent batches.
+        """
+        with self.mutex:
+            n_analyses = sum(n for n, _ in self.history)
+            if n_analyses == 0:
+                return self.default_analysis_time
+            return sum(duration for _, duration in self.history) / n_analyses
+
+    def retry_after(self, request):
+        """
+        Estimate the number of seconds until enough queued analyses are processed to admit {request}.
+        """
+        with self.mutex:
+            capacity = self.capacity(priority_class(request))
+        missing = 0 if capacity is None else max(0, len(request[0]) - capacity)
+        return missing * self.analysis_time()
+
+    def estimated_wait(self, request):
+        """
+        Estimate the number of seconds until {request} is processed: the analyses queued before it and its own analyses.
+        """
+        name = priority_class(request)
+        with self.mutex:
+            ahead = sum(self.queued[other] for other in PRIORITY_CLASSES[:PRIORITY_CLASSES.index(name) + 1])
+        return (ahead + len(request[0])) * self.analysis_time()
@@ -8,3 +8,14 @@ python3 test_analysis_app.py
 python3 test_database.py
 python3 test_mozaik_obelisk.py
 python3 test_task_manager.py
+python3 test_benchmark.py
+python3 test_preprocessing.py
+python3 test_distribution.py
+python3 test_program_registry.py
+python3 test_request_queue.py
+python3 test_model_registry.py
+python3 test_inference_engine.py
+python3 test_compile_benchmark.py
+python3 test_merger_benchmark.py
+python3 test_softmax_benchmark.py
+python3 test_batch_cost_model.py
@@ -47,22 +47,11 @@ make Fake-Offline.x || print_red_and_exit "Failed to build Fake-Offline.x"
 
 # Compile using compile.py
 print_green "Compiling heartbeat_inference_demo programs"
-# Compile the non-batched version.
-./compile.py -R64 heartbeat_inference_demo || print_red_and_exit "Compilation failed"
-
-# Compile the batched demos for all powers of 2 up to 1024.
-for (( b=1; b<=1024; b*=2 )); do
-    ./compile.py -R64 heartbeat_inference_demo_batched_${b} || print_red_and_exit "Compilation failed"
-done
-
-# Compile the batched demos for multiples of 16 up to 256 that are not powers of 2.
-for b in $(seq 16 16 256); do
-    # Test if b is a power of 2.
-    if (( (b & (b-1)) == 0 )); then
-        continue
-    fi
-    ./compile.py -R64 heartbeat_inference_demo_batched_${b} || print_red_and_exit "Compilation failed"
-done
+# Compile the non-batched version, an unchanged program is reused from the compile cache.
+./compile.py -R64 --cache Programs/Cache heartbeat_inference_demo || print_red_and_exit "Compilation failed"
+
+# The batched demos (heartbeat_inference_demo_batched <n>) are compiled by the service on first use,
+# set program_warmup in the server configuration to compile them in the background at startup.
 
 # Setup new TLS keys between the MPC parties
 if [ "$1" -eq 0 ]; then
@@ -73,6 +62,10 @@ if [ "$1" -eq 0 ]; then
   scp Player-Data/P* root@10.10.168.48:~/libmozaik/mpc/MP-SPDZ/Player-Data || print_red_and_exit "Failed to send certificates to P2"
 fi
 
+# Client certificates for the inference engine, every party's service is the client of its own MP-SPDZ party
+print_green "Generating client certificates for the inference engine"
+Scripts/setup-clients.sh 3 || print_red_and_exit "Failed to generate client certificates"
+
 # Move deployment keys to rep3aes/keys directory
 print_green "Moving deployment keys to rep3aes/keys directory"
 mv ../rep3aes-deployment-keys/p* ../rep3aes/keys/ || print_red_and_exit "Failed to move deployment keys"
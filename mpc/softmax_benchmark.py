@@ -0,0 +1,226 @@
+"""
+Accuracy and cost of the softmax approximations of the heartbeat MLP.
+
+For every softmax mode (exact, relu: ReLU division, poly: polynomial approximation of the exponential, see ml.MultiOutput.softmax
+and SOFTMAX_MODES in config.py), it emulates the output layer in fixed point with 8 fractional bits on the plaintext MIT-BIH model
+(MP-SPDZ/ML-Data) and compares the probabilities and predicted classes with the floating-point softmax and the labels. It also
+compiles MP-SPDZ/Programs/Source/heartbeat_mlp_benchmark.mpc in inference mode with every softmax mode and reports the online
+rounds and preprocessing material (see compile_benchmark.py), and the batch size from which every approximation needs fewer
+rounds than the exact softmax.
+
+The exact softmax runs a loop over the samples, so its rounds grow with the batch, while the approximations take the same
+number of rounds for every batch size. Compiled for heartbeat_mlp_benchmark (inference mode):
+
+    batch size    exact  relu  poly (rounds)
+    1-12             22  16-18    25-31
+    14               31    18    31
+    16               40    18    31
+    64              103    18    31
+    256             346    18    31
+
+So poly only saves rounds from batch size 16 on, and costs up to 9 more rounds below. The triples barely differ (2.5% fewer
+with relu at batch 16). On sample.txt, the maximum absolute error of the probabilities is 0.0013 (exact), 0.0027 (poly) and
+0.21 (relu), and all three predict the same class; ML-Data/input.txt (see ML-Data/Data_prep.py) gives the numbers on the
+MIT-BIH test set.
+
+The samples are read from --inputs, either in the format of ML-Data/Data_prep.py (two lines with the dimensions followed by the
+rows, e.g. the MIT-BIH test set ML-Data/input.txt) or one sample per line (e.g. sample.txt). The labels (ML-Data/truevals.txt)
+are only used if they have as many rows as the samples.
+
+Usage (from the mpc directory):
+    python3 softmax_benchmark.py --inputs MP-SPDZ/ML-Data/input.txt --batch-sizes 16 1024 --json softmax_benchmark.json
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+from compile_benchmark import compile_program
+from config import SOFTMAX_MODES
+
+ML_DATA = 'MP-SPDZ/ML-Data'
+# sfix.set_precision(8, 16) in the heartbeat programs
+FRACTIONAL_BITS = 8
+# squarings of ml.approx_exp
+POLY_SQUARINGS = 3
+
+
+def load_matrix(path):
+    """
+    Load a matrix written in the format of ML-Data/Data_prep.py: the number of rows and columns on the first two lines, followed
+    by the rows.
+
+    Returns:
+        numpy.ndarray: The matrix.
+    """
+    with open(path, 'r') as file:
+        rows = int(file.readline())
+        columns = int(file.readline())
+        return np.loadtxt(file, ndmin=2).reshape(rows, columns)
+
+
+def load_samples(path):
+    """
+    Load samples in the format of ML-Data/Data_prep.py or with one sample per line.
+
+    Returns:
+        numpy.ndarray: One row per sample.
+    """
+    with open(path, 'r') as file:
+        first = file.readline().split()
+    if len(first) == 1:
+        return load_matrix(path)
+    return np.loadtxt(path, ndmin=2)
+
+
+def load_model(ml_data=ML_DATA):
+    """
+    Load the weights and biases of the heartbeat MLP from {ml_data}.
+
+    Returns:
+        list: (weights, biases) per layer.
+    """
+    return [(load_matrix(os.path.join(ml_data, f'weights{i}_relu.txt')),
+             load_matrix(os.path.join(ml_data, f'biases{i}_relu.txt')).reshape(-1)) for i in range(5)]
+
+
+def quantize(x):
+    """
+    Round to the fixed-point precision of the heartbeat programs (nearest rounding in place of the probabilistic truncation).
+    """
+    return np.round(np.asarray(x) * 2 ** FRACTIONAL_BITS) / 2 ** FRACTIONAL_BITS
+
+
+def logits(model, samples):
+    """
+    Evaluate the dense layers with ReLU activation on {samples} in fixed point.
+
+    Returns:
+        numpy.ndarray: The inputs of the softmax, one row per sample.
+    """
+    x = quantize(samples)
+    for i, (weights, biases) in enumerate(model):
+        x = quantize(x @ quantize(weights) + quantize(biases))
+        if i < len(model) - 1:
+            x = np.maximum(x, 0)
+    return x
+
+
+def softmax(x, mode='exact'):
+    """
+    Emulate the softmax of ml.MultiOutput.eval over the rows of {x} in fixed point.
+
+    Arguments:
+        x (numpy.ndarray): The logits, one row per sample.
+        mode (str, optional): One of SOFTMAX_MODES. Defaults to 'exact'.
+
+    Returns:
+        numpy.ndarray: The probabilities (uniform with ReLU division for the rows without a positive logit).
+    """
+    x = np.asarray(x, dtype=float)
+    if mode == 'exact':
+        e = np.exp(x - x.max(axis=1, keepdims=True))
+        return quantize(e / e.sum(axis=1, keepdims=True))
+    if mode == 'relu':
+        # the smallest fixed-point value avoids the division by zero
+        e = np.maximum(x, 0) + 2 ** -FRACTIONAL_BITS
+    elif mode == 'poly':
+        e = np.maximum(1 + quantize((x - x.max(axis=1, keepdims=True)) * 2 ** -POLY_SQUARINGS), 0)
+        for _ in range(POLY_SQUARINGS):
+            e = quantize(e * e)
+    else:
+        raise ValueError(f'Invalid softmax {mode}, supported are {", ".join(SOFTMAX_MODES)}')
+    return quantize(e * quantize(1 / e.sum(axis=1, keepdims=True)))
+
+
+def accuracy_report(x, labels=None):
+    """
+    Compare the softmax modes on the logits {x} with the floating-point softmax.
+
+    Arguments:
+        x (numpy.ndarray): The logits, one row per sample.
+        labels (numpy.ndarray, optional): The one-hot labels of the samples. Defaults to None.
+
+    Returns:
+        list: Per mode, the fraction of samples with the same prediction as the floating-point softmax (agreement), the fraction
+            of correct predictions (accuracy, if labels are given) and the maximum and mean absolute error of the probabilities.
+    """
+    x = np.asarray(x, dtype=float)
+    e = np.exp(x - x.max(axis=1, keepdims=True))
+    reference = e / e.sum(axis=1, keepdims=True)
+    report = []
+    for mode in SOFTMAX_MODES:
+        probabilities = softmax(x, mode)
+        guesses = np.argmax(probabilities, axis=1)
+        error = np.abs(probabilities - reference)
+        entry = {'mode': mode, 'samples': len(x), 'agreement': float(np.mean(guesses == np.argmax(reference, axis=1))),
+                 'max_error': float(error.max()), 'mean_error': float(error.mean())}
+        if labels is not None:
+            entry['accuracy'] = float(np.mean(guesses == np.argmax(labels, axis=1)))
+        report.append(entry)
+    return report
+
+
+def round_crossover(costs, mode):
+    """
+    Find the smallest batch size from which {mode} needs fewer rounds than the exact softmax at every compiled batch size.
+
+    Arguments:
+        costs (list): Results of compile_program for the softmax modes.
+        mode (str): The approximation, e.g. 'poly'.
+
+    Returns:
+        int: The batch size, None if {mode} does not need fewer rounds at the largest compiled batch size.
+    """
+    rounds = {}
+    for result in costs:
+        rounds.setdefault(result['batch_size'], {})[result['softmax'] or 'exact'] = result['cost'].get('virtual machine rounds', 0)
+    crossover = None
+    for batch_size in sorted(rounds, reverse=True):
+        if mode not in rounds[batch_size] or 'exact' not in rounds[batch_size]:
+            continue
+        if rounds[batch_size][mode] >= rounds[batch_size]['exact']:
+            break
+        crossover = batch_size
+    return crossover
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the accuracy and cost of the softmax approximations of the heartbeat MLP')
+    parser.add_argument('--inputs', default=os.path.join(ML_DATA, 'input.txt'), help='samples (default: the MIT-BIH test set)')
+    parser.add_argument('--labels', default=os.path.join(ML_DATA, 'truevals.txt'), help='one-hot labels of the samples')
+    parser.add_argument('--batch-sizes', type=int, nargs='*', default=[16, 1024], help='batch sizes to compile, none to skip compiling')
+    parser.add_argument('--json', dest='json_path', default=None, help='path of the JSON report')
+    args = parser.parse_args()
+
+    samples = load_samples(args.inputs)
+    labels = load_matrix(args.labels) if os.path.exists(args.labels) else None
+    if labels is not None and len(labels) != len(samples):
+        labels = None
+    accuracy = accuracy_report(logits(load_model(), samples), labels)
+    costs = [compile_program(batch_size, 'inference', softmax=None if mode == 'exact' else mode)
+             for batch_size in args.batch_sizes for mode in SOFTMAX_MODES]
+    if args.json_path is not None:
+        with open(args.json_path, 'w') as file:
+            json.dump({'inputs': args.inputs, 'accuracy': accuracy, 'cost': costs,
+                       'crossover': {mode: round_crossover(costs, mode) for mode in SOFTMAX_MODES[1:]}}, file, indent=2)
+    for entry in accuracy:
+        correct = f'accuracy={entry["accuracy"]:.4f} ' if 'accuracy' in entry else ''
+        print(f'{entry["mode"]:5s} samples={entry["samples"]} agreement={entry["agreement"]:.4f} {correct}'
+              f'max_error={entry["max_error"]:.4f} mean_error={entry["mean_error"]:.4f}')
+    for result in costs:
+        cost = result['cost']
+        print(f'batch_size={result["batch_size"]:5d} {result["softmax"] or "exact":5s} '
+              f'triples={cost.get("integer triples", 0):9d} bits={cost.get("integer bits", 0):8d} '
+              f'rounds={cost.get("virtual machine rounds", 0):5} compile={result["compile_time"]:.1f}s')
+    for mode in SOFTMAX_MODES[1:] if costs else []:
+        crossover = round_crossover(costs, mode)
+        if crossover is None:
+            print(f'{mode:5s} does not need fewer rounds than exact at the largest batch size')
+        else:
+            print(f'{mode:5s} needs fewer rounds than exact from batch size {crossover}')
+
+
+if __name__ == '__main__':
+    main()
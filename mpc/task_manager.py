@@ -1,14 +1,81 @@
 import os
 import subprocess
 import struct
-import queue
 import threading
 import time
 
+import numpy as np
+
 from mozaik_obelisk import MozaikObelisk
 from rep3aes import dist_dec, dist_enc
 from key_share import MpcPartyKeys, decrypt_key_share, decrypt_key_share_for_streaming
+from preprocessing import PreprocessingPool
+from model_registry import ModelRegistry, read_model_from_file
+from inference_engine import InferenceEngine
+from request_queue import RequestQueue
 from config import DEBUG, ProcessException
+from distribution import OfflineDistributor
+
+# Header of the MP-SPDZ Persistence file for shares of malicious replicated Z2^64
+SHARES_HEADER = bytes([
+    0x1e, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x6d, 0x61, 0x6c, 0x69, 0x63, 0x69, 0x6f, 0x75,
+    0x73, 0x20, 0x72, 0x65, 0x70, 0x6c, 0x69, 0x63,
+    0x61, 0x74, 0x65, 0x64, 0x20, 0x5a, 0x32, 0x5e,
+    0x36, 0x34, 0x40, 0x00, 0x00, 0x00
+])
+
+# Marker in the header of the result region of the MP-SPDZ shares file
+RESULT_MARKER = int.from_bytes(b'MZKRSLTS', 'little')
+
+# Stages of a job, a resumed job continues after the stage it finished last (see TaskManager.process_requests).
+# The stages before 'encrypted' run in MPC, so a job that did not reach it starts again from 'queued' on every party.
+JOB_STAGES = ['queued', 'encrypted']
+
+
+def encode_shares(data):
+    """
+    Encode RSS shares in ring mod 2^64 as 64-bit little endian integers, in the order given.
+
+    Arguments:
+        data (list): The shares, each a pair of signed or unsigned 64-bit integers.
+
+    Returns:
+        bytes: The encoded shares.
+    """
+    values = [share % (1 << 64) for rss_share in data for share in rss_share]
+    return struct.pack(f'<{len(values)}Q', *values)
+
+
+def decode_shares(data):
+    """
+    Decode shares read from the MP-SPDZ shares file (x_{i+1} first, 16 bytes per share).
+
+    Returns:
+        list: List of u64 RSS shares in form (x_i, x_{i+1}).
+    """
+    return np.frombuffer(data, dtype='<u8').reshape(-1, 2)[:, ::-1].tolist()
+
+
+def encode_input_shares(samples):
+    """
+    Encode decrypted samples into one buffer laid out as the input in the MP-SPDZ shares file (x_{i+1} first).
+    Every share is copied once, from a strided view of the sample that swaps x_i and x_{i+1}.
+
+    Arguments:
+        samples (list): Arrays of shape (n, 2) with the RSS shares (x_i, x_{i+1}) of every sample, as returned by dist_dec(as_array=True).
+
+    Returns:
+        bytearray: The encoded shares, 16 bytes per share.
+    """
+    n_shares = sum(len(sample) for sample in samples)
+    buffer = bytearray(16 * n_shares)
+    view = np.frombuffer(buffer, dtype='<u8').reshape(n_shares, 2)
+    offset = 0
+    for sample in samples:
+        view[offset:offset + len(sample)] = sample[:, ::-1]
+        offset += len(sample)
+    return buffer
 
 
 class TaskManager:
@@ -21,13 +88,19 @@ class TaskManager:
         config (Config): The configuration object.
         aes_config (Rep3AesConfig): The AES configuration object.
         keys (MpcPartyKeys): Instance of MpcPartyKeys for managing pubic keys.
-        request_queue (queue.Queue): Queue for storing tasks.
+        request_queue (RequestQueue): Queue for storing tasks, with admission control.
         request_thread (threading.Thread): Thread for processing requests.
         mozaik_obelisk (MozaikObelisk): Instance of MozaikObelisk for interactions with the Mozaik Obelisk.
-        request_lock (threading.Lock): Lock for ensuring thread safety.
+        request_lock (threading.RLock): Lock for ensuring thread safety, also taken by the inference engine while it starts.
         sharesfile (str): File path for storing shares for MP-SPDZ.
+        preprocessing_pool (PreprocessingPool): Pool of offline material for online-only runs, None if disabled in the configuration.
+        model_registry (ModelRegistry): The models per analysis type, with the registries compiling their batched programs for every batch size.
+        inference_engine (InferenceEngine): Long-running MP-SPDZ party serving the inference, None if disabled in the configuration.
+        models (dict): Encoded model shares per analysis type, read from the share files once per process.
+        persisted_model (str): Analysis type whose model is at the start of the shares file, None if unknown.
+        result_region (tuple): Position (in shares after the file header) and number of the results of the current run, None if not set.
     """
-    def __init__(self, app, db, config, aes_config, timer):
+    def __init__(self, app, db, config, aes_config, timer, mozaik_obelisk=None):
         """
         Initialize the TaskManager with the provided parameters.
 
@@ -36,6 +109,8 @@ class TaskManager:
             db (Database): The database instance.
             config (Config): The configuration object.
             aes_config (Rep3AesConfig): The AES configuration object.
+            timer (AnalysisTimer): The timer recording analysis and stage durations.
+            mozaik_obelisk (MozaikObelisk, optional): The Obelisk client to use. Defaults to a client for the MOZAIK deployment.
         """
         self.app = app
         self.db = db
@@ -44,16 +119,42 @@ class TaskManager:
         self.keys = MpcPartyKeys(self.config.keys_config())
         self.timer = timer
 
-        self.request_queue = queue.Queue()
+        self.request_queue = RequestQueue(**self.config.CONFIG_ADMISSION)
+        self.models = {}
+        self.persisted_model = None
+        self.result_region = None
+        self.model_registry = ModelRegistry(self.config.CONFIG_MODELS, args=self.output_mode_args())
+
+        self.preprocessing_pool = None
+        if self.config.CONFIG_PREPROCESSING is not None:
+            self.preprocessing_pool = PreprocessingPool(self, **self.config.CONFIG_PREPROCESSING)
+
+        self.inference_engine = None
+        if self.config.CONFIG_INFERENCE_ENGINE is not None:
+            self.inference_engine = InferenceEngine(self, **self.config.CONFIG_INFERENCE_ENGINE)
 
         self.request_thread = threading.Thread(target=self.process_requests)
         self.request_thread.daemon = True
         self.request_thread.start()   
 
-        self.mozaik_obelisk = MozaikObelisk('https://mozaik.ilabt.imec.be/api', self.config.CONFIG_SERVER_ID, self.config.CONFIG_SERVER_SECRET)
-        self.request_lock = threading.Lock()
+        if mozaik_obelisk is None:
+            mozaik_obelisk = MozaikObelisk('https://mozaik.ilabt.imec.be/api', self.config.CONFIG_SERVER_ID, self.config.CONFIG_SERVER_SECRET)
+        self.mozaik_obelisk = mozaik_obelisk
+        self.request_lock = threading.RLock()
         self.sharesfile = f'MP-SPDZ/Persistence/Transactions-P{self.config.CONFIG_PARTY_INDEX}.data'
 
+        if self.preprocessing_pool is not None:
+            self.preprocessing_pool.start()
+        for analysis_type in self.model_registry.warm():
+            try:
+                self.load_model(None, analysis_type)
+            except ProcessException as e:
+                print(f'Loading the model of {analysis_type} failed: {e}')
+            self.model_registry.program_registry(analysis_type).warm_up(self.config.CONFIG_PROGRAM_WARMUP)
+        if self.inference_engine is not None:
+            self.inference_engine.warm_up()
+        self.resume_jobs()
+
 
     def write_shares(self, analysis_id, data, append=False):
         """
@@ -64,15 +165,6 @@ class TaskManager:
             data (list): The shares to write.
             append (bool, optional): Whether to append to an existing file. Defaults to False.
         """
-        # Define the data to be written at the beginning
-        header_data = bytearray([
-            0x1e, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 
-            0x6d, 0x61, 0x6c, 0x69, 0x63, 0x69, 0x6f, 0x75, 
-            0x73, 0x20, 0x72, 0x65, 0x70, 0x6c, 0x69, 0x63,
-            0x61, 0x74, 0x65, 0x64, 0x20, 0x5a, 0x32, 0x5e, 
-            0x36, 0x34, 0x40, 0x00, 0x00, 0x00
-        ])
-
         # Open the binary file in write or append mode
         mode = 'ab' if append else 'wb'
 
@@ -81,61 +173,99 @@ class TaskManager:
             with open(self.sharesfile, mode) as file:
                 # Write the header data at the beginning of the file
                 if not append:
-                    file.write(header_data)
+                    file.write(SHARES_HEADER)
+                    self.persisted_model = None
+                    self.result_region = None
                 # Encode and write the input 64-bit integers in little endian format
-                for rss_share in data:
-                    for u64_share in rss_share:
-                        signed_share = (u64_share - 2**64) if (u64_share > 2**63) else u64_share
-                        packed_share = struct.pack('<q', signed_share)
-                        file.write(packed_share)
+                file.write(encode_shares(data))
                 file.flush()
         except Exception as e:
             raise ProcessException(analysis_id, 500, f'Error writing into a file: {e}')
 
     def read_shares(self, analysis_id, number_of_shares=5):
         """
-        Read {number of RSSshares} as shares from the MP-SPDZ persistence file, decode them according to ring mod 2^64 and return them as a list
+        Read the last {number_of_shares} RSS shares from the MP-SPDZ shares file, for programs that append their results instead of
+        writing them to a result region (e.g. heartbeat_inference_demo, the default program of run_inference).
 
-        Argumentss:
+        Arguments:
             analysis_id (str): The analysis ID.
-            number_of_values (int, optional): Number of RSS shares to read. Defaults to 5.
+            number_of_shares (int, optional): Number of RSS shares to read. Defaults to 5.
 
         Returns:
             list: List of u64 RSS shares in form (x_i, x_{i+1}).
         """
-        # Move the result to the targetfile
-        if os.path.exists(self.sharesfile):
-            try:
-                # Open the file in binary read mode
-                with open(self.sharesfile, 'rb') as binary_file:
-                    # Get the file size
-                    file_size = os.path.getsize(self.sharesfile)
+        if not os.path.exists(self.sharesfile):
+            raise ProcessException(analysis_id, 500, f"The output file does not exist: the file '{self.sharesfile}' does not exist.")
+        try:
+            with open(self.sharesfile, 'rb') as file:
+                file.seek(max(0, os.path.getsize(self.sharesfile) - 16 * number_of_shares))
+                return decode_shares(file.read())
+        except (OSError, ValueError) as e:
+            raise ProcessException(analysis_id, 500, f"Unable to interpret the result: {e}")
 
-                    # Calculate the start position for reading the last 80 bytes
-                    start_position = max(0, file_size - 8*number_of_shares*2)
+    def read_results(self, analysis_id):
+        """
+        Read the results of the current run from the result region of the MP-SPDZ shares file (see set_model).
+        Only the region is read, and its header is checked against the expected number of results.
 
-                    # Move the file pointer to the start position
-                    binary_file.seek(start_position)
+        Arguments:
+            analysis_id (str or list): The analysis ID(s).
+
+        Returns:
+            list: List of u64 RSS shares in form (x_i, x_{i+1}).
+        """
+        if self.result_region is None:
+            raise ProcessException(analysis_id, 500, 'No result region was set up for this run.')
+        position, n_outputs = self.result_region
+        try:
+            with open(self.sharesfile, 'rb') as file:
+                file.seek(len(SHARES_HEADER) + 16 * position)
+                region = file.read(16 * (n_outputs + 1))
+        except OSError as e:
+            raise ProcessException(analysis_id, 500, f'Unable to read the result: {e}')
+        if len(region) < 16:
+            raise ProcessException(analysis_id, 500, 'The result region is missing.')
+        marker, count = struct.unpack_from('<QQ', region)
+        if marker != RESULT_MARKER or count != n_outputs:
+            raise ProcessException(analysis_id, 500, f'Invalid header of the result region (expected {n_outputs} results).')
+        if len(region) < 16 * (n_outputs + 1):
+            raise ProcessException(analysis_id, 500, f'The result region holds {len(region) // 16 - 1} of {n_outputs} results.')
+        return decode_shares(region[16:])
+
+    def output_mode_args(self):
+        """
+        Return the compile arguments selecting the configured output mode (none for the default probabilities) and the
+        softmax approximation of the probabilities (none for the exact softmax).
+        """
+        if self.config.CONFIG_OUTPUT_MODE != 'probabilities':
+            return (self.config.CONFIG_OUTPUT_MODE,)
+        if self.config.CONFIG_SOFTMAX != 'exact':
+            return (f'softmax={self.config.CONFIG_SOFTMAX}',)
+        return ()
 
-                    # Read the last 80 bytes
-                    last_n_bytes = binary_file.read()
+    def mpspdz_command(self, program, online_only=False, port_base=None):
+        """
+        Build the command line running {program} with malicious-rep-ring-party.x as this party (relative to MP-SPDZ).
 
-                    # Convert the last 80 bytes to a list of integers in little-endian format
-                    output_shares = []
-                    for i in range(0, len(last_n_bytes), 16):  # Group every 16 bytes together
-                        values = struct.unpack('<qq', last_n_bytes[i:i+16])  # Unpack 16 bytes into 2 `q` (8-byte signed integers)
-                        u64_values = [v + (1 << 64) if v < 0 else v for v in values]
-                        output_shares.append(list(u64_values[::-1]))  # Append the u64 values as a list of RSS shares in form (x_i, x_{i+1})to output_shares
-                    return output_shares
+        Arguments:
+            program (str): The program to run.
+            online_only (bool, optional): Whether to run the online phase only. Defaults to False.
+            port_base (int, optional): The MP-SPDZ port base (-pn). Defaults to CONFIG_MPSPDZ_PORT_BASE.
 
-            except Exception as e:
-                raise ProcessException(analysis_id, 500, f"Unable to interpret the result: {e}")
-                # self.error_in_task(analysis_id, 500, f"Unable to interpret the result: {e}")
-        else:
-            raise ProcessException(analysis_id, 500, f"The output file does not exist: the file '{self.sharesfile}' does not exist.")
-            # self.error_in_task(analysis_id, 500, f"The output file does not exist: the file '{self.sharesfile}' does not exist.")  
+        Returns:
+            list: The command.
+        """
+        command = ['Scripts/../malicious-rep-ring-party.x', '-v']
+        if online_only:
+            command.append('-F')
+        command += ['-ip', self.config.CONFIG_MPSPDZ_HOSTS, '-p', str(self.config.CONFIG_PARTY_INDEX)]
+        if port_base is None:
+            port_base = self.config.CONFIG_MPSPDZ_PORT_BASE
+        if port_base is not None:
+            command += ['-pn', str(port_base)]
+        command.append(program)
+        return command
 
-    
     def run_inference(self, analysis_id, program='heartbeat_inference_demo', online_only=False):
         """
         Run the ML inference in MP-SPDZ.
@@ -144,14 +274,13 @@ class TaskManager:
             analysis_id (str): The analysis ID.
             program (str, optional): The program to run. Defaults to 'heartbeat_inference_demo'.
             online_only (bool, optional): Whether to run the online phase only (make sure to run offline before)
+
+        Returns:
+            CompletedProcess: The finished MP-SPDZ run, its standard error contains the preprocessing statistics.
         """
+        command = self.mpspdz_command(program, online_only=online_only)
         try:
-            if online_only:
-                result = subprocess.run(['Scripts/../malicious-rep-ring-party.x', '-v', '-F', '-ip', 'HOSTS', '-p', str(self.config.CONFIG_PARTY_INDEX), program],
-                                    capture_output=True, text=True, check=False, cwd='MP-SPDZ')
-            else:
-                result = subprocess.run(['Scripts/../malicious-rep-ring-party.x', '-v', '-ip', 'HOSTS', '-p', str(self.config.CONFIG_PARTY_INDEX), program],
-                                    capture_output=True, text=True, check=False, cwd='MP-SPDZ')
+            result = subprocess.run(command, capture_output=True, text=True, check=False, cwd='MP-SPDZ')
             
             if DEBUG:
                 print("Captured Output:", result.stdout)
@@ -161,88 +290,110 @@ class TaskManager:
         except subprocess.CalledProcessError as e:
             raise ProcessException(analysis_id, 500, f"Error running program {e}, Output: {result.stdout} and ErrOutput: {result.stderr}")
             # self.error_in_task(analysis_id, 500, f"Error running program {e}")
+        return result
 
-    def run_offline(self, distributed=True, offline_dest=['10.10.168.47:~/libmozaik/mpc/MP-SPDZ/Player-Data/', '10.10.168.48:~/libmozaik/mpc/MP-SPDZ/Player-Data/']):
+    def run_offline(self, distributed=True, offline_dest=['10.10.168.47:~/libmozaik/mpc/MP-SPDZ/Player-Data/', '10.10.168.48:~/libmozaik/mpc/MP-SPDZ/Player-Data/'], n_tuples=None, workdir='MP-SPDZ'):
         """
         Run the offline phase for malicious-rep-ring-party.x. The offline phase is ruun by P0. 
 
         Arguments:
             distributed (bool, optional): Specify whether to run the offline phase on multiple servers(True) or locally(False)
-            offline_dest (list, optional): List of strings. Specify the destinations to send the pre-processed data to.
+            offline_dest (list, optional): Destinations to send the pre-processed data to: 'host:path' strings (ssh), local directories or Transport instances.
+            n_tuples (int, optional): Number of tuples to generate for every data type. Defaults to the Fake-Offline.x default.
+            workdir (str, optional): Directory in which the Player-Data directory is written. Defaults to 'MP-SPDZ'.
 
         Returns: 
             Str: status of the subprocess call ("OK" or exception)
         """
         if self.config.CONFIG_PARTY_INDEX == 0:
             try:
+                command = [os.path.abspath('MP-SPDZ/Fake-Offline.x'), '3', '-lgp', '64']
+                if n_tuples is not None:
+                    command += ['-d', str(n_tuples)]
                 result = subprocess.run(
-                    ['./Fake-Offline.x', '3', '-lgp', '64'],
-                    capture_output=True, text=True, check=True, cwd='MP-SPDZ'
+                    command, capture_output=True, text=True, check=True, cwd=workdir
                 )
                 if DEBUG:
                     print("Standard Output:", result.stdout)
                     print("Standard Error:", result.stderr)
 
                 if distributed:
-                    for dest in offline_dest:
-                        try:
-                            result = subprocess.run(
-                                f'scp -r MP-SPDZ/Player-Data/3-* {str(dest)}', shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
-                            )
-                            if DEBUG:
-                                print(f'Finished transfering data to: {dest}, Standard Output: {result.stdout.decode()}')
-                        except subprocess.CalledProcessError as e:
-                            raise e
+                    # Push to all destinations at once, sending only the files that changed
+                    distributor = OfflineDistributor(f'{workdir}/Player-Data', offline_dest)
+                    stats = distributor.distribute(patterns=('3-*',))
+                    if DEBUG:
+                        for dest, dest_stats in zip(offline_dest, stats):
+                            print(f'Finished transfering data to: {dest}, {dest_stats}')
 
             except subprocess.CalledProcessError as e:
                 raise e
         return "OK"
 
-    def read_model_from_file(self, file_path):
+    def load_model(self, analysis_id, analysis_type):
         """
-        Reads data from a file where each line contains pairs of integers separated by commas.
+        Return the encoded shares of the model for {analysis_type}, in the order of its share files.
+        The share files are parsed on first use only, later calls return the cached bytes.
 
-        Args:
-            file_path (str): The file path to read from.
+        Arguments:
+            analysis_id (str): The analysis ID.
+            analysis_type (str): The analysis type.
 
         Returns:
-            list: List of RSS shares.
+            bytes: The encoded model shares as stored in the MP-SPDZ shares file.
         """
-        data = []
-        with open(file_path, 'r') as file:
-            for line in file:
-                pairs = line.strip().split()
-                pairs = [tuple(map(int, pair.split(','))) for pair in pairs]
-                data.append(pairs)
-        return data
-
-    def set_model(self, analysis_id, analysis_type, input):
+        model = self.model_registry.get(analysis_type, analysis_id)
+        if analysis_type not in self.models:
+            try:
+                shares = [share for path in model.share_files(self.config.CONFIG_PARTY_INDEX) for share in read_model_from_file(path)]
+                self.models[analysis_type] = encode_shares(shares)
+            except Exception as e:
+                raise ProcessException(analysis_id, 500, f'An error occured while setting weights: {e}')
+        return self.models[analysis_type]
+
+    def set_model(self, analysis_id, analysis_type, input, n_outputs=None):
         """
-        Reads shares of weights and biases, concatanates them together with input vector and writes into MP-SPDZ shares file
+        Writes the shares of the model followed by the input vector into the MP-SPDZ shares file.
+        If the file already starts with the model of {analysis_type}, only the input after it is rewritten.
+        With {n_outputs}, the header of the result region follows the input: one share slot holding RESULT_MARKER and {n_outputs}.
+        The program writes its results right after this slot, where read_results() finds them.
 
         Arguments:
             analysis_id (str): The analysis ID.
             analysis_type (str): The analysis type.
-            input (list): The input data as RSS shares in the form (x_i, x_{i+1}).
+            input (list or bytearray): The input data as RSS shares in the form (x_i, x_{i+1}), or already encoded by encode_input_shares.
+            n_outputs (int, optional): Number of result shares the program writes. Defaults to None (no result region).
         """
-        if analysis_type == "Heartbeat-Demo-1":
-            try:
-                model=[]
-                weights = self.read_model_from_file(f'heartbeat-inference-model/model_shares{self.config.CONFIG_PARTY_INDEX+1}.txt')
-                biases = self.read_model_from_file(f'heartbeat-inference-model/biases_shares{self.config.CONFIG_PARTY_INDEX+1}.txt')
-                for weight_pair in weights[0]:
-                    model.append(weight_pair)
-                for biases_pair in biases[0]:
-                    model.append(biases_pair)
-                for input_pair in input:
-                    model.append(input_pair[::-1])
-                self.write_shares(analysis_id, model)
-            except Exception as e:
-                raise ProcessException(analysis_id, 500, f'An error occured while setting weights: {e}')
-                # self.error_in_task(analysis_id, 400, f'An error occured while setting weights: {e}')
-        else:
-            raise ProcessException(analysis_id, 500, f'Invalid analysis_type {analysis_type}. Current supported analysis_type is "Heartbeat-Demo-1".')
-            # self.error_in_task(analysis_id, 400, f'Invalid analysis_type {analysis_type}. Current supported analysis_type is "Heartbeat-Demo-1".')
+        model = self.load_model(analysis_id, analysis_type)
+        model_end = len(SHARES_HEADER) + len(model)
+        try:
+            if isinstance(input, (bytes, bytearray, memoryview)):
+                encoded_input = input
+            else:
+                # the file stores the shares in the form (x_{i+1}, x_i)
+                encoded_input = encode_shares(input_pair[::-1] for input_pair in input)
+            result_header = b''
+            self.result_region = None
+            if n_outputs is not None:
+                result_header = struct.pack('<QQ', RESULT_MARKER, n_outputs)
+                self.result_region = ((len(model) + len(encoded_input)) // 16, n_outputs)
+            if self.persisted_model == analysis_type and os.path.exists(self.sharesfile) and os.path.getsize(self.sharesfile) >= model_end:
+                with open(self.sharesfile, 'r+b') as file:
+                    file.seek(model_end)
+                    file.write(encoded_input)
+                    file.write(result_header)
+                    # drop the previous input and results
+                    file.truncate()
+                    file.flush()
+                return
+            with open(self.sharesfile, 'wb') as file:
+                file.write(SHARES_HEADER)
+                file.write(model)
+                file.write(encoded_input)
+                file.write(result_header)
+                file.flush()
+            self.persisted_model = analysis_type
+        except Exception as e:
+            raise ProcessException(analysis_id, 500, f'An error occured while setting weights: {e}')
 
 
     def error_in_task(self, analysis_id, code, message):
@@ -263,43 +414,107 @@ class TaskManager:
             self.app.logger.error(f"Task: {analysis_id} Code {code}\n{message}")
 
 
+    def submit(self, request):
+        """
+        Persist {request} as a job and queue it, if the request queue admits it.
+
+        Arguments:
+            request (tuple): The request (analysis_ids, user_ids, analysis_type, data_indeces, online_only, streaming).
+
+        Returns:
+            bool: Whether the request was queued.
+        """
+        job_id = self.db.add_job(request)
+        if not self.request_queue.offer(tuple(request) + (job_id,)):
+            self.db.finish_job(job_id)
+            return False
+        return True
+
+    def resume_jobs(self):
+        """
+        Queue the jobs that were not finished before the service stopped. Jobs with encrypted results only store them,
+        the others run again from the start, as the stages before run in MPC: the other parties need to resume the same jobs.
+        A party that stopped after the encryption but before recording it runs dist_dec alone if the others recorded it, until it fails.
+
+        Returns:
+            int: The number of resumed jobs.
+        """
+        jobs = self.db.pending_jobs()
+        for job_id, request, stage in jobs:
+            for analysis_id in request[0]:
+                self.timer.start(analysis_id)
+            if DEBUG:
+                print(f'Resuming job {job_id} after stage {stage}')
+            self.request_queue.put(request + (job_id,))
+        return len(jobs)
+
+    def checkpoint(self, job_id, stage, data):
+        """
+        Record that the job {job_id} finished {stage} (see JOB_STAGES), for requests that were queued without a job ID nothing is recorded.
+        """
+        if job_id is not None:
+            self.db.set_job_stage(job_id, stage, data)
+
     def process_requests(self, test=False):
         """
         Process requests in the queue. Run the computation on encrypted data. This entails: get data from Mozaik-Obelisk, run sequentially on each sample distributed decryption, inference, distributed encryption. The result is sent for storage to Mozaik-Obelisk.
+        Requests queued by submit() carry a job ID: after the encryption the encrypted results are stored, and resumed jobs with them only store the results.
+        No shares are stored at rest.
         
         Args:
             test (bool, optional): Whether to run in test mode. Defaults to False.
         """
         while True:
+            job_id = None
             try:
-                analysis_ids, user_ids, analysis_type, data_indeces, online_only, streaming = self.request_queue.get()
-                if analysis_type == "Heartbeat-Demo-1":
-                    # Lock to ensure thread safety
-                    with self.request_lock:
+                request = self.request_queue.get()
+                analysis_ids, user_ids, analysis_type, data_indeces, online_only, streaming = request[:6]
+                job_id = request[6] if len(request) > 6 else None
+                batch_start = time.perf_counter()
+                model = self.model_registry.get(analysis_type, analysis_ids)
+                job = self.db.read_job(job_id) if job_id is not None else None
+                stage, checkpoint = job if job is not None else ('queued', {})
+                if stage != 'encrypted':
+                    # dist_dec, the inference and dist_enc run in MPC, so every party runs them again from the start
+                    # (also for checkpoints of other stages by older versions)
+                    stage, checkpoint = 'queued', {}
+                resume = JOB_STAGES.index(stage)
+                # Lock to ensure thread safety
+                with self.request_lock:
+                    samples_per_user = checkpoint.get('samples_per_user')
+
+                    if resume < JOB_STAGES.index('encrypted'):
                         # Get the user data corresponding to the user at the requested indices
-                        input_data = self.mozaik_obelisk.get_data(analysis_ids, user_ids, data_indeces)
-                        batch_size = sum(len(sub_array) for sub_array in input_data)
+                        with self.timer.stage('fetch'):
+                            input_data = self.mozaik_obelisk.get_data(analysis_ids, user_ids, data_indeces)
+                            samples_per_user = [len(sub_array) for sub_array in input_data]
 
-                        # Get the shares of the key 
-                        encrypted_key_shares = self.mozaik_obelisk.get_key_share(analysis_ids)
+                            # Get the shares of the key 
+                            encrypted_key_shares = self.mozaik_obelisk.get_key_share(analysis_ids)
 
                         try:
-                            assert len(user_ids) == len(input_data) == len(encrypted_key_shares)
+                            assert len(user_ids) == len(samples_per_user) == len(encrypted_key_shares)
                         except AssertionError as e:
-                            raise ProcessException(analysis_ids, 500, f'The length of input_data: {len(input_data)} should match the length of key shares: {len(encrypted_key_shares)} which should match the number of user_ids received: {len(user_ids)}. {e}')
-
-                        key_shares = []
-                        for i, encrypted_key_share in enumerate(encrypted_key_shares):
-                            try:
-                                if streaming is not None:
-                                    streaming_start, streaming_end = streaming[i]
-                                    key_shares.append(decrypt_key_share_for_streaming(self.keys, user_ids[i], "AES-GCM-128", streaming_start, streaming_end, analysis_type, encrypted_key_share))
-                                else:
-                                    key_shares.append(decrypt_key_share(self.keys, user_ids[i], "AES-GCM-128", data_indeces[i], analysis_type, encrypted_key_share))
-                            except Exception as e:
-                                raise ProcessException(analysis_ids[i], 500, f'An error occurred while decrypting key_share: {e}')
-                                # self.error_in_task(analysis_id, 500, f'An error occurred while decrypting key_share: {e}')
-
+                            raise ProcessException(analysis_ids, 500, f'The length of input_data: {len(samples_per_user)} should match the length of key shares: {len(encrypted_key_shares)} which should match the number of user_ids received: {len(user_ids)}. {e}')
+
+                        with self.timer.stage('key_share_decrypt'):
+                            key_shares = []
+                            for i, encrypted_key_share in enumerate(encrypted_key_shares):
+                                try:
+                                    if streaming is not None:
+                                        streaming_start, streaming_end = streaming[i]
+                                        key_shares.append(decrypt_key_share_for_streaming(self.keys, user_ids[i], "AES-GCM-128", streaming_start, streaming_end, analysis_type, encrypted_key_share))
+                                    else:
+                                        key_shares.append(decrypt_key_share(self.keys, user_ids[i], "AES-GCM-128", data_indeces[i], analysis_type, encrypted_key_share))
+                                except Exception as e:
+                                    raise ProcessException(analysis_ids[i], 500, f'An error occurred while decrypting key_share: {e}')
+                                    # self.error_in_task(analysis_id, 500, f'An error occurred while decrypting key_share: {e}')
+
+                    batch_size = sum(samples_per_user)
+                    outputs_per_sample = model.output_width(self.config.CONFIG_OUTPUT_MODE)
+                    use_engine = self.inference_engine is not None and self.inference_engine.analysis_type == analysis_type
+
+                    if resume == 0:
                         # Insert the status message into the database
                         for analysis_id in analysis_ids:
                             self.db.set_status(analysis_id, 'Starting computation')
@@ -321,12 +536,13 @@ class TaskManager:
                             print(f'The vector length of dist_dec_args: {len(dist_dec_args)} (for reference should be equal to the batch_size {batch_size} = the total number of received samples)')
 
                         # run dist_dec on the batch
-                        try:
-                            decrypted_shares = dist_dec(self.aes_config, dist_dec_args)
-                        except Exception as e:
-                            if test:
-                                raise e
-                            raise ProcessException(analysis_ids, 500,f'An error occurred while running distdec: {e}')
+                        with self.timer.stage('dist_dec'):
+                            try:
+                                decrypted_shares = dist_dec(self.aes_config, dist_dec_args, as_array=True)
+                            except Exception as e:
+                                if test:
+                                    raise e
+                                raise ProcessException(analysis_ids, 500,f'An error occurred while running distdec: {e}')
                         
                         if any(x is None for x in decrypted_shares):
                             # a decryption failed (due to tag mismatch)
@@ -334,61 +550,98 @@ class TaskManager:
                                 print(f'Decrypted shares: {decrypted_shares}')
                             raise ProcessException(analysis_ids, 500,f'Decryption of a sample failed.')
 
-                        # flatten the batch
-                        decrypted_shares = [el for decrypt_res in decrypted_shares for el in decrypt_res]
+                        if any(len(x) != model.input_size for x in decrypted_shares):
+                            raise ProcessException(analysis_ids, 500, f'A sample does not have the {model.input_size} values expected by the model of {analysis_type}.')
+
+                        # encode the batch at once in the layout that MP-SPDZ reads
+                        decrypted_shares = encode_input_shares(decrypted_shares)
 
-                        # Set the model and input accordingly
-                        self.set_model(analysis_ids, analysis_type, decrypted_shares)
+                        if use_engine:
+                            # The engine keeps the model loaded, only the input and output shares are exchanged
+                            with self.timer.stage('inference'):
+                                shares_to_encrypt = self.inference_engine.infer(analysis_ids, decrypted_shares)
+                        else:
+                            # Set the model and input accordingly
+                            with self.timer.stage('write_shares'):
+                                self.set_model(analysis_ids, analysis_type, decrypted_shares, n_outputs=outputs_per_sample*batch_size)
+                        del decrypted_shares
+                        del dist_dec_args
+                        del input_data
+
+                    if resume == 0 and not use_engine:
+                        # Compile the program for this batch size on first use
+                        with self.timer.stage('compile'):
+                            program = self.model_registry.program_registry(analysis_type).get(batch_size, analysis_ids)
+
+                        # Make sure enough offline material is available to run the online phase only
+                        if self.preprocessing_pool is not None:
+                            with self.timer.stage('preprocessing'):
+                                self.preprocessing_pool.prepare(analysis_ids, program)
+                            online_only = True
 
                         # Run the inference on the single sample
-                        self.run_inference(analysis_ids, program='heartbeat_inference_demo_batched_'+str(batch_size), online_only=online_only)
+                        with self.timer.stage('inference'):
+                            inference_result = self.run_inference(analysis_ids, program=program, online_only=online_only)
 
-                        # Read and decode boolean shares in field from the Persistence file
-                        shares_to_encrypt = self.read_shares(analysis_ids, number_of_shares=5*batch_size)
+                        if self.preprocessing_pool is not None:
+                            self.preprocessing_pool.consume(program, inference_result.stderr)
 
+                        # Read and decode the results from the result region of the Persistence file
+                        with self.timer.stage('read_shares'):
+                            shares_to_encrypt = self.read_results(analysis_ids)
+
+                    if resume < JOB_STAGES.index('encrypted'):
                         # Unflatten the list of shares to match corresponding users and analyses
                         shares_to_encrypt_unflattened = []
-                        for i, user_samples in enumerate(input_data):
-                            shares_to_encrypt_unflattened.append(shares_to_encrypt[i*len(user_samples)*5:i*len(user_samples)*5+len(user_samples)*5])
+                        offset = 0
+                        for n_samples in samples_per_user:
+                            shares_to_encrypt_unflattened.append(shares_to_encrypt[offset:offset+n_samples*outputs_per_sample])
+                            offset += n_samples*outputs_per_sample
 
                         # Run distributed encryption on the concataneted final result
-                        encrypted_shares = dist_enc(self.aes_config, self.keys, [(user_ids[i], analysis_ids[i], analysis_type, key_shares[i], shares_to_encrypt_unflattened[i]) for i in range(len(user_ids))])
-
-                        if isinstance(encrypted_shares, list) and all(isinstance(encrypted_share, bytes) for encrypted_share in encrypted_shares):
-                            self.mozaik_obelisk.store_result(analysis_ids, user_ids, [encrypted_share.hex() for encrypted_share in encrypted_shares])  
-                        else:
-                            raise ProcessException(analysis_ids, 500,f'Result of dist_dec is in the wrong format (expected: bytes), encrypted shares: {encrypted_shares}')                         
-                    
-                        # Update status in the database
-                        for analysis_id in analysis_ids:
-                            self.db.set_status(analysis_id, 'Completed')
-                            self.timer.end(analysis_id)
-
-                        # Remove the request from the queue after processing
-                        if test:
-                            break
-                        self.request_queue.task_done()
+                        with self.timer.stage('dist_enc'):
+                            encrypted_shares = dist_enc(self.aes_config, self.keys, [(user_ids[i], analysis_ids[i], analysis_type, key_shares[i], shares_to_encrypt_unflattened[i]) for i in range(len(user_ids))])
 
+                        if not (isinstance(encrypted_shares, list) and all(isinstance(encrypted_share, bytes) for encrypted_share in encrypted_shares)):
+                            raise ProcessException(analysis_ids, 500,f'Result of dist_dec is in the wrong format (expected: bytes), encrypted shares: {encrypted_shares}')
+                        encrypted_results = [encrypted_share.hex() for encrypted_share in encrypted_shares]
+                        self.checkpoint(job_id, 'encrypted', {'samples_per_user': samples_per_user, 'results': encrypted_results})
                         del shares_to_encrypt
                         del shares_to_encrypt_unflattened
                         del encrypted_shares
-                        
-                else:
-                    raise ProcessException(analysis_ids, 500, f'Invalid analysis_type: {analysis_type}. Current supported analysis_type is "Heartbeat-Demo-1".')
-                    # self.error_in_task(analysis_id, 400, f'Invalid analysis_type {analysis_type}. Current supported analysis_type is "Heartbeat-Demo-1".')
+                        del key_shares
+                    else:
+                        encrypted_results = checkpoint['results']
+
+                    with self.timer.stage('store_result'):
+                        self.mozaik_obelisk.store_result(analysis_ids, user_ids, encrypted_results)
+                
+                    # Update status in the database
+                    for analysis_id in analysis_ids:
+                        self.db.set_status(analysis_id, 'Completed')
+                        self.timer.end(analysis_id)
+                    if job_id is not None:
+                        self.db.finish_job(job_id)
+                    self.request_queue.record(len(analysis_ids), time.perf_counter() - batch_start)
+
+                    # Remove the request from the queue after processing
+                    if test:
+                        break
+                    self.request_queue.task_done()
                 
                 # Bookeeping
+                del request
                 del analysis_ids
                 del user_ids
                 del analysis_type
                 del data_indeces
-                del input_data
-                del encrypted_key_share
-                del key_shares
-                del dist_dec_args
+                del checkpoint
+                del encrypted_results
 
             except ProcessException as e:
                 if test:
                     raise e
+                if job_id is not None:
+                    self.db.finish_job(job_id)
                 self.error_in_task(analysis_ids, e.code, f'An exception happened during the processing of the request: {str(e)}')
     
@@ -19,6 +19,7 @@ from threading import Thread
 from unittest import mock
 
 # Custom or other packages
+import numpy as np
 from Crypto.Cipher import AES
 from Crypto.PublicKey import RSA
 from selenium import webdriver
@@ -606,6 +607,37 @@ class TestRep3Aes(unittest.TestCase):
                 assert m2[i][1] == m3[i][0]
                 self.assertEqual(expected[i], ( m1[i][0] + m2[i][0] + m3[i][0]) % 2**64, msg="Reconstructed message did not match expected message.")
 
+class TestDistDecOutput(unittest.TestCase):
+    @staticmethod
+    def run_dist_dec(output, as_array):
+        result = subprocess.CompletedProcess([], 0, stdout=json.dumps(output), stderr='')
+        with mock.patch('rep3aes.subprocess.run', return_value=result):
+            return dist_dec(Rep3AesConfig('rep3aes/p1.toml', 'rep3aes-bin'), [("user", bytes(176), bytes(28)), ("user", bytes(176), bytes(28))], as_array=as_array)
+
+    def test_dist_dec_as_array(self):
+        output = [{"message_share": [[1, 2**64 - 1], [3, 4]]}, {"tag_error": "tag mismatch"}]
+        as_list = self.run_dist_dec(output, False)
+        as_array = self.run_dist_dec(output, True)
+        self.assertEqual(as_list, [[[1, 2**64 - 1], [3, 4]], None])
+        self.assertEqual(as_array[0].dtype, np.uint64)
+        self.assertEqual(as_array[0].tolist(), as_list[0])
+        self.assertIsNone(as_array[1])
+
+    def test_dist_dec_as_array_rejects_invalid_shares(self):
+        for message_share in [[[1, 2**64]], [[1, -2**64]], [[1, 2, 3]], [[1, 2], [3]], [[1, 2.5]], [[1, True]], [[1, "2"]]]:
+            for as_array in [False, True]:
+                with self.assertRaises(RuntimeError):
+                    self.run_dist_dec([{"message_share": message_share}, {"message_share": []}], as_array)
+
+    def test_dist_dec_as_array_negative_shares(self):
+        # negative shares are accepted as in the list and taken modulo 2^64
+        output = [{"message_share": [[-1, 2], [3, -(2**64 - 1)]]}, {"message_share": []}]
+        as_list = self.run_dist_dec(output, False)
+        as_array = self.run_dist_dec(output, True)
+        self.assertEqual(as_array[0].tolist(), [[m % 2**64 for m in pair] for pair in as_list[0]])
+        self.assertEqual(as_array[1].shape, (0, 2))
+
+
 class IntegrationTest(unittest.TestCase):
     __slots__ = ["opts_dict", "firefox_options", "firefox_driver", "rep3aes_bin"]
 
@@ -2,6 +2,7 @@ import unittest
 from unittest.mock import patch
 
 from analysis_app import AnalysisApp
+from request_queue import RequestQueue
 
 class AnalysisAppTests(unittest.TestCase):
     def setUp(self):
@@ -9,6 +10,9 @@ class AnalysisAppTests(unittest.TestCase):
             with patch('analysis_app.TaskManager') as MockTaskManager:
                 # Mocking the process_requests method of TaskManager with a no-op function
                 MockTaskManager.return_value.process_requests = None
+                MockTaskManager.return_value.request_queue = RequestQueue(max_queued=2, default_analysis_time=1.5)
+                self.request_queue = MockTaskManager.return_value.request_queue
+                MockTaskManager.return_value.submit = self.request_queue.offer
                 # Create the AnalysisApp instance
                 self.app = AnalysisApp('server0.toml')
                 self.client = self.app.app.test_client()
@@ -27,6 +31,27 @@ class AnalysisAppTests(unittest.TestCase):
             self.assertEqual(response.status_code, 201)
             self.assertTrue(b"Requests added to the queue" in response.data)
 
+    def test_analyse_route_queue_full(self):
+        headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+        data={'analysis_id': ['01HQJRGMVHY51W7ZV8S2TXRQ7N', '01HQJRH8N3ZEXH3HX7QD56FH0W'], 'user_id': ['01HQJRH8N3ZEXH3HX7QD56FH0W'] * 2, 'data_index': [[1, 2]] * 2, 'analysis_type': 'Heartbeat-Demo-1'}
+        response = self.client.post('/analyse/', json=data, headers=headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.get_json()['estimated_wait'], 3.0)
+
+        data['analysis_id'] = ['01HQJRFE0352Y5Y98VFTHEBS0X']
+        data['user_id'] = data['user_id'][:1]
+        data['data_index'] = data['data_index'][:1]
+        response = self.client.post('/analyse/', json=data, headers=headers)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], '2')
+        self.assertEqual(response.get_json()['estimated_wait'], 4.5)
+        self.assertIsNone(self.app.db.read_entry('01HQJRFE0352Y5Y98VFTHEBS0X'))
+        self.assertNotIn('01HQJRFE0352Y5Y98VFTHEBS0X', self.app.timer.start_times)
+
+        self.request_queue.get()
+        response = self.client.post('/analyse/', json=data, headers=headers)
+        self.assertEqual(response.status_code, 201)
+
     def test_analyse_route_invalid_id(self):
         headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
         with self.app.app.test_request_context('/analyse/', method='POST', headers=headers):
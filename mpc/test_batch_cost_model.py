@@ -0,0 +1,78 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from batch_cost_model import choose_buckets, compile_cost, fit_costs, predict_latency, recommend, stage_latencies
+
+COMPILER_OUTPUT = """Program requires at most:
+      376992 integer triples
+           1 matrix multiplications (16x187 * 187x50)
+       59328 integer bits
+        3504 integer opens
+          40 virtual machine rounds
+"""
+COSTS = {'batch': 2.0, 'virtual machine rounds': 0.001, 'integer triples': 2e-7, 'integer bits': 1e-6}
+
+
+def counts(batch_size, rounds):
+    return {'batch': 1, 'virtual machine rounds': rounds, 'integer triples': 23562 * batch_size,
+            'integer bits': 3708 * batch_size, 'integer opens': 219 * batch_size}
+
+
+COUNTS = {1: counts(1, 22), 16: counts(16, 40), 64: counts(64, 103), 256: counts(256, 346), 1024: counts(1024, 1336)}
+
+
+class BatchCostModelTests(unittest.TestCase):
+    @patch('batch_cost_model.subprocess.run')
+    def test_compile_cost(self, run):
+        run.return_value = MagicMock(stdout=COMPILER_OUTPUT)
+        self.assertEqual(compile_cost(16, args=['class']),
+                         {'batch': 1, 'virtual machine rounds': 40, 'integer triples': 376992, 'integer bits': 59328,
+                          'integer opens': 3504})
+        self.assertEqual(run.call_args[0][0][-3:], ['heartbeat_inference_demo_batched', '16', 'class'])
+        run.return_value = MagicMock(stdout='Program requires at most:\n         inf virtual machine rounds\n')
+        with self.assertRaises(ValueError):
+            compile_cost(16, template='heartbeat_inference_engine')
+
+    def test_predict_latency(self):
+        self.assertAlmostEqual(predict_latency(counts(1, 22), COSTS), 2.0 + 0.022 + 23562 * 2e-7 + 3708 * 1e-6)
+
+    def test_stage_latencies(self):
+        report = [{'batch_size': 1, 'stages': {'preprocessing': {'p50': 1.5}, 'inference': {'p50': 0.5}, 'compile': {'p50': 9.0}}},
+                  {'batch_size': 16, 'stages': {'preprocessing': {'p50': None}, 'inference': {'p50': 0.75}}},
+                  {'batch_size': 64, 'stages': {}}]
+        self.assertEqual(stage_latencies(report), {1: 2.0, 16: 0.75})
+
+    def test_fit_costs(self):
+        latencies = {batch_size: predict_latency(cost, COSTS) for batch_size, cost in COUNTS.items()}
+        costs = fit_costs(COUNTS, latencies)
+        self.assertTrue(all(weight >= 0 for weight in costs.values()))
+        for batch_size, cost in COUNTS.items():
+            self.assertAlmostEqual(predict_latency(cost, costs), latencies[batch_size], places=6)
+        # rounds cannot explain a latency that shrinks with the batch size
+        costs = fit_costs(COUNTS, {1: 3.0, 16: 2.0, 64: 2.0, 256: 2.0, 1024: 2.0})
+        self.assertTrue(all(weight >= 0 for weight in costs.values()))
+        with self.assertRaises(ValueError):
+            fit_costs(COUNTS, {2: 1.0})
+
+    def test_choose_buckets(self):
+        latencies = {1: 1.0, 2: 1.5, 4: 2.0, 8: 10.0}
+        self.assertEqual(choose_buckets(latencies, [1, 2, 3, 8], 1), ([8], 10.0))
+        # the requests of 1 to 3 samples share 4
+        self.assertEqual(choose_buckets(latencies, [1, 2, 3, 8], 2), ([4, 8], 4.0))
+        self.assertEqual(choose_buckets(latencies, [1, 2, 3, 8], 4), ([1, 2, 4, 8], 3.625))
+        with self.assertRaises(ValueError):
+            choose_buckets(latencies, [9], 1)
+
+    def test_recommend(self):
+        latencies = {batch_size: predict_latency(cost, COSTS) for batch_size, cost in COUNTS.items()}
+        recommended, choices = recommend(latencies)
+        self.assertEqual(len(choices), len(COUNTS))
+        self.assertEqual(recommended[-1], 1024)
+        self.assertLessEqual(choices[len(recommended) - 1]['mean_latency'], choices[-1]['mean_latency'] * 1.05)
+        self.assertEqual(recommend(latencies, tolerance=0)[0], sorted(COUNTS))
+        # only single-sample requests
+        self.assertEqual(recommend(latencies, [1, 1, 1], tolerance=0)[0], [1, 1024])
+
+
+if __name__ == '__main__':
+    unittest.main()
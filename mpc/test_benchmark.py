@@ -0,0 +1,102 @@
+import csv
+import os
+import struct
+import tempfile
+import unittest
+
+from Crypto.Cipher import AES
+
+from benchmark import FakeObelisk, build_report, encrypt_sample, load_ecg_sample, share_key, write_csv, STAGES
+from key_share import MpcPartyKeys, decrypt_key_share, encrypt_key_share
+from timing import AnalysisTimer
+
+
+def get_config(party):
+    party_keys = ['tls_certs/server1.crt', 'tls_certs/server2.crt', 'tls_certs/server3.crt']
+    return {
+        "server_key": f'tls_certs/server{party+1}.key',
+        "server_cert": f'tls_certs/server{party+1}.crt',
+        "party_index": party,
+        "party_certs": party_keys
+    }
+
+
+class BenchmarkTests(unittest.TestCase):
+    def test_load_ecg_sample(self):
+        sample = load_ecg_sample()
+        self.assertEqual(len(sample), 187 * 8)
+        # the first value of sample.txt is 1.0
+        self.assertEqual(struct.unpack('<q', sample[:8])[0], 2**8)
+
+    def test_encrypt_sample(self):
+        aes_key = bytes.fromhex('0102030405060708090a0b0c0d0e0f10')
+        user_id = 'e7514b7a-9293-4c83-b733-a53e0e449635'
+        ciphertext = encrypt_sample(aes_key, user_id, b'\x01' * 16)
+        nonce = ciphertext[:12]
+        instance = AES.new(key=aes_key, mode=AES.MODE_GCM, nonce=nonce)
+        instance.update(bytes(user_id, encoding='utf-8') + nonce)
+        self.assertEqual(instance.decrypt_and_verify(ciphertext[12:-16], ciphertext[-16:]), b'\x01' * 16)
+
+    def test_share_key(self):
+        aes_key = bytes.fromhex('0102030405060708090a0b0c0d0e0f10')
+        shares = share_key(aes_key)
+        self.assertEqual(len(shares), 3)
+        self.assertEqual(bytes(a ^ b ^ c for a, b, c in zip(*shares)), aes_key)
+
+    def test_encrypt_key_share(self):
+        user_id = 'e7514b7a-9293-4c83-b733-a53e0e449635'
+        data_index = [1706094000000, 1706094001000]
+        key_share = bytes.fromhex('f006e3a4a7935cb8e49d3b1a0d0c4ec7')
+        client_keys = MpcPartyKeys(get_config(0))
+        for party in range(3):
+            ciphertext = encrypt_key_share(client_keys, party, user_id, "AES-GCM-128", data_index, "Heartbeat-Demo-1", key_share)
+            party_keys = MpcPartyKeys(get_config(party))
+            self.assertEqual(decrypt_key_share(party_keys, user_id, "AES-GCM-128", data_index, "Heartbeat-Demo-1", ciphertext), key_share)
+
+    def test_fake_obelisk(self):
+        obelisk = FakeObelisk()
+        obelisk.add_analysis('a', [b'sample'], b'share')
+        self.assertEqual(obelisk.get_data(['a'], ['u'], [[0, 1]]), [[b'sample']])
+        self.assertEqual(obelisk.get_key_share(['a']), [b'share'])
+        obelisk.store_result(['a'], ['u'], ['00ff'])
+        self.assertEqual(obelisk.results['a'], '00ff')
+
+    def test_stage_timer(self):
+        timer = AnalysisTimer(0)
+        with timer.stage('inference'):
+            pass
+        with timer.stage('inference'):
+            pass
+        self.assertEqual(len(timer.stage_durations['inference']), 2)
+        timer.reset_stages()
+        self.assertEqual(len(timer.stage_durations['inference']), 0)
+
+    def test_stage_timer_is_bounded(self):
+        timer = AnalysisTimer(0, max_stage_durations=3)
+        for _ in range(5):
+            with timer.stage('inference'):
+                pass
+        self.assertEqual(len(timer.stage_durations['inference']), 3)
+
+    def test_build_report(self):
+        runs = [{'batch_size': 4, 'total': t, 'stages': {'inference': t / 2}} for t in (1.0, 2.0, 3.0)]
+        runs.append({'batch_size': 1, 'total': 0.5, 'stages': {'inference': 0.25}})
+        report = build_report(runs)
+        self.assertEqual([entry['batch_size'] for entry in report], [1, 4])
+        self.assertEqual(report[1]['total']['count'], 3)
+        self.assertAlmostEqual(report[1]['total']['p50'], 2.0)
+        self.assertAlmostEqual(report[1]['samples_per_second'], 2.0)
+        self.assertAlmostEqual(report[1]['stages']['inference']['p50'], 1.0)
+        self.assertEqual(report[1]['stages']['dist_dec']['count'], 0)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'report.csv')
+            write_csv(report, path)
+            with open(path, newline='') as file:
+                rows = list(csv.DictReader(file))
+            self.assertEqual(len(rows), 2 * (len(STAGES) + 1))
+            self.assertEqual(rows[0]['stage'], 'total')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+
+from compile_benchmark import compare, count_instructions, max_comparison_width, parse_compiler_cost, parse_memory_usage
+
+COMPILER_OUTPUT = """Default bit length for compilation: 63
+Writing to Programs/Bytecode/heartbeat_mlp_benchmark-16-fused-0.bc
+Program requires at most:
+      376992 integer triples
+           1 matrix multiplications (16x187 * 187x50)
+       59328 integer bits
+        3504 integer opens
+           3 matrix multiplications (16x50 * 50x50)
+           1 matrix multiplications (16x50 * 50x5)
+          40 virtual machine rounds
+"""
+
+
+class CompileBenchmarkTests(unittest.TestCase):
+    def test_parse_compiler_cost(self):
+        cost = parse_compiler_cost(COMPILER_OUTPUT)
+        self.assertEqual(cost, {'integer triples': 376992, 'matrix multiplications': 5, 'integer bits': 59328,
+                                'integer opens': 3504, 'virtual machine rounds': 40})
+
+    def test_parse_unbounded_rounds(self):
+        cost = parse_compiler_cost('Program requires at most:\n         inf virtual machine rounds\n')
+        self.assertEqual(cost, {'virtual machine rounds': float('inf')})
+
+    def test_count_instructions(self):
+        with tempfile.TemporaryDirectory() as asm_dir:
+            with open(os.path.join(asm_dir, 'asm-prog-0'), 'w') as file:
+                file.write('# prog-0--0\nldint ci1, 0 # 0\nldint ci0, 0 # 1\n# prog-0-begin-loop-1\njmp 2 # 2\n')
+            with open(os.path.join(asm_dir, 'asm-prog-multithread-1'), 'w') as file:
+                file.write('# prog-multithread-1--0\nmatmulsm s0, ci0, ci1 # 0\n')
+            self.assertEqual(count_instructions(os.path.join(asm_dir, 'asm')), 4)
+
+    def test_parse_memory_usage(self):
+        with tempfile.TemporaryDirectory() as asm_dir:
+            with open(os.path.join(asm_dir, 'asm-prog-0'), 'w') as file:
+                file.write('# prog-0--0\nldms s0, 12 # 0\n# prog-0-memory-usage-1\nldmc c0, 8191 # 1\nldmint ci0, 9539 # 2\n'
+                           'ldms s0, 369663 # 3\ngldms sg0, 8191 # 4\nactive True # 5\n')
+            self.assertEqual(parse_memory_usage(os.path.join(asm_dir, 'asm')), {'c': 8192, 'ci': 9540, 's': 369664, 'sg': 8192})
+
+    def test_max_comparison_width(self):
+        with tempfile.TemporaryDirectory() as asm_dir:
+            with open(os.path.join(asm_dir, 'asm-prog-multithread-1'), 'w') as file:
+                file.write('# prog-multithread-1-begin-LTZ(1000)_17_None-4\nltz s1, s0 # 0\n'
+                           '# prog-multithread-1-call-LTZ(200)_17_None-6\n')
+            with open(os.path.join(asm_dir, 'asm-prog-0'), 'w') as file:
+                file.write('# prog-0--0\nldint ci1, 0 # 0\n')
+            self.assertEqual(max_comparison_width(os.path.join(asm_dir, 'asm')), 1000)
+            self.assertEqual(max_comparison_width(os.path.join(asm_dir, 'none')), 0)
+
+    def test_compare(self):
+        results = [
+            {'batch_size': 16, 'mode': 'predict', 'instructions': 200, 'memory': {'s': 1000}, 'cost': {'virtual machine rounds': 40}},
+            {'batch_size': 16, 'mode': 'fused', 'instructions': 50, 'memory': {'s': 800}, 'cost': {'virtual machine rounds': 30}},
+            {'batch_size': 16, 'mode': 'inference', 'instructions': 50, 'memory': {'s': 500}, 'cost': {'virtual machine rounds': 30}},
+            {'batch_size': 16, 'mode': 'masked', 'instructions': 60, 'memory': {'s': 600},
+             'cost': {'integer triples': 100, 'virtual machine rounds': 45}},
+            {'batch_size': 16, 'mode': 'masks', 'instructions': 20, 'memory': {'s': 300},
+             'cost': {'integer triples': 270, 'integer randoms': 60}},
+            {'batch_size': 1, 'mode': 'fused', 'instructions': 10, 'memory': {}, 'cost': {}},
+        ]
+        report = compare(results)
+        self.assertEqual([entry['batch_size'] for entry in report], [1, 16])
+        self.assertNotIn('instruction_ratio', report[0]['fused'])
+        self.assertEqual(report[1]['fused']['instruction_ratio'], 0.25)
+        self.assertEqual(report[1]['fused']['round_ratio'], 0.75)
+        self.assertEqual(report[1]['fused']['memory_ratio'], 0.8)
+        self.assertEqual(report[1]['inference']['memory_ratio'], 0.5)
+        # the masks are computed ahead of the batch, but still need their triples
+        self.assertEqual(report[1]['masked']['total_cost'], {'integer triples': 370, 'integer randoms': 60, 'virtual machine rounds': 45})
+        self.assertNotIn('round_ratio', report[1]['masks'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -55,6 +55,18 @@ class DatabaseTests(unittest.TestCase):
         entry = self.db.read_entry('7')
         self.assertIsNone(entry[2])
 
+    def test_jobs(self):
+        request = (['8'], ['user'], 'Heartbeat-Demo-1', [[1, 2]], False, None)
+        first = self.db.add_job(request)
+        second = self.db.add_job(request)
+        self.assertEqual(self.db.read_job(first), ('queued', {}))
+        self.db.set_job_stage(first, 'inference', {'shares': [[1, 2]]})
+        self.assertEqual(self.db.read_job(first), ('inference', {'shares': [[1, 2]]}))
+        self.assertEqual(self.db.pending_jobs(), [(first, request, 'inference'), (second, request, 'queued')])
+        self.db.finish_job(first)
+        self.assertIsNone(self.db.read_job(first))
+        self.assertEqual([job[0] for job in self.db.pending_jobs()], [second])
+
     def tearDown(self):
         # Delete the database file if it exists
         if os.path.exists(self.db_path):
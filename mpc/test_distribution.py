@@ -0,0 +1,112 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from distribution import LocalDirectoryTransport, OfflineDistributor, SshTransport, Transport, file_digest, make_transport
+
+
+class FlakyTransport(LocalDirectoryTransport):
+    """ Local transport whose first append breaks off after a few bytes. """
+    def __init__(self, root):
+        super().__init__(root)
+        self.failures = 1
+        self.offsets = []
+
+    def append(self, path, chunks):
+        self.offsets.append(self.partial_size(path))
+        if self.failures > 0:
+            self.failures -= 1
+            data = b''.join(chunks)
+            super().append(path, [data])
+            # keep only a prefix of the received data, as after a dropped connection
+            part = os.path.join(self.root, path) + '.part'
+            with open(part, 'r+b') as file:
+                file.truncate(10)
+            raise OSError('connection lost')
+        super().append(path, chunks)
+
+
+class DistributionTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.source = os.path.join(self.tmpdir, 'Player-Data')
+        os.makedirs(os.path.join(self.source, '3-R64-64'))
+        os.makedirs(os.path.join(self.source, '3-p-128'))
+        self.write('3-R64-64/Triples-MalRep-P1', os.urandom(100000))
+        self.write('3-p-128/Bits-MalRep-P2', b'\x00' * 50000)
+        self.write('Player-MAC-Keys-p-P0', b'not distributed')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, path, data):
+        with open(os.path.join(self.source, path), 'wb') as file:
+            file.write(data)
+
+    def target(self, name):
+        return os.path.join(self.tmpdir, name)
+
+    def assert_same(self, target, path):
+        self.assertEqual(file_digest(os.path.join(self.source, path)), file_digest(os.path.join(target, path)))
+
+    def test_distribute_to_all_targets(self):
+        targets = [self.target('p1'), self.target('p2')]
+        stats = OfflineDistributor(self.source, targets).distribute()
+        self.assertEqual(stats, [{'sent': 2, 'skipped': 0, 'bytes': 150000}] * 2)
+        for target in targets:
+            self.assert_same(target, '3-R64-64/Triples-MalRep-P1')
+            self.assert_same(target, '3-p-128/Bits-MalRep-P2')
+            self.assertFalse(os.path.exists(os.path.join(target, 'Player-MAC-Keys-p-P0')))
+
+    def test_only_changed_files_are_sent(self):
+        target = self.target('p1')
+        OfflineDistributor(self.source, [target]).distribute()
+        self.write('3-p-128/Bits-MalRep-P2', b'\x01' * 50000)
+        stats = OfflineDistributor(self.source, [target]).distribute()
+        self.assertEqual(stats, [{'sent': 1, 'skipped': 1, 'bytes': 50000}])
+        self.assert_same(target, '3-p-128/Bits-MalRep-P2')
+
+    def test_failed_copy_resumes(self):
+        transport = FlakyTransport(self.target('p1'))
+        stats = OfflineDistributor(self.source, [transport]).distribute(patterns=('3-R64-64',))
+        self.assertEqual(transport.offsets, [0, 10])
+        self.assertEqual(stats, [{'sent': 1, 'skipped': 0, 'bytes': 100000 - 10}])
+        self.assert_same(transport.root, '3-R64-64/Triples-MalRep-P1')
+        self.assertFalse(os.path.exists(os.path.join(transport.root, '3-R64-64/Triples-MalRep-P1.part')))
+
+    def test_corrupt_partial_copy_is_discarded(self):
+        target = self.target('p1')
+        os.makedirs(os.path.join(target, '3-p-128'))
+        with open(os.path.join(target, '3-p-128/Bits-MalRep-P2.part'), 'wb') as file:
+            file.write(b'\xff' * 100)
+        OfflineDistributor(self.source, [target]).distribute(patterns=('3-p-128',))
+        self.assert_same(target, '3-p-128/Bits-MalRep-P2')
+
+    def test_make_transport(self):
+        transport = make_transport('root@10.10.168.47:~/libmozaik/mpc/MP-SPDZ/Player-Data/')
+        self.assertIsInstance(transport, SshTransport)
+        self.assertEqual(transport.host, 'root@10.10.168.47')
+        self.assertEqual(transport._path('3-R64-64/Triples'), "~/libmozaik/mpc/MP-SPDZ/Player-Data/3-R64-64/Triples")
+        self.assertIsInstance(make_transport(self.tmpdir), LocalDirectoryTransport)
+
+    def test_incomplete_transport(self):
+        class NoCommitTransport(Transport):
+            def digests(self, paths):
+                return {}
+
+            def partial_size(self, path):
+                return 0
+
+            def discard_partial(self, path):
+                pass
+
+            def append(self, path, chunks):
+                pass
+
+        with self.assertRaises(TypeError):
+            NoCommitTransport()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+import os
+import socket
+import struct
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from config import ProcessException
+from inference_engine import InferenceEngine, pack_shares, receive_message, send_message, unpack_shares
+from model_registry import ModelRegistry
+
+N_FEATURES = 187
+
+
+class FakeProcess:
+    def poll(self):
+        return None
+
+    def wait(self, timeout=None):
+        return 0
+
+
+def fake_engine(sock, batch_size, n_outputs):
+    """Play the MP-SPDZ side of heartbeat_inference_engine: the outputs of a sample are its first n_outputs input shares"""
+    try:
+        while True:
+            n_chunks = struct.unpack('<i', receive_message(sock))[0]
+            if n_chunks == 0:
+                break
+            for _ in range(n_chunks):
+                inputs = unpack_shares(receive_message(sock))
+                assert len(inputs) == batch_size * N_FEATURES
+                outputs = [share for i in range(batch_size) for share in inputs[i * N_FEATURES:i * N_FEATURES + n_outputs]]
+                send_message(sock, pack_shares(outputs))
+    except ConnectionError:
+        pass
+    sock.close()
+
+
+class FakeInferenceEngine(InferenceEngine):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.starts = 0
+        self.server_thread = None
+
+    def start(self, analysis_id=None):
+        self.stop()
+        self.starts += 1
+        client, server = socket.socketpair()
+        self.server_thread = threading.Thread(target=fake_engine, args=(server, self.batch_size, self.n_outputs))
+        self.server_thread.start()
+        self.socket = client
+        self.process = FakeProcess()
+
+
+class InferenceEngineTests(unittest.TestCase):
+    def setUp(self):
+        task_manager = MagicMock()
+        task_manager.config.CONFIG_PARTY_INDEX = 1
+        task_manager.config.CONFIG_OUTPUT_MODE = 'probabilities'
+        task_manager.output_mode_args.return_value = ()
+        task_manager.model_registry = ModelRegistry('models.toml')
+        task_manager.request_lock = threading.RLock()
+        self.engine = FakeInferenceEngine(task_manager, batch_size=4)
+
+    def tearDown(self):
+        self.engine.stop()
+
+    def sample(self, index):
+        return [[index * 1000 + j, 2**64 - index * 1000 - j - 1] for j in range(N_FEATURES)]
+
+    def test_pack_shares(self):
+        shares = [[1, 2], [2**64 - 1, 0]]
+        packed = pack_shares(shares)
+        # same layout as the Persistence file written by TaskManager.write_shares (x_{i+1} first)
+        self.assertEqual(packed, struct.pack('<QQQQ', 2, 1, 0, 2**64 - 1))
+        self.assertEqual(unpack_shares(packed), shares)
+
+    def test_infer_pads_last_chunk(self):
+        shares = [share for i in range(6) for share in self.sample(i)]
+        output = self.engine.infer('analysis', shares)
+        self.assertEqual(output, [share for i in range(6) for share in self.sample(i)[:5]])
+
+    def test_infer_packed_input(self):
+        shares = [share for i in range(6) for share in self.sample(i)]
+        self.assertEqual(self.engine.infer('analysis', bytearray(pack_shares(shares))), self.engine.infer('analysis', shares))
+
+    def test_engine_stays_running(self):
+        for i in range(3):
+            self.assertEqual(self.engine.infer('analysis', self.sample(i)), self.sample(i)[:5])
+        self.assertEqual(self.engine.starts, 1)
+
+    def test_restart_after_failure(self):
+        self.engine.infer('analysis', self.sample(0))
+        # the engine dies, e.g. after a failed MAC check
+        self.engine.socket.close()
+        with self.assertRaises(ProcessException):
+            self.engine.infer('analysis', self.sample(1))
+        self.assertEqual(self.engine.infer('analysis', self.sample(2)), self.sample(2)[:5])
+        self.assertEqual(self.engine.starts, 2)
+
+    def test_class_output_mode(self):
+        task_manager = MagicMock()
+        task_manager.config.CONFIG_PARTY_INDEX = 1
+        task_manager.config.CONFIG_OUTPUT_MODE = 'class'
+        task_manager.output_mode_args.return_value = ('class',)
+        task_manager.model_registry = ModelRegistry('models.toml')
+        engine = FakeInferenceEngine(task_manager, batch_size=4)
+        self.assertEqual(engine.registry.program_name(4), 'heartbeat_inference_engine-4-15000-class')
+        shares = [share for i in range(5) for share in self.sample(i)]
+        self.assertEqual(engine.infer('analysis', shares), [self.sample(i)[0] for i in range(5)])
+        engine.stop()
+
+    def test_fixed_weights(self):
+        engine = FakeInferenceEngine(self.engine.task_manager, batch_size=4, fixed_weights=True)
+        self.assertEqual(engine.registry.program_name(4), 'heartbeat_inference_engine-4-15000-fixed_weights')
+        # the masks only change the computation in MP-SPDZ, not the exchange with the engine
+        self.assertEqual(engine.infer('analysis', self.sample(3)), self.sample(3)[:5])
+        engine.stop()
+
+    def test_warm_up_waits_for_batch(self):
+        task_manager = self.engine.task_manager
+        with task_manager.request_lock:
+            thread = self.engine.warm_up()
+            thread.join(0.2)
+            # a batch without the engine is using the shares file
+            self.assertTrue(thread.is_alive())
+            self.assertEqual(self.engine.starts, 0)
+        thread.join()
+        self.assertEqual(self.engine.starts, 1)
+
+    def test_start_holds_request_lock(self):
+        task_manager = self.engine.task_manager
+        engine = InferenceEngine(task_manager, batch_size=4, log_file=os.devnull)
+        engine.registry.get = MagicMock(return_value='heartbeat_inference_engine-4-15000')
+        locked = []
+
+        def set_model(*args):
+            # the request thread cannot take the lock while the model is written
+            thread = threading.Thread(target=lambda: locked.append(not task_manager.request_lock.acquire(blocking=False)))
+            thread.start()
+            thread.join()
+        task_manager.set_model.side_effect = set_model
+        with patch('subprocess.Popen', return_value=FakeProcess()), patch.object(engine, 'connect'):
+            engine.warm_up().join()
+        self.assertEqual(locked, [True])
+        # the engine has its own MP-SPDZ ports, apart from the batches run per request
+        task_manager.mpspdz_command.assert_called_once_with('heartbeat_inference_engine-4-15000', port_base=16000)
+        engine.socket = None
+        engine.stop()
+
+    def test_invalid_input_length(self):
+        with self.assertRaises(ProcessException):
+            self.engine.infer('analysis', self.sample(0)[:-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import os
+import tempfile
+import unittest
+
+from merger_benchmark import bytecode_digest, compare
+
+
+class MergerBenchmarkTests(unittest.TestCase):
+    def test_bytecode_digest(self):
+        with tempfile.TemporaryDirectory() as directory:
+            os.makedirs(os.path.join(directory, 'Programs', 'Bytecode'))
+            for name, content in [('prog-4-0.bc', b'\x01'), ('prog-4-multithread-1.bc', b'\x02'), ('prog-40-0.bc', b'\x03')]:
+                with open(os.path.join(directory, 'Programs', 'Bytecode', name), 'wb') as file:
+                    file.write(content)
+            digest = bytecode_digest(directory, 'prog-4')
+            self.assertNotEqual(digest, bytecode_digest(directory, 'prog-40'))
+            with open(os.path.join(directory, 'Programs', 'Bytecode', 'prog-40-0.bc'), 'wb') as file:
+                file.write(b'\x04')
+            self.assertEqual(bytecode_digest(directory, 'prog-4'), digest)
+
+    def test_compare(self):
+        results = {
+            'reference': [{'program': 'prog-4', 'compile_time': 10.0, 'peak_rss_kb': 400, 'bytecode': 'a'},
+                          {'program': 'prog-8', 'compile_time': 0.0, 'peak_rss_kb': 0, 'bytecode': 'b'}],
+            'current': [{'program': 'prog-4', 'compile_time': 5.0, 'peak_rss_kb': 100, 'bytecode': 'a'},
+                        {'program': 'prog-8', 'compile_time': 1.0, 'peak_rss_kb': 10, 'bytecode': 'c'}],
+        }
+        report = compare(results)
+        self.assertEqual([entry['program'] for entry in report], ['prog-4', 'prog-8'])
+        self.assertEqual(report[0]['time_ratio'], 0.5)
+        self.assertEqual(report[0]['memory_ratio'], 0.25)
+        self.assertTrue(report[0]['same_bytecode'])
+        self.assertNotIn('time_ratio', report[1])
+        self.assertFalse(report[1]['same_bytecode'])
+
+
+if __name__ == '__main__':
+    unittest.main()
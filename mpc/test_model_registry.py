@@ -0,0 +1,80 @@
+import os
+import tempfile
+import unittest
+
+from config import ProcessException
+from model_registry import Model, ModelRegistry, read_model_from_file
+
+MODELS = """
+["Heartbeat-Demo-1"]
+shares = ["heartbeat-inference-model/model_shares{party}.txt", "heartbeat-inference-model/biases_shares{party}.txt"]
+input_size = 187
+classes = 5
+program = "heartbeat_inference_demo_batched"
+engine_program = "heartbeat_inference_engine"
+warm = true
+
+["ECG-Demo-2"]
+shares = ["ecg/shares{party}.txt"]
+input_size = 250
+classes = 3
+program = "ecg_inference_batched"
+"""
+
+
+class ModelRegistryTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'models.toml')
+        with open(self.path, 'w') as file:
+            file.write(MODELS)
+        self.registry = ModelRegistry(self.path, args=('class',))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_models(self):
+        self.assertEqual(list(self.registry.models), ['Heartbeat-Demo-1', 'ECG-Demo-2'])
+        self.assertEqual(self.registry.default(), 'Heartbeat-Demo-1')
+        self.assertEqual(self.registry.warm(), ['Heartbeat-Demo-1'])
+        model = self.registry.get('ECG-Demo-2')
+        self.assertEqual(model.input_size, 250)
+        self.assertIsNone(model.engine_program)
+        self.assertEqual(model.share_files(2), ['ecg/shares3.txt'])
+
+    def test_unknown_analysis_type(self):
+        with self.assertRaises(ProcessException) as context:
+            self.registry.get('Unknown', 'analysis')
+        self.assertEqual(context.exception.analysis_id, 'analysis')
+        self.assertIn('"Heartbeat-Demo-1", "ECG-Demo-2"', context.exception.message)
+
+    def test_output_width(self):
+        model = Model('ECG-Demo-2', [], 250, 3, 'ecg_inference_batched')
+        self.assertEqual(model.output_width('probabilities'), 3)
+        self.assertEqual(model.output_width('class'), 1)
+        self.assertEqual(model.output_width('class_confidence'), 2)
+
+    def test_program_registry_per_model(self):
+        heartbeat = self.registry.program_registry('Heartbeat-Demo-1')
+        ecg = self.registry.program_registry('ECG-Demo-2')
+        self.assertIs(self.registry.program_registry('Heartbeat-Demo-1'), heartbeat)
+        self.assertEqual(heartbeat.program_name(16), 'heartbeat_inference_demo_batched-16-class')
+        self.assertEqual(ecg.program_name(16), 'ecg_inference_batched-16-class')
+
+    def test_read_model_from_file(self):
+        path = os.path.join(self.temp_dir.name, 'shares.txt')
+        with open(path, 'w') as file:
+            file.write('1,-2 3,4\n5,6\n')
+        self.assertEqual(read_model_from_file(path), [(1, -2), (3, 4), (5, 6)])
+
+    def test_deployed_models(self):
+        registry = ModelRegistry('models.toml')
+        for model in registry.models.values():
+            for party_index in range(3):
+                for path in model.share_files(party_index):
+                    self.assertTrue(os.path.exists(path), path)
+            self.assertTrue(os.path.exists(f'MP-SPDZ/Programs/Source/{model.program}.mpc'))
+
+
+if __name__ == '__main__':
+    unittest.main()
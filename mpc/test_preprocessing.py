@@ -0,0 +1,137 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from config import ProcessException
+from preprocessing import PreprocessingPool, parse_preprocessing_usage
+
+MPSPDZ_OUTPUT = """Using security parameter 40
+Spent 0.35 seconds (6.4 MB, 24 rounds) on the online phase and 0 seconds (0 MB, 0 rounds) on the preprocessing/offline phase.
+Actual cost of program:
+  Type int
+         94248        Triples
+         14832           Bits
+           886    Input tuples (0 0 0)
+  Type bit
+          1000        Triples
+  edaBits
+            64 of length 64
+Coordination took 0.01 seconds
+"""
+
+
+class PreprocessingTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.staging_dir = os.path.join(self.tmpdir, 'Prep-Staging')
+        self.player_data_dir = os.path.join(self.tmpdir, 'Player-Data')
+        os.makedirs(self.player_data_dir)
+        self.pool = self.make_pool()
+
+    def make_pool(self):
+        task_manager = MagicMock()
+        task_manager.config.CONFIG_PARTY_INDEX = 1
+        pool = PreprocessingPool(task_manager, target=1000, watermark=200, staging_dir=self.staging_dir,
+                                 timeout=0, player_data_dir=self.player_data_dir)
+        pool.start()
+        return pool
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def stage(self, generation, n_tuples=1000):
+        prep_dir = os.path.join(self.staging_dir, str(generation), 'Player-Data', '3-R64-64')
+        os.makedirs(prep_dir)
+        with open(os.path.join(prep_dir, 'Triples-MalRep-P1'), 'w') as file:
+            file.write(str(generation))
+        with open(os.path.join(self.staging_dir, str(generation), 'READY'), 'w') as file:
+            file.write(str(n_tuples))
+
+    def test_parse_preprocessing_usage(self):
+        usage = parse_preprocessing_usage(MPSPDZ_OUTPUT)
+        self.assertEqual(usage, {('int', 'Triples'): 94248, ('int', 'Bits'): 14832, ('int', 'Input tuples'): 886,
+                                 ('bit', 'Triples'): 1000, ('edaBits', 'length 64'): 64})
+        # with a cost file
+        output = 'Actual cost of program:\n  Type int\n    9.4248 =      94248        Triples @      0.0001\n'
+        self.assertEqual(parse_preprocessing_usage(output), {('int', 'Triples'): 94248})
+        self.assertEqual(parse_preprocessing_usage('no statistics'), {})
+
+    def test_staged_generations(self):
+        self.stage(2)
+        self.stage(1)
+        os.makedirs(os.path.join(self.staging_dir, '3'))  # incomplete, no READY marker
+        self.assertEqual(self.pool.staged_generations(), [1, 2])
+
+    def test_prepare_swaps_oldest_generation(self):
+        self.stage(1)
+        self.stage(2)
+        self.pool.prepare('analysis', 'program')
+        with open(os.path.join(self.player_data_dir, '3-R64-64', 'Triples-MalRep-P1')) as file:
+            self.assertEqual(file.read(), '1')
+        self.assertEqual(self.pool.staged_generations(), [2])
+        self.assertEqual(self.pool.generation, 1)
+        self.assertEqual(self.pool.n_tuples, 1000)
+
+    def test_consume_and_watermark(self):
+        self.stage(1)
+        self.stage(2)
+        output = MPSPDZ_OUTPUT.replace('94248', '300').replace('14832', '10').replace('886', '10').replace('1000', '10')
+        self.pool.prepare('analysis', 'program')
+        self.pool.consume('program', output)
+        self.assertEqual(self.pool.available[('int', 'Triples')], 700)
+        # 700 - 300 stays above the watermark: no swap needed
+        self.pool.prepare('analysis', 'program')
+        self.assertEqual(self.pool.staged_generations(), [2])
+        self.pool.consume('program', output)
+        self.assertEqual(self.pool.available[('int', 'Triples')], 400)
+        # 400 - 300 drops below the watermark: the next generation is swapped in
+        self.pool.prepare('analysis', 'program')
+        self.assertEqual(self.pool.staged_generations(), [])
+        self.assertEqual(self.pool.available[('int', 'Triples')], 1000)
+
+    def test_watermark_of_binary_domain(self):
+        self.stage(1)
+        self.stage(2)
+        output = MPSPDZ_OUTPUT.replace('94248', '10').replace('14832', '10').replace('1000', '500')
+        self.pool.prepare('analysis', 'program')
+        self.pool.consume('program', output)
+        # the binary triples of the comparisons run low first
+        self.assertEqual(self.pool.available[('bit', 'Triples')], 500)
+        self.pool.prepare('analysis', 'program')
+        self.assertEqual(self.pool.generation, 2)
+        self.assertEqual(self.pool.available[('bit', 'Triples')], 1000)
+
+    def test_restart_keeps_state(self):
+        self.stage(1)
+        self.stage(2)
+        output = MPSPDZ_OUTPUT.replace('94248', '300').replace('14832', '10').replace('886', '10').replace('1000', '10')
+        self.pool.prepare('analysis', 'program')
+        self.pool.consume('program', output)
+        # a restarted party does not swap where the others do not
+        restarted = self.make_pool()
+        self.assertEqual(restarted.generation, 1)
+        self.assertEqual(restarted.available, self.pool.available)
+        self.assertEqual(restarted.usage_per_program, self.pool.usage_per_program)
+        restarted.prepare('analysis', 'program')
+        self.assertEqual(restarted.generation, 1)
+        restarted.consume('program', output)
+        restarted.prepare('analysis', 'program')
+        self.assertEqual(restarted.generation, 2)
+
+    def test_skips_used_generations(self):
+        self.stage(1)
+        self.pool.prepare('analysis', 'program')
+        # a leftover of generation 1, e.g. after a crash during the swap
+        self.stage(1)
+        self.stage(2)
+        self.assertEqual(self.pool.staged_generations(), [2])
+
+    def test_prepare_without_staged_material(self):
+        with self.assertRaises(ProcessException):
+            self.pool.prepare('analysis', 'program')
+
+
+if __name__ == '__main__':
+    unittest.main()
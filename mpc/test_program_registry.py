@@ -0,0 +1,106 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import unittest
+
+from config import ProcessException
+from program_registry import ProgramRegistry
+
+
+class FakeCompileRegistry(ProgramRegistry):
+    """ProgramRegistry writing placeholder outputs instead of running compile.py"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.compilations = []
+        self.fail = False
+
+    def compile(self, batch_size):
+        if self.fail:
+            raise subprocess.CalledProcessError(1, 'compile.py', output='', stderr='syntax error')
+        time.sleep(0.1)
+        self.compilations.append(batch_size)
+        name = self.program_name(batch_size)
+        with open(os.path.join(self.mpspdz_dir, 'Programs', 'Schedules', f'{name}.sch'), 'w') as file:
+            file.write(f'1\n1\n{name}-0:10\n1 0\n0\n')
+        with open(os.path.join(self.mpspdz_dir, 'Programs', 'Bytecode', f'{name}-0.bc'), 'w') as file:
+            file.write(str(batch_size))
+
+
+class ProgramRegistryTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.mpspdz_dir = os.path.join(self.tmpdir, 'MP-SPDZ')
+        for directory in ['Compiler', 'Programs/Source', 'Programs/Schedules', 'Programs/Bytecode']:
+            os.makedirs(os.path.join(self.mpspdz_dir, directory))
+        with open(os.path.join(self.mpspdz_dir, 'Compiler', 'types.py'), 'w') as file:
+            file.write('# compiler')
+        with open(os.path.join(self.mpspdz_dir, 'compile.py'), 'w') as file:
+            file.write('# compile')
+        self.write_template('batch_size = int(program.args[1])')
+        self.cache_dir = os.path.join(self.tmpdir, 'Cache')
+        self.registry = self.new_registry()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def new_registry(self):
+        return FakeCompileRegistry(template='demo', mpspdz_dir=self.mpspdz_dir, cache_dir=self.cache_dir)
+
+    def write_template(self, source):
+        with open(os.path.join(self.mpspdz_dir, 'Programs', 'Source', 'demo.mpc'), 'w') as file:
+            file.write(source)
+
+    def test_compiles_on_first_use_only(self):
+        self.assertEqual(self.registry.get(4), 'demo-4')
+        self.assertEqual(self.registry.get(4), 'demo-4')
+        self.assertEqual(self.registry.get(16), 'demo-16')
+        self.assertEqual(self.registry.compilations, [4, 16])
+        self.assertEqual(self.registry.compiled, {'demo-4', 'demo-16'})
+
+    def test_compiles_on_first_use_per_registry(self):
+        self.registry.get(4)
+        # a restarted service runs compile.py again, which restores the unchanged program from its cache
+        registry = self.new_registry()
+        registry.get(4)
+        self.assertEqual(registry.compilations, [4])
+
+    def test_concurrent_requests_compile_once(self):
+        threads = [threading.Thread(target=self.registry.get, args=(8,)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.registry.compilations, [8])
+
+    def test_warm_up(self):
+        self.registry.warm_up([1, 2, 4]).join()
+        self.assertEqual(self.registry.compilations, [1, 2, 4])
+        self.registry.get(2)
+        self.assertEqual(self.registry.compilations, [1, 2, 4])
+
+    def test_compile_error(self):
+        self.registry.fail = True
+        with self.assertRaises(ProcessException) as context:
+            self.registry.get(4, 'analysis')
+        self.assertEqual(context.exception.analysis_id, 'analysis')
+        self.assertEqual(context.exception.code, 500)
+        self.assertEqual(os.listdir(self.tmpdir), ['MP-SPDZ'])
+
+    def test_compile_template(self):
+        # compile the actual inference template
+        registry = ProgramRegistry(cache_dir=self.cache_dir)
+        self.assertEqual(registry.get(2), 'heartbeat_inference_demo_batched-2')
+        self.assertTrue(os.path.exists(os.path.join('MP-SPDZ', 'Programs', 'Schedules', 'heartbeat_inference_demo_batched-2.sch')))
+        entries = os.listdir(self.cache_dir)
+        self.assertEqual(len(entries), 1)
+        self.assertTrue(os.path.exists(os.path.join(self.cache_dir, entries[0], 'manifest.json')))
+        # the compile cache of compile.py skips the unchanged compilation
+        result = ProgramRegistry(cache_dir=self.cache_dir).compile(2)
+        self.assertIn('Reusing cached compilation', result.stdout)
+
+
+if __name__ == '__main__':
+    unittest.main()
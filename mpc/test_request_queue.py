@@ -0,0 +1,80 @@
+import threading
+import unittest
+
+from request_queue import RequestQueue, priority_class
+
+
+def request(n_analyses, streaming=False):
+    analysis_ids = [f'analysis{i}' for i in range(n_analyses)]
+    return (analysis_ids, ['user'] * n_analyses, 'Heartbeat-Demo-1', [[0, 1]] * n_analyses, False, [[0, 1]] * n_analyses if streaming else None)
+
+
+class RequestQueueTests(unittest.TestCase):
+    def test_priority_class(self):
+        self.assertEqual(priority_class(request(1, streaming=True)), 'streaming')
+        self.assertEqual(priority_class(request(1)), 'batch')
+
+    def test_unbounded(self):
+        queue = RequestQueue()
+        for _ in range(100):
+            self.assertTrue(queue.offer(request(10)))
+        self.assertEqual(queue.qsize(), 100)
+        self.assertEqual(queue.queued['batch'], 1000)
+
+    def test_limit(self):
+        queue = RequestQueue(max_queued=5)
+        self.assertTrue(queue.offer(request(3)))
+        self.assertFalse(queue.offer(request(3)))
+        self.assertTrue(queue.offer(request(2)))
+        queue.get()
+        self.assertTrue(queue.offer(request(3)))
+
+    def test_reserved_capacity(self):
+        queue = RequestQueue(max_queued=10, reserved={'streaming': 4})
+        self.assertTrue(queue.offer(request(6)))
+        self.assertFalse(queue.offer(request(1)))
+        # the reservation is only usable by streaming requests
+        self.assertTrue(queue.offer(request(4, streaming=True)))
+        self.assertFalse(queue.offer(request(1, streaming=True)))
+
+    def test_unknown_priority_class(self):
+        with self.assertRaises(ValueError):
+            RequestQueue(reserved={'interactive': 1})
+
+    def test_streaming_first(self):
+        queue = RequestQueue()
+        batch = request(1)
+        streaming = request(2, streaming=True)
+        queue.put(batch)
+        queue.offer(streaming)
+        self.assertIs(queue.get(), streaming)
+        self.assertIs(queue.get(), batch)
+        self.assertEqual(queue.queued, {'streaming': 0, 'batch': 0})
+
+    def test_get_waits_for_offer(self):
+        queue = RequestQueue(max_queued=1)
+        result = []
+        thread = threading.Thread(target=lambda: result.append(queue.get()))
+        thread.start()
+        queue.offer(request(1))
+        thread.join(timeout=5)
+        self.assertEqual(len(result), 1)
+
+    def test_estimated_wait(self):
+        queue = RequestQueue(max_queued=4, default_analysis_time=2.0)
+        self.assertEqual(queue.estimated_wait(request(1)), 2.0)
+        queue.offer(request(3))
+        queue.offer(request(1, streaming=True))
+        self.assertEqual(queue.estimated_wait(request(1)), 10.0)
+        # streaming requests only wait for the queued streaming requests
+        self.assertEqual(queue.estimated_wait(request(1, streaming=True)), 4.0)
+
+        queue.record(4, 2.0)
+        queue.record(6, 3.0)
+        self.assertEqual(queue.analysis_time(), 0.5)
+        self.assertEqual(queue.retry_after(request(2)), 1.0)
+        self.assertEqual(queue.retry_after(request(0)), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
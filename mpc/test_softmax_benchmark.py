@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from softmax_benchmark import accuracy_report, load_model, load_samples, logits, quantize, round_crossover, softmax
+
+LOGITS = np.array([[8.0, 2.25, -3.9, -2.5, -4.0],
+                   [0.5, 1.0, 0.75, -1.0, 0.0],
+                   [-1.0, -0.5, -2.0, -3.0, -0.25]])
+
+
+class SoftmaxBenchmarkTests(unittest.TestCase):
+    def test_quantize(self):
+        self.assertEqual(quantize(1 / 3), 85 / 256)
+        self.assertEqual(quantize(-0.001), 0)
+
+    def test_load_samples(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'input.txt')
+            with open(path, 'w') as file:
+                file.write('2\n3\n1 2 3\n4 5 6\n')
+            np.testing.assert_array_equal(load_samples(path), [[1, 2, 3], [4, 5, 6]])
+        self.assertEqual(load_samples('sample.txt').shape, (1, 187))
+
+    def test_logits(self):
+        samples = load_samples('sample.txt')
+        x = logits(load_model(), samples)
+        self.assertEqual(x.shape, (1, 5))
+        # the emulation is fixed point
+        np.testing.assert_array_equal(x, quantize(x))
+        self.assertEqual(np.argmax(x), 0)
+
+    def test_exact(self):
+        probabilities = softmax(LOGITS)
+        np.testing.assert_allclose(probabilities.sum(axis=1), 1, atol=0.01)
+
+    def test_relu(self):
+        probabilities = softmax(LOGITS, 'relu')
+        np.testing.assert_allclose(probabilities[1], [2 / 9, 4 / 9, 3 / 9, 0, 0], atol=0.01)
+        # no positive logit
+        np.testing.assert_allclose(probabilities[2], [0.2] * 5, atol=0.01)
+
+    def test_poly(self):
+        probabilities = softmax(LOGITS, 'poly')
+        # (1 + x / 8) ** 8 is 1 for the maximum and 0 below -8
+        self.assertEqual(probabilities[0, 3], 0)
+        np.testing.assert_allclose(probabilities.sum(axis=1), 1, atol=0.02)
+        np.testing.assert_array_equal(np.argmax(probabilities, axis=1), np.argmax(LOGITS, axis=1))
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            softmax(LOGITS, 'taylor')
+
+    def test_accuracy_report(self):
+        labels = np.eye(5)[[0, 1, 2]]
+        report = {entry['mode']: entry for entry in accuracy_report(LOGITS, labels)}
+        self.assertEqual(set(report), {'exact', 'relu', 'poly'})
+        self.assertEqual(report['exact']['agreement'], 1)
+        self.assertAlmostEqual(report['exact']['accuracy'], 2 / 3)
+        # the uniform distribution of the row without a positive logit predicts the first class
+        self.assertAlmostEqual(report['relu']['agreement'], 2 / 3)
+        self.assertEqual(report['poly']['agreement'], 1)
+        self.assertLess(report['poly']['max_error'], report['relu']['max_error'])
+        self.assertNotIn('accuracy', accuracy_report(LOGITS)[0])
+
+
+    def test_round_crossover(self):
+        rounds = {4: {'exact': 22, 'relu': 18, 'poly': 31}, 16: {'exact': 40, 'relu': 18, 'poly': 31},
+                  64: {'exact': 103, 'relu': 18, 'poly': 31}}
+        costs = [{'batch_size': batch_size, 'softmax': None if mode == 'exact' else mode, 'cost': {'virtual machine rounds': n}}
+                 for batch_size, modes in rounds.items() for mode, n in modes.items()]
+        self.assertEqual(round_crossover(costs, 'poly'), 16)
+        self.assertEqual(round_crossover(costs, 'relu'), 4)
+        self.assertIsNone(round_crossover(costs[:3], 'poly'))
+
+if __name__ == '__main__':
+    unittest.main()
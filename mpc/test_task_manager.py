@@ -10,11 +10,11 @@ from unittest.mock import MagicMock, mock_open, patch
 import numpy as np
 from Crypto.Cipher import AES
 
-from config import Config
+from config import Config, ProcessException
 from database import Database
 from key_share import MpcPartyKeys, prepare_params_for_dist_enc
 from rep3aes import Rep3AesConfig
-from task_manager import TaskManager
+from task_manager import SHARES_HEADER, TaskManager, encode_input_shares, encode_shares
 from test import TestRep3Aes, exception_check
 from timing import AnalysisTimer
 
@@ -178,6 +178,151 @@ class TestTaskManager(unittest.TestCase):
             # Assert that the result matches the expected result
             self.assertEqual(result, expected_result)
 
+    def test_set_model_reuses_persisted_model(self):
+        analysis_id = "01HQJRH8N3ZEXH3HX7QD56FH0W"
+        model_shares = [(1, -1), (2, 3)]
+        bias_shares = [(4, 5)]
+        header_and_model = SHARES_HEADER + struct.pack('<6q', 1, -1, 2, 3, 4, 5)
+
+        with tempfile.TemporaryDirectory() as temp_dir, \
+                patch('task_manager.read_model_from_file', side_effect=[model_shares, bias_shares]) as read_model:
+            self.task_manager.sharesfile = os.path.join(temp_dir, 'Transactions-P0.data')
+            # drop the model loaded at startup
+            self.task_manager.models = {}
+
+            self.task_manager.set_model(analysis_id, "Heartbeat-Demo-1", [[6, 7], [8, 9]])
+            with open(self.task_manager.sharesfile, 'rb') as file:
+                self.assertEqual(file.read(), header_and_model + struct.pack('<4q', 7, 6, 9, 8))
+
+            # outputs appended by MP-SPDZ and the previous input are replaced by the next input
+            with open(self.task_manager.sharesfile, 'ab') as file:
+                file.write(struct.pack('<2q', 10, 11))
+            self.task_manager.set_model(analysis_id, "Heartbeat-Demo-1", [[2**64 - 1, 12]])
+            with open(self.task_manager.sharesfile, 'rb') as file:
+                self.assertEqual(file.read(), header_and_model + struct.pack('<2q', 12, -1))
+
+            # the model files are only parsed once
+            self.assertEqual(read_model.call_count, 2)
+
+            # a file written by other means gets the model again
+            self.task_manager.write_shares(analysis_id, [[1, 2]])
+            self.task_manager.set_model(analysis_id, "Heartbeat-Demo-1", [])
+            with open(self.task_manager.sharesfile, 'rb') as file:
+                self.assertEqual(file.read(), header_and_model)
+
+    def test_encode_input_shares(self):
+        samples = [np.array([[1, 2], [2**64 - 1, 3]], dtype=np.uint64), np.array([[4, 5]], dtype=np.uint64)]
+        encoded = encode_input_shares(samples)
+        self.assertEqual(encoded, struct.pack('<6Q', 2, 1, 3, 2**64 - 1, 5, 4))
+        self.assertEqual(encoded, encode_shares(pair[::-1] for sample in samples for pair in sample.tolist()))
+
+    def test_set_model_with_encoded_input(self):
+        analysis_id = "01HQJRH8N3ZEXH3HX7QD56FH0W"
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self.task_manager.sharesfile = os.path.join(temp_dir, 'Transactions-P0.data')
+            self.task_manager.set_model(analysis_id, "Heartbeat-Demo-1", [[6, 7], [8, 9]])
+            with open(self.task_manager.sharesfile, 'rb') as file:
+                expected = file.read()
+            self.task_manager.set_model(analysis_id, "Heartbeat-Demo-1", encode_input_shares([np.array([[6, 7], [8, 9]], dtype=np.uint64)]))
+            with open(self.task_manager.sharesfile, 'rb') as file:
+                self.assertEqual(file.read(), expected)
+
+    def test_result_region(self):
+        analysis_id = "01HQJRH8N3ZEXH3HX7QD56FH0W"
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self.task_manager.sharesfile = os.path.join(temp_dir, 'Transactions-P0.data')
+            self.task_manager.set_model(analysis_id, "Heartbeat-Demo-1", [[6, 7], [8, 9]], n_outputs=2)
+            position, n_outputs = self.task_manager.result_region
+            self.assertEqual(n_outputs, 2)
+            self.assertEqual(os.path.getsize(self.task_manager.sharesfile), len(SHARES_HEADER) + 16 * (position + 1))
+
+            # the program has not written all results
+            with open(self.task_manager.sharesfile, 'ab') as file:
+                file.write(struct.pack('<2Q', 2, 1))
+            with self.assertRaises(ProcessException):
+                self.task_manager.read_results(analysis_id)
+
+            # results at the fixed position, followed by unrelated data
+            with open(self.task_manager.sharesfile, 'ab') as file:
+                file.write(struct.pack('<4Q', 4, 2**64 - 1, 0, 0))
+            self.assertEqual(self.task_manager.read_results(analysis_id), [[1, 2], [2**64 - 1, 4]])
+
+            # the next batch replaces the region
+            self.task_manager.set_model(analysis_id, "Heartbeat-Demo-1", [[6, 7]], n_outputs=1)
+            self.assertEqual(self.task_manager.result_region, (position - 1, 1))
+            with self.assertRaises(ProcessException):
+                self.task_manager.read_results(analysis_id)
+
+    def test_result_region_invalid_header(self):
+        analysis_id = "01HQJRH8N3ZEXH3HX7QD56FH0W"
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self.task_manager.sharesfile = os.path.join(temp_dir, 'Transactions-P0.data')
+            self.task_manager.set_model(analysis_id, "Heartbeat-Demo-1", [[6, 7]], n_outputs=1)
+            position, _ = self.task_manager.result_region
+            with open(self.task_manager.sharesfile, 'r+b') as file:
+                file.seek(len(SHARES_HEADER) + 16 * position)
+                file.write(struct.pack('<4Q', 1, 2, 3, 4))
+            with self.assertRaises(ProcessException):
+                self.task_manager.read_results(analysis_id)
+
+            self.task_manager.set_model(analysis_id, "Heartbeat-Demo-1", [[6, 7]])
+            with self.assertRaises(ProcessException):
+                self.task_manager.read_results(analysis_id)
+
+    def test_submit_and_resume(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self.task_manager.db = Database(os.path.join(temp_dir, 'jobs.db'))
+            request = (["01HQJRH8N3ZEXH3HX7QD56FH0W"], ["e7514b7a-9293-4c83-b733-a53e0e449635"], "Heartbeat-Demo-1", [[1, 2]], False, None)
+            self.task_manager.request_queue.put = MagicMock()
+            self.task_manager.request_queue.offer = MagicMock(side_effect=[True, False])
+            self.assertTrue(self.task_manager.submit(request))
+            self.assertFalse(self.task_manager.submit(request))
+            job_id = self.task_manager.request_queue.offer.call_args_list[0][0][0][6]
+            self.assertEqual([job[0] for job in self.task_manager.db.pending_jobs()], [job_id])
+
+            self.assertEqual(self.task_manager.resume_jobs(), 1)
+            self.task_manager.request_queue.put.assert_called_once_with(request + (job_id,))
+
+    def test_resume_encrypted_job(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self.task_manager.db = Database(os.path.join(temp_dir, 'jobs.db'))
+            request = (["01HQJRH8N3ZEXH3HX7QD56FH0W"], ["e7514b7a-9293-4c83-b733-a53e0e449635"], "Heartbeat-Demo-1", [[1, 2]], False, None)
+            job_id = self.task_manager.db.add_job(request)
+            self.task_manager.db.create_entry(request[0][0])
+            self.task_manager.db.set_job_stage(job_id, 'encrypted', {'samples_per_user': [1], 'results': ['abcd']})
+            self.task_manager.mozaik_obelisk = MagicMock()
+            self.task_manager.request_queue.get = MagicMock(return_value=request + (job_id,))
+            self.task_manager.process_requests(test=True)
+
+            # only the storage of the result is left
+            self.task_manager.mozaik_obelisk.get_data.assert_not_called()
+            self.task_manager.mozaik_obelisk.get_key_share.assert_not_called()
+            self.task_manager.mozaik_obelisk.store_result.assert_called_once_with(request[0], request[1], ['abcd'])
+            self.assertEqual(self.task_manager.db.read_entry(request[0][0])[1], 'Completed')
+            self.assertEqual(self.task_manager.db.pending_jobs(), [])
+
+    def test_resume_restarts_mpc_stages(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self.task_manager.db = Database(os.path.join(temp_dir, 'jobs.db'))
+            request = (["01HQJRH8N3ZEXH3HX7QD56FH0W"], ["e7514b7a-9293-4c83-b733-a53e0e449635"], "Heartbeat-Demo-1", [[1, 2]], False, None)
+            job_id = self.task_manager.db.add_job(request)
+            # a checkpoint of an MPC stage, as stored by older versions
+            self.task_manager.db.set_job_stage(job_id, 'inference', {'samples_per_user': [1], 'shares': [[1, 2]] * 5})
+            self.task_manager.mozaik_obelisk = MagicMock()
+            self.task_manager.mozaik_obelisk.get_data.side_effect = ProcessException(request[0], 500, 'stop')
+            self.task_manager.request_queue.get = MagicMock(return_value=request + (job_id,))
+            with self.assertRaises(ProcessException):
+                self.task_manager.process_requests(test=True)
+
+            # the other parties run dist_dec again as well
+            self.task_manager.mozaik_obelisk.get_data.assert_called_once_with(request[0], request[1], request[3])
+            self.task_manager.mozaik_obelisk.store_result.assert_not_called()
+
+    def test_set_model_invalid_analysis_type(self):
+        with self.assertRaises(ProcessException) as context:
+            self.task_manager.set_model("01HQJRH8N3ZEXH3HX7QD56FH0W", "Unknown", [])
+        self.assertEqual(context.exception.code, 500)
+
     def tearDown(self):
         # Cleanup: (run_offline) Remove any directories starting with "3-" in the Player-Data folder
         for folder in glob.glob('MP-SPDZ/Player-Data/3-*'):
@@ -268,7 +413,15 @@ class TestTaskManager(unittest.TestCase):
         ks_share2 = bytes.fromhex('9bcdf4ddf510bfc54ad5a3cd12077c1c708b317b4c019377bd9d1ac235f7562148a930baa7c27a4613cb558c677cead4fc358862e9a9d3cff8c189c3f85961f54e5de18538c3eca37a0e78a02091e52a9db3ef685d40ce2edf9649917f6bced0b0926ca3a01fe25dbc1ce27f8399aee6b6088c727f3bf45c580b7a664053b0ee5917097bc6b31869e9e3a28caaf79e33b0fee9abb7a0eb7f34a8b9c2c9f4045182f342ebfb6ba43e2a48c4964302bd890e67bbd843534d4030a3f1719ec25ad3a71b6cfc26317e3dfea40dede5bcf01cab9dfc4b5b7b0bcfbb88cad52d689a344dcb8a9fa1e09b369b6fa6bb100f49c2c69f41ce23cf00fe57967230f44a6469')
         ks_share3 = bytes.fromhex('aca898f776a4f5f8d382720926409c6e06c768f9b72759aeaa2d7dab083f99e0926359117d9faa65225dcf58148857f784420c086618b60b1bdc755d45ff1012e13a248b5a42e174b1f937dcf8b3b622d3f695c9e848bb8a1474558259ed4839a8aeec6a8c9d0e28d819cb762be68ae8893c71e6ff6e9518cbc7063d989dd831f10dce2022b0809ba5a62a2fee6f8480086a26cbaf87696b28774d74f8ca372a99d9cbabe17f494512cff64f91eb8d103f4f1a19a82c0c0a9e39266a475742af5fbde9335fee632c513437cf87028054f9f847e5d648539e9def87f1fdcb0c36c8a29ae3f95ab659e773a942c80285fbdc8f00578b8bc3ff5bd5b0fb4789b9dc')
         self.run_process_requests_test_helper([ks_share1, ks_share2, ks_share3], [[1706094000000, 1769252400000],[1706094000000, 1769252400000]]) # streaming
-    
+
+    def test_output_mode_args(self):
+        self.assertEqual(self.task_manager.output_mode_args(), ())
+        self.task_manager.config.CONFIG_SOFTMAX = 'poly'
+        self.assertEqual(self.task_manager.output_mode_args(), ('softmax=poly',))
+        # the softmax approximation only applies to the probabilities
+        self.task_manager.config.CONFIG_OUTPUT_MODE = 'class_confidence'
+        self.assertEqual(self.task_manager.output_mode_args(), ('class_confidence',))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,11 +1,16 @@
 import time
 import os
+from collections import defaultdict, deque
+from contextlib import contextmanager
 
 class AnalysisTimer:
-    def __init__(self, party_index):
+    def __init__(self, party_index, max_stage_durations=1000):
         log_file = f"analysis_times_{party_index}.log"
         self.log_file = log_file
         self.start_times = {}
+        # only the latest durations of every stage are kept, the service records them for every batch
+        self.max_stage_durations = max_stage_durations
+        self.reset_stages()
 
     def start(self, analysis_id):
         """
@@ -19,6 +24,15 @@ class AnalysisTimer:
             print(f"Overwriting existing start time for analysis ID: {analysis_id}")
         self.start_times[analysis_id] = time.time()
 
+    def cancel(self, analysis_id):
+        """
+        Forget the start time of an analysis that is not processed.
+
+        Arguments:
+            analysis_id (str): The unique ID of the analysis.
+        """
+        self.start_times.pop(analysis_id, None)
+
     def end(self, analysis_id):
         """
         Record the end time for a specific analysis and log the duration.
@@ -47,3 +61,24 @@ class AnalysisTimer:
         """
         with open(self.log_file, "a") as log:
             log.write(f"Analysis ID: {analysis_id}, Duration: {duration:.2f} seconds\n")
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Context manager that records the wall time spent in a processing stage of a batch.
+        The latest max_stage_durations durations per stage are kept in memory (see stage_durations) so that benchmarks can report per-stage latencies.
+
+        Arguments:
+            name (str): The name of the stage, e.g. "dist_dec" or "inference".
+        """
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_durations[name].append(time.perf_counter() - start_time)
+
+    def reset_stages(self):
+        """
+        Forget all recorded stage durations.
+        """
+        self.stage_durations = defaultdict(lambda: deque(maxlen=self.max_stage_durations))